@@ -1,22 +1,126 @@
 import streamlit as st
-import requests
 import json
+from time import perf_counter
+from typing import Optional
 import pandas as pd
 import plotly.express as px
-from utils.data import load_data
+import requests
+
+# Les DataFrames en cache sont partagés entre toutes les sessions : avec
+# Copy-on-Write, les projections partagent les buffers du frame d'origine
+# et toute écriture faite par un appelant déclenche une copie locale au
+# lieu de modifier les données communes. Activé avant tout chargement.
+pd.set_option("mode.copy_on_write", True)
+
+from utils.data import (
+    ACCESS_PATH,
+    ACCESSIBILITY_PATH,
+    DENSITY_PATH,
+    file_fingerprint,
+    get_access_layer,
+    loaded_dataset,
+    get_departement_summary,
+    get_proximity_index,
+    grid_path,
+    grid_resolution_for_zoom,
+    get_rollup,
+    geojson_path,
+    geojson_url,
+    load_geojson,
+    resolution_for_zoom,
+)
+from utils.aggregates import (
+    commune_locations,
+    commune_rows,
+    get_frame_cache,
+    grid_view,
+    memo_key,
+    viewport_points,
+    zone_indicators,
+    zone_views,
+)
+from utils.charts import cached_figure, get_figure_cache, grid_deck, viewport_deck
+from utils.viewport import BBox
 from utils.chatbot import create_chatbot_interface
 
 # Configuration
 st.set_page_config(page_title="HealthMap", layout="wide", page_icon="🏥")
 st.title("🏥 HealthMap — Répartition des professionnels de santé en France")
 
-# Initialiser le chatbot et l'historique
-if "chatbot" not in st.session_state:
-    st.session_state.chatbot = create_chatbot_interface()
-
+# Historique de la session (le chatbot est partagé par le processus et
+# ne charge ses données qu'à la première question)
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+
+def contours(niveau: str, zoom: float) -> Optional[dict]:
+    """
+    Contours d'une carte choroplèthe : URL du fichier servi par Streamlit
+    (le navigateur le télécharge une fois pour toutes les figures) ou, à
+    défaut, GeoJSON embarqué dans la figure.
+
+    None (avec un avertissement) si le magasin local n'a pas été produit
+    et que le téléchargement échoue, hors ligne par exemple.
+    """
+    resolution = resolution_for_zoom(zoom)
+    url = None
+    if st.get_option("server.enableStaticServing"):
+        url = geojson_url(niveau, resolution)
+    if url is not None:
+        return {
+            "geojson": url,
+            "resolution": resolution,
+            "octets": geojson_path(niveau, resolution).stat().st_size,
+            "url": True,
+        }
+    try:
+        return {**load_geojson(niveau, resolution), "url": False}
+    except requests.RequestException as e:
+        st.warning(
+            f"Contours ({niveau}) indisponibles : carte non affichée ({e}). "
+            "Préparez-les hors ligne avec `python -m pipeline run --only geometries`."
+        )
+        return None
+
+
+def plotly_spec_chart(entry: dict) -> float:
+    """
+    Affiche une figure mise en cache par `cached_figure` à partir de son
+    JSON (sans reconstruire la figure Plotly Express). Renvoie le temps
+    d'affichage, en secondes.
+    """
+    start = perf_counter()
+    st.plotly_chart(json.loads(entry["spec"]), use_container_width=True)
+    return round(perf_counter() - start, 3)
+
+
+def figure_caption(entry: dict, affichage_s: float, geo: dict = None) -> str:
+    """Légende des temps de cette exécution pour une figure (et ses contours)."""
+    text = (
+        (
+            f"Figure servie par le cache en {entry['temps_s']} s"
+            if entry["depuis_cache"]
+            else f"Figure construite et sérialisée en {entry['temps_s']} s"
+        )
+        + f" ({entry['octets'] / 1024:.0f} Ko), affichée en {affichage_s} s"
+    )
+    if geo is not None:
+        text += (
+            f" — Contours : résolution {geo['resolution']}, {geo['octets'] / 1024:.0f} Ko, "
+            + (
+                "servis par URL"
+                if geo["url"]
+                else (
+                    "en mémoire"
+                    if geo["depuis_cache"]
+                    else f"chargés en {geo['temps_chargement_s']} s"
+                )
+                + " et embarqués"
+            )
+        )
+    return text
+
+
 # Créer les tabs
 tab1, tab2, tab3, tab4 = st.tabs(
     ["�️ Carte", "📊 Régions & Départements", "ℹ️ Infos", "💬 Assistant IA"]
@@ -26,16 +130,11 @@ tab1, tab2, tab3, tab4 = st.tabs(
 with tab1:
     st.header("🗺️ Carte de répartition des professionnels de santé")
     
-    # Chargement des données
-    df = load_data()
+    # Cube de comptage commune / département / région × profession
+    rollup = get_rollup()
 
-    
     # 🎛️ FILTRE PROFESSION (AU-DESSUS DE LA CARTE)
-    professions_disponibles = sorted(
-        df["profession"]
-        .dropna()
-        .unique()
-    )
+    professions_disponibles = sorted(rollup["profession"].dropna().unique())
 
     selected_professions = st.multiselect(
         "Filtrer par profession",
@@ -43,30 +142,19 @@ with tab1:
         default=["Médecin"] if "Médecin" in professions_disponibles else professions_disponibles[:1],
     )
 
-    # Application du filtre
-    if selected_professions:
-        df = df[df["profession"].isin(selected_professions)]
+    # Application du filtre (sur les lignes du cube, pas sur les données
+    # brutes) ; les agrégats sont mémoïsés par filtre et partagés entre
+    # sessions (utils.aggregates)
+    df = commune_rows(selected_professions)
     # metrics 
-    st.metric("Nombre total de professionnels de santé", f"{len(df):,}")
-    # --- Préparation des données pour la carte ---
-    # On regroupe par localisation (code_postal + coordonnées)
-    df_map = (
-        df.groupby(["code_postal", "commune", "latitude", "longitude"])
-        .agg(
-            nombre_pros=("nom", "count"),
-            # Gestion sécurisée des NaN dans profession
-            professions_exemples=(
-                "profession",
-                lambda x: ", ".join(
-                    [str(p) for p in x.unique()[:3] if pd.notna(p)] or ["Aucune profession"]
-                ),
-            ),
-        )
-        .reset_index()
+    st.metric(
+        "Nombre total de professionnels de santé",
+        f"{int(df['nb_professionnels'].sum()):,}",
     )
-
-    # Suppression des lignes sans coordonnées GPS
-    df_map = df_map.dropna(subset=["latitude", "longitude"])
+    # --- Préparation des données pour la carte ---
+    # Regroupement par localisation (code_postal + coordonnées), avec les
+    # 3 premières professions distinctes, sans les lignes sans GPS
+    df_map = commune_locations(selected_professions)
 
     # Vérification qu'il reste des données
     if df_map.empty:
@@ -76,35 +164,39 @@ with tab1:
         st.stop()
 
     # --- Carte interactive ---
-    fig_map = px.scatter_mapbox(
-        df_map,
-        lat="latitude",
-        lon="longitude",
-        size="nombre_pros",
-        color="nombre_pros",
-        hover_name="commune",
-        hover_data={
-            "code_postal": True,
-            "nombre_pros": True,
-            "professions_exemples": True,
-            "latitude": False,
-            "longitude": False,
-        },
-        zoom=5,
-        height=700,
-        color_continuous_scale=px.colors.sequential.Plasma,
-        size_max=40,
-        title="Professionnels de santé par localisation (France métropolitaine)",
-    )
-
-    fig_map.update_layout(
-        mapbox_style="open-street-map",
-        margin={"r": 0, "t": 50, "l": 0, "b": 0},
-        coloraxis_colorbar=dict(title="Nb de pros"),
+    # Vue choisie (zone + zoom) : seuls les points visibles, agrégés au
+    # niveau adapté au zoom, sont envoyés au navigateur
+    zones = zone_views(selected_professions)
+    col_zone, col_zoom = st.columns([2, 1])
+    with col_zone:
+        zone = st.selectbox("Zone affichée", list(zones))
+    view_lat, view_lon, fit_zoom = zones[zone]
+    with col_zoom:
+        zoom = st.slider("Zoom", 2.0, 12.0, value=fit_zoom, step=0.5, key=f"zoom_{zone}")
+
+    # Carte de chaleur sur la grille précalculée (si le pipeline l'a
+    # produite) : seule la résolution adaptée au zoom est lue
+    representations = ["Points par zone"]
+    resolution = grid_resolution_for_zoom(zoom)
+    if grid_path(resolution).exists():
+        representations.append("Grille de densité")
+    representation = st.radio("Représentation", representations, horizontal=True)
+
+    bbox = BBox.around(view_lat, view_lon, zoom)
+    if representation == "Grille de densité":
+        view = grid_view(resolution, zone, zoom, bbox, selected_professions)
+        st.pydeck_chart(grid_deck(view.points, view_lat, view_lon, zoom))
+        niveau = f"grille {resolution}"
+    else:
+        view = viewport_points(zone, zoom, bbox, selected_professions)
+        st.pydeck_chart(viewport_deck(view.points, view_lat, view_lon, zoom))
+        niveau = view.niveau
+    st.caption(
+        f"{len(view.points):,} points affichés (niveau {niveau}"
+        + (f", {view.nb_zones:,} zones dont les plus dotées" if view.tronque else "")
+        + ")"
     )
 
-    st.plotly_chart(fig_map, use_container_width=True)
-
     # --- Bonus : Top 10 communes ---
     st.markdown("---")
     st.subheader("🏆 Top 10 des communes les plus dotées en professionnels de santé")
@@ -116,18 +208,114 @@ with tab1:
     top_10.index += 1  # Numérotation à partir de 1
     st.dataframe(top_10, use_container_width=True)
 
+    # --- Professionnels les plus proches d'un code postal ---
+    st.markdown("---")
+    st.subheader("📍 Professionnels les plus proches")
+
+    col_cp, col_prof = st.columns([1, 2])
+    with col_cp:
+        code_postal = st.text_input("Code postal", max_chars=5, placeholder="75001")
+    with col_prof:
+        profession_proche = st.selectbox(
+            "Profession recherchée", professions_disponibles, key="profession_proche"
+        )
+    if code_postal:
+        # Coordonnées du code postal (première commune qui le porte)
+        lieux = commune_locations()
+        lieux = lieux[lieux["code_postal"] == code_postal.strip()]
+        if lieux.empty:
+            st.warning(f"Code postal inconnu ou sans coordonnées : {code_postal}")
+        else:
+            lieu = lieux.iloc[0]
+            # Index spatial construit à la première recherche (jeu de
+            # données complet), puis partagé par toutes les sessions
+            index = get_proximity_index()
+            if profession_proche not in index.professions:
+                st.warning(f"Aucun professionnel géolocalisé : {profession_proche}")
+            else:
+                proches = index.nearest(
+                    lieu["latitude"], lieu["longitude"], profession=profession_proche, k=10
+                )
+                # Colonnes d'identité affichées si le fichier source les fournit
+                colonnes = [
+                    column
+                    for column in (
+                        "nom",
+                        "prenom",
+                        "profession",
+                        "commune",
+                        "code_postal",
+                        "distance_km",
+                        "temps_acces_min",
+                    )
+                    if column in proches.columns
+                ]
+                proches = (
+                    proches[colonnes]
+                    .round({"distance_km": 1, "temps_acces_min": 0})
+                    .reset_index(drop=True)
+                )
+                proches.index += 1
+                st.caption(f"Depuis {lieu['commune']} ({lieu['code_postal']})")
+                st.dataframe(proches, use_container_width=True)
+
+    # --- Temps d'accès par commune (couche précalculée par le pipeline) ---
+    if ACCESS_PATH.exists():
+        st.markdown("---")
+        st.subheader("⏱️ Temps d'accès au professionnel le plus proche")
+
+        df_access = get_access_layer()
+        professions_acces = sorted(df_access["profession"].unique())
+        profession_acces = st.selectbox(
+            "Profession",
+            professions_acces,
+            index=professions_acces.index(selected_professions[0])
+            if selected_professions and selected_professions[0] in professions_acces
+            else 0,
+        )
+        df_access = df_access[df_access["profession"] == profession_acces]
+
+        def build_access_figure():
+            fig = px.scatter_mapbox(
+                df_access,
+                lat="latitude",
+                lon="longitude",
+                color="temps_acces_min",
+                hover_name="commune",
+                hover_data={
+                    "distance_km": ":.1f",
+                    "temps_acces_min": ":.0f",
+                    "latitude": False,
+                    "longitude": False,
+                },
+                zoom=5,
+                height=700,
+                color_continuous_scale="RdYlGn_r",
+                title=f"Temps d'accès estimé ({profession_acces}) par commune",
+            )
+            fig.update_traces(marker={"size": 4})
+            fig.update_layout(
+                mapbox_style="open-street-map",
+                margin={"r": 0, "t": 50, "l": 0, "b": 0},
+                coloraxis_colorbar=dict(title="Minutes"),
+            )
+            return fig
+
+        # Figure construite une fois par profession et version de la couche
+        fig_access = cached_figure(
+            ("acces", file_fingerprint(ACCESS_PATH), profession_acces),
+            build_access_figure,
+        )
+        st.caption(figure_caption(fig_access, plotly_spec_chart(fig_access)))
+
 # ============= TAB 2: RÉGIONS & DÉPARTEMENTS =============
 with tab2:
     st.header("📊 Répartition par région et département")
     
-    # Chargement des données
-    df = load_data()
+    # Cube de comptage commune / département / région × profession
+    rollup = get_rollup()
     # 🎛️ FILTRE PROFESSION (AU-DESSUS DE LA CARTE)
-    professions_disponibles = sorted(
-        df["profession"]
-        .dropna()
-        .unique()
-    )
+    professions_disponibles = sorted(rollup["profession"].dropna().unique())
 
     selected_professions = st.multiselect(
         "Filtrer par profession",
@@ -136,160 +324,89 @@ with tab2:
         key="tab2_profession_filter"
     )
 
-    # Application du filtre
-    if selected_professions:
-        df = df[df["profession"].isin(selected_professions)]
+    # Agrégats par région et par département, sommés depuis le cube et
+    # complétés des indicateurs du pipeline (mémoïsés par filtre)
+    df_region = zone_indicators("region", selected_professions)
+    df_dept = zone_indicators("departement", selected_professions)
 
     # Métrique globale
     st.metric(
         f"Nombre total ({', '.join(selected_professions)})",
-        f"{len(df):,}"
+        f"{int(df_region['nombre_pros'].sum()):,}"
     )
+
+    # Indicateur des cartes : effectifs bruts ou densité (si la population
+    # des communes a été préparée par le pipeline)
+    indicateurs = {"Nombre de professionnels": "nombre_pros"}
+    if DENSITY_PATH.exists():
+        indicateurs["Densité pour 10 000 habitants"] = "densite_10k"
+    # Indice 2SFCA : professionnels accessibles pour 10 000 habitants,
+    # moyenne des communes pondérée par leur population
+    if ACCESSIBILITY_PATH.exists():
+        indicateurs["Accessibilité (2SFCA)"] = "indice_2sfca"
+    indicateur = st.radio("Indicateur", list(indicateurs), horizontal=True)
+    color_column = indicateurs[indicateur]
+
+    # Vue des deux cartes : le zoom choisi fixe aussi la résolution des
+    # contours (plus fine sur une région ou un département)
+    zones_cartes = {
+        **zone_views(selected_professions),
+        # Vue nationale centrée sur la métropole
+        "France entière": (46.5, 2.0, 5.0),
+    }
+    col_zone, col_zoom = st.columns([2, 1])
+    with col_zone:
+        zone_carte = st.selectbox("Zone centrée", list(zones_cartes), key="tab2_zone")
+    centre_lat, centre_lon, zoom_zone = zones_cartes[zone_carte]
+    with col_zoom:
+        zoom_carte = st.slider(
+            "Zoom", 2.0, 12.0, value=zoom_zone, step=0.5, key=f"tab2_zoom_{zone_carte}"
+        )
+    vue_carte = (centre_lat, centre_lon, zoom_carte)
+
     # --- Nouvelle carte : Répartition par région ---
     st.subheader("🗺️ Répartition des professionnels de santé par région")
 
-    # Fonction pour mapper code postal → région (via département)
-    def get_region_from_cp(cp: str):
-        if pd.isna(cp) or not cp.isdigit() or len(cp) < 2:
-            return "Inconnue"
-        dept = cp[:2]
-        region_map = {
-            "01": "Auvergne-Rhône-Alpes",
-            "03": "Auvergne-Rhône-Alpes",
-            "07": "Auvergne-Rhône-Alpes",
-            "15": "Auvergne-Rhône-Alpes",
-            "26": "Auvergne-Rhône-Alpes",
-            "38": "Auvergne-Rhône-Alpes",
-            "42": "Auvergne-Rhône-Alpes",
-            "43": "Auvergne-Rhône-Alpes",
-            "63": "Auvergne-Rhône-Alpes",
-            "69": "Auvergne-Rhône-Alpes",
-            "73": "Auvergne-Rhône-Alpes",
-            "74": "Auvergne-Rhône-Alpes",
-            "02": "Hauts-de-France",
-            "59": "Hauts-de-France",
-            "60": "Hauts-de-France",
-            "62": "Hauts-de-France",
-            "80": "Hauts-de-France",
-            "21": "Bourgogne-Franche-Comté",
-            "25": "Bourgogne-Franche-Comté",
-            "39": "Bourgogne-Franche-Comté",
-            "58": "Bourgogne-Franche-Comté",
-            "70": "Bourgogne-Franche-Comté",
-            "71": "Bourgogne-Franche-Comté",
-            "89": "Bourgogne-Franche-Comté",
-            "90": "Bourgogne-Franche-Comté",
-            "22": "Bretagne",
-            "29": "Bretagne",
-            "35": "Bretagne",
-            "56": "Bretagne",
-            "18": "Centre-Val de Loire",
-            "28": "Centre-Val de Loire",
-            "36": "Centre-Val de Loire",
-            "37": "Centre-Val de Loire",
-            "41": "Centre-Val de Loire",
-            "45": "Centre-Val de Loire",
-            "08": "Grand Est",
-            "10": "Grand Est",
-            "51": "Grand Est",
-            "52": "Grand Est",
-            "54": "Grand Est",
-            "55": "Grand Est",
-            "57": "Grand Est",
-            "67": "Grand Est",
-            "68": "Grand Est",
-            "88": "Grand Est",
-            "75": "Île-de-France",
-            "77": "Île-de-France",
-            "78": "Île-de-France",
-            "91": "Île-de-France",
-            "92": "Île-de-France",
-            "93": "Île-de-France",
-            "94": "Île-de-France",
-            "95": "Île-de-France",
-            "14": "Normandie",
-            "27": "Normandie",
-            "50": "Normandie",
-            "61": "Normandie",
-            "76": "Normandie",
-            "16": "Nouvelle-Aquitaine",
-            "17": "Nouvelle-Aquitaine",
-            "19": "Nouvelle-Aquitaine",
-            "23": "Nouvelle-Aquitaine",
-            "24": "Nouvelle-Aquitaine",
-            "33": "Nouvelle-Aquitaine",
-            "40": "Nouvelle-Aquitaine",
-            "47": "Nouvelle-Aquitaine",
-            "64": "Nouvelle-Aquitaine",
-            "79": "Nouvelle-Aquitaine",
-            "86": "Nouvelle-Aquitaine",
-            "87": "Nouvelle-Aquitaine",
-            "09": "Occitanie",
-            "11": "Occitanie",
-            "12": "Occitanie",
-            "30": "Occitanie",
-            "31": "Occitanie",
-            "32": "Occitanie",
-            "34": "Occitanie",
-            "46": "Occitanie",
-            "48": "Occitanie",
-            "65": "Occitanie",
-            "66": "Occitanie",
-            "81": "Occitanie",
-            "82": "Occitanie",
-            "44": "Pays de la Loire",
-            "49": "Pays de la Loire",
-            "53": "Pays de la Loire",
-            "72": "Pays de la Loire",
-            "85": "Pays de la Loire",
-            "04": "Provence-Alpes-Côte d'Azur",
-            "05": "Provence-Alpes-Côte d'Azur",
-            "06": "Provence-Alpes-Côte d'Azur",
-            "13": "Provence-Alpes-Côte d'Azur",
-            "83": "Provence-Alpes-Côte d'Azur",
-            "84": "Provence-Alpes-Côte d'Azur",
-            "2A": "Corse",
-            "2B": "Corse",
-        }
-        return region_map.get(dept, "Inconnue")
-
-    # Ajouter la colonne région
-    df["region"] = df["code_postal"].apply(get_region_from_cp)
-
-    # Compter le nombre de pros par région
-    df_region = df["region"].value_counts().reset_index()
-    df_region.columns = ["nom", "nombre_pros"]
-
-    # Charger le GeoJSON des régions (directement depuis URL)
-    geojson_url = "https://raw.githubusercontent.com/gregoiredavid/france-geojson/master/regions.geojson"
-    response = requests.get(geojson_url)
-    geojson_data = response.json()
-
-    # Carte choroplèthe
-    fig_region = px.choropleth_mapbox(
-        df_region,
-        geojson=geojson_data,
-        locations="nom",
-        featureidkey="properties.nom",  # Clé dans le GeoJSON
-        color="nombre_pros",
-        color_continuous_scale="Viridis",
-        mapbox_style="open-street-map",
-        zoom=4.5,
-        center={"lat": 46.5, "lon": 2},
-        opacity=0.6,
-        hover_name="nom",
-        hover_data={"nombre_pros": True},
-        title="Nombre de professionnels de santé par région",
-        height=700,
-    )
-
-    fig_region.update_layout(margin={"r": 0, "t": 50, "l": 0, "b": 0})
-    st.plotly_chart(fig_region, use_container_width=True)
+    # Contours des régions (magasin local, résolution adaptée au zoom)
+    geo_region = contours("regions", zoom_carte)
+    if geo_region is not None:
+        # Carte choroplèthe (construite une fois par données et indicateur)
+        def build_region_figure():
+            fig = px.choropleth_mapbox(
+                df_region,
+                geojson=geo_region["geojson"],
+                locations="nom",
+                featureidkey="properties.nom",  # Clé dans le GeoJSON
+                color=color_column,
+                color_continuous_scale="Viridis",
+                mapbox_style="open-street-map",
+                zoom=zoom_carte,
+                center={"lat": centre_lat, "lon": centre_lon},
+                opacity=0.6,
+                hover_name="nom",
+                hover_data={column: True for column in indicateurs.values()},
+                title=f"{indicateur} par région",
+                height=700,
+            )
+            fig.update_layout(margin={"r": 0, "t": 50, "l": 0, "b": 0})
+            return fig
+
+        fig_region = cached_figure(
+            (
+                memo_key("region", selected_professions),
+                indicateur,
+                vue_carte,
+                geo_region["resolution"],
+                geo_region["url"],
+            ),
+            build_region_figure,
+        )
+        st.caption(figure_caption(fig_region, plotly_spec_chart(fig_region), geo_region))
 
     # Bonus : Tableau des régions
     st.subheader("📊 Tableau par région")
     st.dataframe(
-        df_region.sort_values("nombre_pros", ascending=False).reset_index(drop=True),
+        df_region.sort_values(color_column, ascending=False).reset_index(drop=True),
         use_container_width=True,
     )
 
@@ -297,169 +414,46 @@ with tab2:
     st.markdown("---")
     st.subheader("🗺️ Répartition des professionnels de santé par département")
 
-    # Fonction pour extraire le code département du code postal
-    def get_dept_from_cp(cp: str):
-        if pd.isna(cp):
-            return "Inconnu"
-        cp_str = str(cp).strip()
-        if len(cp_str) >= 2:
-            dept = cp_str[:2]
-            # Cas spécial Corse (2A/2B) et DOM (97x)
-            if dept == "20":
-                if cp_str.startswith("2A"):
-                    return "2A"
-                elif cp_str.startswith("2B"):
-                    return "2B"
-            if dept == "97":
-                return cp_str[:3]  # 971, 972, etc.
-            return dept
-        return "Inconnu"
-
-    # Ajouter la colonne département
-    df["departement"] = df["code_postal"].apply(get_dept_from_cp)
-
-    # Compter le nombre de pros par département
-    df_dept = df["departement"].value_counts().reset_index()
-    df_dept.columns = ["code", "nombre_pros"]
-
-    # Ajouter le nom du département pour un affichage plus lisible (optionnel, mapping simple)
-    dept_names = {
-        "01": "Ain",
-        "02": "Aisne",
-        "03": "Allier",
-        "04": "Alpes-de-Haute-Provence",
-        "05": "Hautes-Alpes",
-        "06": "Alpes-Maritimes",
-        "07": "Ardèche",
-        "08": "Ardennes",
-        "09": "Ariège",
-        "10": "Aube",
-        "11": "Aude",
-        "12": "Aveyron",
-        "13": "Bouches-du-Rhône",
-        "14": "Calvados",
-        "15": "Cantal",
-        "16": "Charente",
-        "17": "Charente-Maritime",
-        "18": "Cher",
-        "19": "Corrèze",
-        "2A": "Corse-du-Sud",
-        "2B": "Haute-Corse",
-        "21": "Côte-d'Or",
-        "22": "Côtes-d'Armor",
-        "23": "Creuse",
-        "24": "Dordogne",
-        "25": "Doubs",
-        "26": "Drôme",
-        "27": "Eure",
-        "28": "Eure-et-Loir",
-        "29": "Finistère",
-        "30": "Gard",
-        "31": "Haute-Garonne",
-        "32": "Gers",
-        "33": "Gironde",
-        "34": "Hérault",
-        "35": "Ille-et-Vilaine",
-        "36": "Indre",
-        "37": "Indre-et-Loire",
-        "38": "Isère",
-        "39": "Jura",
-        "40": "Landes",
-        "41": "Loir-et-Cher",
-        "42": "Loire",
-        "43": "Haute-Loire",
-        "44": "Loire-Atlantique",
-        "45": "Loiret",
-        "46": "Lot",
-        "47": "Lot-et-Garonne",
-        "48": "Lozère",
-        "49": "Maine-et-Loire",
-        "50": "Manche",
-        "51": "Marne",
-        "52": "Haute-Marne",
-        "53": "Mayenne",
-        "54": "Meurthe-et-Moselle",
-        "55": "Meuse",
-        "56": "Morbihan",
-        "57": "Moselle",
-        "58": "Nièvre",
-        "59": "Nord",
-        "60": "Oise",
-        "61": "Orne",
-        "62": "Pas-de-Calais",
-        "63": "Puy-de-Dôme",
-        "64": "Pyrénées-Atlantiques",
-        "65": "Hautes-Pyrénées",
-        "66": "Pyrénées-Orientales",
-        "67": "Bas-Rhin",
-        "68": "Haut-Rhin",
-        "69": "Rhône",
-        "70": "Haute-Saône",
-        "71": "Saône-et-Loire",
-        "72": "Sarthe",
-        "73": "Savoie",
-        "74": "Haute-Savoie",
-        "75": "Paris",
-        "76": "Seine-Maritime",
-        "77": "Seine-et-Marne",
-        "78": "Yvelines",
-        "79": "Nièvre",
-        "80": "Somme",
-        "81": "Tarn",
-        "82": "Tarn-et-Garonne",
-        "83": "Var",
-        "84": "Vaucluse",
-        "85": "Vendée",
-        "86": "Vienne",
-        "87": "Haute-Vienne",
-        "88": "Vosges",
-        "89": "Yonne",
-        "90": "Territoire de Belfort",
-        "91": "Essonne",
-        "92": "Hauts-de-Seine",
-        "93": "Seine-Saint-Denis",
-        "94": "Val-de-Marne",
-        "95": "Val-d'Oise",
-        "971": "Guadeloupe",
-        "972": "Martinique",
-        "973": "Guyane",
-        "974": "La Réunion",
-        "976": "Mayotte",
-    }
-    df_dept["nom"] = (
-        df_dept["code"].map(dept_names).fillna("Département " + df_dept["code"])
-    )
-
-    # Charger le GeoJSON des départements
-    geojson_url_dept = "https://raw.githubusercontent.com/gregoiredavid/france-geojson/master/departements.geojson"
-    response_dept = requests.get(geojson_url_dept)
-    geojson_dept = response_dept.json()
-
-    # Carte choroplèthe par département
-    fig_dept = px.choropleth_mapbox(
-        df_dept,
-        geojson=geojson_dept,
-        locations="code",
-        featureidkey="properties.code",  # Clé dans le GeoJSON : "code" pour les départements
-        color="nombre_pros",
-        color_continuous_scale="Viridis",
-        mapbox_style="open-street-map",
-        zoom=5,
-        center={"lat": 46.5, "lon": 2},
-        opacity=0.6,
-        hover_name="nom",
-        hover_data={"code": True, "nombre_pros": True},
-        title="Nombre de professionnels de santé par département",
-        height=700,
-    )
-
-    fig_dept.update_layout(margin={"r": 0, "t": 50, "l": 0, "b": 0})
-    st.plotly_chart(fig_dept, use_container_width=True)
+    # Contours des départements (magasin local, résolution adaptée au zoom)
+    geo_dept = contours("departements", zoom_carte)
+    if geo_dept is not None:
+        # Carte choroplèthe par département
+        def build_dept_figure():
+            fig = px.choropleth_mapbox(
+                df_dept,
+                geojson=geo_dept["geojson"],
+                locations="code",
+                featureidkey="properties.code",  # Clé dans le GeoJSON : "code" pour les départements
+                color=color_column,
+                color_continuous_scale="Viridis",
+                mapbox_style="open-street-map",
+                zoom=zoom_carte,
+                center={"lat": centre_lat, "lon": centre_lon},
+                opacity=0.6,
+                hover_name="nom",
+                hover_data={"code": True, **{column: True for column in indicateurs.values()}},
+                title=f"{indicateur} par département",
+                height=700,
+            )
+            fig.update_layout(margin={"r": 0, "t": 50, "l": 0, "b": 0})
+            return fig
+
+        fig_dept = cached_figure(
+            (
+                memo_key("departement", selected_professions),
+                indicateur,
+                vue_carte,
+                geo_dept["resolution"],
+                geo_dept["url"],
+            ),
+            build_dept_figure,
+        )
+        st.caption(figure_caption(fig_dept, plotly_spec_chart(fig_dept), geo_dept))
 
     # Bonus : Tableau des départements
     st.subheader("📊 Tableau par département")
     st.dataframe(
-        df_dept.sort_values("nombre_pros", ascending=False).reset_index(drop=True),
+        df_dept.sort_values(color_column, ascending=False).reset_index(drop=True),
         use_container_width=True,
     )
 
@@ -500,6 +494,29 @@ with tab3:
     with col2:
         st.metric("🗺️ Cartographie", "Complète", delta="Toute la France")
 
+    # Les onglets lisent les agrégats précalculés : le jeu de données
+    # complet n'est chargé que s'il a été nécessaire
+    dataset = loaded_dataset()
+    if dataset is not None:
+        stats = dataset.stats()
+        st.caption(
+            f"Jeu de données : {stats['lignes']:,} lignes, chargé en "
+            f"{stats['temps_chargement_s']} s, {stats['memoire_mo']} Mo en mémoire "
+            f"({stats['octets_par_ligne']} octets/ligne) "
+            "partagé par toutes les sessions"
+        )
+    else:
+        st.caption("Jeu de données complet non chargé : les cartes lisent les agrégats précalculés")
+    for label, cache in (
+        ("Agrégats mémoïsés", get_frame_cache()),
+        ("Figures mémoïsées", get_figure_cache()),
+    ):
+        cache_stats = cache.stats()
+        st.caption(
+            f"{label} : {cache_stats['entrees']} résultats, "
+            f"{cache_stats['memoire_mo']} Mo, taux de succès {cache_stats['taux_succes']:.0%}"
+        )
+
 # ============= TAB 4: CHATBOT =============
 with tab4:
     st.header("💬 Assistant Santé HealthMap")
@@ -510,10 +527,8 @@ with tab4:
     """
     )
 
-    # Charger les données pour obtenir les départements disponibles
-    df_chat = load_data()
-    df_chat["departement"] = df_chat["code_postal"].astype(str).str[:2]
-    dept_list = sorted(df_chat["departement"].dropna().unique().tolist())
+    # Départements disponibles (mêmes codes que ceux analysés par le chatbot)
+    dept_list = sorted(get_departement_summary()["departements"])
     
     # Sélection département (optionnel)
     col1, col2 = st.columns(2)
@@ -542,13 +557,9 @@ with tab4:
         else:
             with st.spinner("Analyse en cours... ⏳"):
                 dept_param = user_dept if user_dept != "--" else None
-                response = st.session_state.chatbot.generate_response(
-                    user_input, dept_param
-                )
-
-                # Sauvegarde dans l'historique
-                st.session_state.messages.append(
-                    {"user": user_input, "response": response}
+                # Analyse IA en flux : affichée au fil de sa génération
+                response = create_chatbot_interface().generate_response(
+                    user_input, dept_param, stream=True
                 )
 
             # Affichage résultats
@@ -582,11 +593,33 @@ with tab4:
                             "Moyenne nationale",
                             coverage["moyenne_nationale"],
                         )
+                        if "densite_10k" in coverage:
+                            st.metric(
+                                "Densité pour 10 000 hab.",
+                                coverage["densite_10k"],
+                                delta=round(
+                                    coverage["densite_10k"]
+                                    - coverage["densite_nationale_10k"],
+                                    1,
+                                ),
+                            )
                         st.info(coverage["statut"])
 
             # Analyse IA
             st.subheader("🤖 Analyse IA détaillée")
-            st.info(response["ia_analysis"])
+            with st.container(border=True):
+                response["ia_analysis"] = st.write_stream(response["ia_analysis"])
+            cache_stats = create_chatbot_interface().cache.stats()
+            st.caption(
+                ("Réponse servie par le cache. " if response["from_cache"] else "")
+                + f"Cache : {cache_stats['entrees']} réponses, "
+                f"taux de succès {cache_stats['taux_succes']:.0%}"
+            )
+
+            # Sauvegarde dans l'historique (texte complet de l'analyse)
+            st.session_state.messages.append(
+                {"user": user_input, "response": response}
+            )
 
             # Alerte urgence
             if urgency_hint or "urgent" in response["ia_analysis"].lower():
@@ -0,0 +1,70 @@
+"""
+Benchmark : exemples de professions par localisation (carte de l'onglet 1).
+
+Compare l'agrégation historique (lambda Python par groupe) au noyau
+vectorisé `utils.metrics.first_distinct`, sur le jeu de données complet.
+
+Lancement depuis la racine du projet :
+    python -m benchmarks.professions_exemples
+"""
+
+import argparse
+from time import perf_counter
+
+import pandas as pd
+
+from utils.data import load_data
+from utils.metrics import first_distinct
+
+LOCATION_KEYS = ["code_postal", "commune", "latitude", "longitude"]
+
+
+def with_lambda(df: pd.DataFrame) -> pd.Series:
+    """Agrégation d'origine de app_streamlit.py."""
+    return df.groupby(LOCATION_KEYS, observed=True, sort=False)["profession"].agg(
+        lambda x: ", ".join(
+            [str(p) for p in x.unique()[:3] if pd.notna(p)] or ["Aucune profession"]
+        )
+    )
+
+
+def with_kernel(df: pd.DataFrame) -> pd.Series:
+    """Noyau vectorisé."""
+    return first_distinct(df, LOCATION_KEYS)
+
+
+def best_time(func, df: pd.DataFrame, repeat: int) -> tuple[float, pd.Series]:
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        result = func(df)
+        timings.append(perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--professions",
+        nargs="*",
+        help="Professions sélectionnées (toutes par défaut)",
+    )
+    args = parser.parse_args()
+
+    df = load_data(filters={"profession": args.professions})
+    print(f"{len(df):,} lignes")
+
+    t_lambda, expected = best_time(with_lambda, df, args.repeat)
+    t_kernel, result = best_time(with_kernel, df, args.repeat)
+
+    identical = expected.index.equals(result.index) and (
+        expected.to_numpy() == result.to_numpy()
+    ).all()
+    print(f"{expected.size:,} localisations, résultats identiques : {identical}")
+    print(f"lambda     : {t_lambda * 1000:9.1f} ms")
+    print(f"vectorisé  : {t_kernel * 1000:9.1f} ms  (x{t_lambda / t_kernel:.1f})")
+
+
+if __name__ == "__main__":
+    main()
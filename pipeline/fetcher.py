@@ -1,73 +1,133 @@
-import pandas as pd
+"""
+Étape fetch : extraction des sources brutes (communes, contours).
+"""
+
 import json
+import re
+from pathlib import Path
+from typing import IO, Iterator
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pipeline.geometries import build_geometry_store
+from pipeline.storage import COMMUNES_PATH, COMMUNES_SOURCE, atomic_path
+
+# Champs conservés du fichier des communes → colonne et type en sortie
+COMMUNE_FIELDS = {
+    "code_insee": ("code_insee", pa.string()),
+    "code_postal": ("code_postal", pa.string()),
+    "latitude_mairie": ("latitude", pa.float64()),
+    "longitude_mairie": ("longitude", pa.float64()),
+    "latitude_centre": ("latitude_centre", pa.float64()),
+    "longitude_centre": ("longitude_centre", pa.float64()),
+    "nom_standard": ("nom_standard", pa.string()),
+    "dep_code": ("departement", pa.string()),
+    "population": ("population", pa.int64()),
+}
+
+_READ_SIZE = 1 << 20
+_BATCH_SIZE = 10_000
+
+
+def iter_json_records(f: IO[str], key: str = "data") -> Iterator[dict]:
+    """
+    Parcourt un par un les objets du tableau `key` d'un document JSON.
+
+    Le document n'est jamais chargé en entier : seul l'objet en cours de
+    décodage (et un bloc de lecture) est en mémoire.
+
+    Args:
+        f: Fichier texte ouvert, de la forme {..., "key": [{...}, {...}], ...}
+        key: Clé du tableau d'objets à parcourir
+    """
+    decoder = json.JSONDecoder()
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+
+    buffer = ""
+    while (match := start.search(buffer)) is None:
+        chunk = f.read(_READ_SIZE)
+        if not chunk:
+            raise ValueError(f"Tableau '{key}' introuvable dans le JSON")
+        # On garde la fin du bloc précédent si l'en-tête est à cheval
+        buffer = buffer[-64:] + chunk
+    buffer, pos = buffer[match.end():], 0
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        try:
+            if pos == len(buffer):
+                raise json.JSONDecodeError("fin du bloc", buffer, pos)
+            record, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Objet incomplet : on lit le bloc suivant
+            chunk = f.read(_READ_SIZE)
+            if not chunk:
+                raise ValueError(f"Tableau '{key}' tronqué") from None
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield record
+
+
+def _cast(value, type_: pa.DataType):
+    if value is None or value == "":
+        return None
+    if pa.types.is_string(type_):
+        return str(value)
+    if pa.types.is_integer(type_):
+        return int(value)
+    return value
+
+
+def _commune_batch(rows: list[dict], schema: pa.Schema) -> pa.RecordBatch:
+    return pa.RecordBatch.from_pylist(rows, schema=schema)
+
+
+def extract_communes(source: Path = COMMUNES_SOURCE, dest: Path = COMMUNES_PATH) -> Path:
+    """
+    Extrait code INSEE, code postal, coordonnées (mairie et centre), nom,
+    département et population des communes.
+
+    Le JSON (polygones compris) est lu en flux et seules les colonnes
+    utiles sont gardées, par lots écrits directement dans le parquet.
+
+    Args:
+        source: JSON des communes (data.gouv.fr, avec polygones)
+        dest: Parquet de sortie
+
+    Returns:
+        Chemin du fichier écrit
+    """
+    schema = pa.schema([(name, type_) for name, type_ in COMMUNE_FIELDS.values()])
+
+    count = 0
+    with open(source, "r", encoding="utf-8") as f, atomic_path(dest) as tmp:
+        with pq.ParquetWriter(tmp, schema) as writer:
+            rows = []
+            for record in iter_json_records(f):
+                row = {
+                    column: _cast(record.get(field), type_)
+                    for field, (column, type_) in COMMUNE_FIELDS.items()
+                }
+                # Normaliser code_postal
+                if row["code_postal"] is not None:
+                    row["code_postal"] = row["code_postal"].zfill(5)
+                rows.append(row)
+                if len(rows) >= _BATCH_SIZE:
+                    writer.write_batch(_commune_batch(rows, schema))
+                    count += len(rows)
+                    rows = []
+            if rows:
+                writer.write_batch(_commune_batch(rows, schema))
+                count += len(rows)
+
+    print(f"{count} communes extraites : {dest}")
+    return dest
+
 
-# 1. Charger le fichier Parquet des professionnels
-df_prof = pd.read_parquet("./data/professionnels_sante.parquet")
-
-# Normaliser code_postal comme string 5 chiffres
-df_prof["code_postal"] = df_prof["code_postal"].astype(str).str.zfill(5)
-
-# 2. Charger le JSON des communes
-with open("./data/communes-france-avec-polygon-2025.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-df_communes = pd.DataFrame(data["data"])
-
-# Sélectionner les colonnes utiles
-df_communes = df_communes[
-    ["code_postal", "latitude_mairie", "longitude_mairie", "nom_standard"]
-]
-
-# Normaliser code_postal
-df_communes["code_postal"] = df_communes["code_postal"].astype(str).str.zfill(5)
-
-# Renommer pour plus de clarté
-df_communes = df_communes.rename(
-    columns={"latitude_mairie": "latitude", "longitude_mairie": "longitude"}
-)
-
-# === CORRECTION : Dédupliquer pour avoir UNE SEULE coordonnée par code postal ===
-# keep="first" garde la première commune rencontrée (souvent la principale)
-df_communes_unique = df_communes.drop_duplicates(subset="code_postal", keep="first")
-
-print(
-    f"Nombre de codes postaux uniques après déduplication : {len(df_communes_unique)}"
-)
-# (Comparaison : avant déduplication il y en avait probablement plus)
-
-# 3. Merge avec les coordonnées uniques
-df_merged = df_prof.merge(
-    df_communes_unique[["code_postal", "latitude", "longitude"]],
-    on="code_postal",
-    how="left",
-)
-
-# 4. Vérifier les manquants
-manquants = df_merged[df_merged["latitude"].isna()]
-if not manquants.empty:
-    print(f"\n{len(manquants)} lignes sans coordonnées trouvées.")
-    print("Exemples de codes postaux/communes concernés :")
-    print(manquants[["code_postal", "commune"]].drop_duplicates().head(20))
-else:
-    print("\nAucune coordonnée manquante !")
-
-# 5. Sauvegarder le fichier final
-output_path = "./data/fichier_professionnels_avec_coords.parquet"
-df_merged.to_parquet(output_path, index=False)
-
-print("\nFusion terminée avec succès !")
-print(f"Fichier sauvegardé : {output_path}")
-print("\nAperçu des 10 premières lignes :")
-print(
-    df_merged[
-        [
-            "code_postal",
-            "commune",
-            "profession",
-            "nom",
-            "prenom",
-            "latitude",
-            "longitude",
-        ]
-    ].head(10)
-)
+def fetch_geometries() -> None:
+    """Télécharge et simplifie les contours des régions et départements."""
+    build_geometry_store()
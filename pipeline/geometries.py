@@ -0,0 +1,84 @@
+"""
+Magasin local des contours GeoJSON (régions, départements).
+
+Les fichiers france-geojson sont téléchargés une seule fois, puis
+simplifiés à plusieurs tolérances en préservant la topologie partagée
+entre zones voisines (pas de trous ni de chevauchements aux frontières).
+
+Lancement depuis la racine du projet :
+    python -m pipeline.geometries
+"""
+
+from pathlib import Path
+
+import geopandas as gpd
+import requests
+
+from utils.data import GEO_DIR, GEO_RESOLUTIONS, GEOJSON_URLS, geojson_path
+
+# Précision des coordonnées écrites (5 décimales ≈ 1 m)
+COORDINATE_PRECISION = 5
+
+
+def download_geometry(niveau: str, geo_dir: Path = GEO_DIR, force: bool = False) -> Path:
+    """
+    Télécharge le GeoJSON source d'un niveau s'il n'est pas déjà présent.
+
+    Returns:
+        Chemin du fichier source local
+    """
+    geo_dir.mkdir(parents=True, exist_ok=True)
+    source = geo_dir / f"{niveau}_source.geojson"
+    if source.exists() and not force:
+        return source
+
+    response = requests.get(GEOJSON_URLS[niveau], timeout=60)
+    response.raise_for_status()
+    source.write_bytes(response.content)
+    return source
+
+
+def simplify_geometry(source: Path, niveau: str) -> dict[str, Path]:
+    """
+    Écrit une version simplifiée du GeoJSON pour chaque résolution.
+
+    Returns:
+        Chemins des fichiers écrits, par résolution
+    """
+    gdf = gpd.read_file(source)
+
+    written = {}
+    for resolution, tolerance in GEO_RESOLUTIONS.items():
+        simplified = gdf.copy()
+        # Simplification de couverture : les frontières communes sont
+        # simplifiées une seule fois et restent partagées
+        simplified["geometry"] = gdf.geometry.simplify_coverage(tolerance)
+
+        path = geojson_path(niveau, resolution)
+        simplified.to_file(
+            path, driver="GeoJSON", COORDINATE_PRECISION=COORDINATE_PRECISION
+        )
+        written[resolution] = path
+    return written
+
+
+def build_geometry_store(force: bool = False) -> dict[str, dict[str, Path]]:
+    """Télécharge et simplifie les contours de tous les niveaux."""
+    store = {}
+    for niveau in GEOJSON_URLS:
+        source = download_geometry(niveau, force=force)
+        store[niveau] = simplify_geometry(source, niveau)
+    return store
+
+
+def main():
+    store = build_geometry_store()
+    for niveau, paths in store.items():
+        source_size = (GEO_DIR / f"{niveau}_source.geojson").stat().st_size
+        print(f"{niveau} (source : {source_size / 1024:.0f} Ko)")
+        for resolution, path in paths.items():
+            print(f"  {resolution:<10} {path.stat().st_size / 1024:8.0f} Ko  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Orchestration du pipeline HealthMap : fetch → transform → store.
+
+Chaque étape déclare ses entrées et sorties ; elle est sautée si les
+empreintes de ses entrées et de ses paramètres n'ont pas changé depuis la
+dernière exécution et que ses sorties sont intactes.
+
+Lancement depuis la racine du projet :
+    python -m pipeline run [--force] [--only ETAPE ...]
+                           [--memory-limit 2GB] [--threads 4]
+    python -m pipeline status
+"""
+
+import argparse
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Optional
+
+from pipeline.fetcher import COMMUNE_FIELDS, extract_communes, fetch_geometries
+from pipeline.storage import (
+    ACCESS_OUTPUT,
+    ACCESSIBILITY_OUTPUT,
+    COMMUNES_PATH,
+    COMMUNES_SOURCE,
+    DATABASE_OUTPUT,
+    DENSITY_OUTPUT,
+    GEOMETRY_DIR,
+    GRID_OUTPUT,
+    MANIFEST_PATH,
+    PROFESSIONALS_PATH,
+    PROFESSIONALS_SOURCE,
+    ROLLUP_OUTPUT,
+    DUCKDB_CONFIG,
+    Manifest,
+    fingerprint,
+    params_fingerprint,
+)
+from pipeline.transformer import (
+    build_database,
+    build_grid,
+    compute_access_times,
+    compute_accessibility,
+    compute_density,
+    merge_coordinates,
+    rollup_professionals,
+)
+from utils.data import GEO_RESOLUTIONS, GEOJSON_URLS, GRID_RESOLUTIONS
+
+
+@dataclass
+class Stage:
+    """Étape du pipeline."""
+
+    name: str
+    run: Callable[[], object]
+    inputs: list[Path]
+    outputs: list[Path]
+    params: dict = field(default_factory=dict)
+
+
+# Paramètres du calcul des temps d'accès (voir compute_access_times)
+ACCESS_PARAMS = {"n_nearest": 3, "speed_kmh": 40}
+# Paramètres de l'indice 2SFCA (voir compute_accessibility)
+ACCESSIBILITY_PARAMS = {"radius_km": 30, "decay": "gaussienne"}
+
+STAGES = [
+    Stage(
+        "communes",
+        lambda: extract_communes(COMMUNES_SOURCE, COMMUNES_PATH),
+        inputs=[COMMUNES_SOURCE],
+        outputs=[COMMUNES_PATH],
+        params={"champs": list(COMMUNE_FIELDS)},
+    ),
+    Stage(
+        "geometries",
+        fetch_geometries,
+        inputs=[],
+        outputs=[GEOMETRY_DIR],
+        params={"urls": GEOJSON_URLS, "resolutions": GEO_RESOLUTIONS},
+    ),
+    Stage(
+        "professionnels",
+        lambda: merge_coordinates(PROFESSIONALS_SOURCE, COMMUNES_PATH, PROFESSIONALS_PATH),
+        inputs=[PROFESSIONALS_SOURCE, COMMUNES_PATH],
+        outputs=[PROFESSIONALS_PATH],
+    ),
+    Stage(
+        "grille",
+        lambda: build_grid(PROFESSIONALS_PATH, GRID_OUTPUT, GRID_RESOLUTIONS),
+        inputs=[PROFESSIONALS_PATH],
+        outputs=[GRID_OUTPUT],
+        params={"resolutions": GRID_RESOLUTIONS},
+    ),
+    Stage(
+        "rollup",
+        lambda: rollup_professionals(PROFESSIONALS_PATH, ROLLUP_OUTPUT),
+        inputs=[PROFESSIONALS_PATH],
+        outputs=[ROLLUP_OUTPUT],
+    ),
+    Stage(
+        "densite",
+        lambda: compute_density(ROLLUP_OUTPUT, COMMUNES_PATH, DENSITY_OUTPUT),
+        inputs=[ROLLUP_OUTPUT, COMMUNES_PATH],
+        outputs=[DENSITY_OUTPUT],
+    ),
+    Stage(
+        "acces",
+        lambda: compute_access_times(
+            COMMUNES_PATH, PROFESSIONALS_PATH, ACCESS_OUTPUT, **ACCESS_PARAMS
+        ),
+        inputs=[COMMUNES_PATH, PROFESSIONALS_PATH],
+        outputs=[ACCESS_OUTPUT],
+        params=ACCESS_PARAMS,
+    ),
+    Stage(
+        "accessibilite",
+        lambda: compute_accessibility(
+            COMMUNES_PATH, PROFESSIONALS_PATH, ACCESSIBILITY_OUTPUT, **ACCESSIBILITY_PARAMS
+        ),
+        inputs=[COMMUNES_PATH, PROFESSIONALS_PATH],
+        outputs=[ACCESSIBILITY_OUTPUT],
+        params=ACCESSIBILITY_PARAMS,
+    ),
+    Stage(
+        "base",
+        lambda: build_database(PROFESSIONALS_PATH, COMMUNES_PATH, dest=DATABASE_OUTPUT),
+        inputs=[
+            PROFESSIONALS_PATH,
+            COMMUNES_PATH,
+            ROLLUP_OUTPUT,
+            DENSITY_OUTPUT,
+            ACCESS_OUTPUT,
+            ACCESSIBILITY_OUTPUT,
+        ],
+        outputs=[DATABASE_OUTPUT],
+    ),
+]
+
+
+def _fingerprints(paths: list[Path], known: dict) -> dict:
+    return {str(p): fingerprint(p, known.get(str(p))) for p in paths}
+
+
+def _digests(fingerprints: dict) -> dict:
+    return {path: fp and fp["sha256"] for path, fp in fingerprints.items()}
+
+
+def is_up_to_date(stage: Stage, manifest: Manifest) -> bool:
+    """Indique si les entrées, paramètres et sorties d'une étape sont inchangés."""
+    previous = manifest.get(stage.name)
+    if not previous:
+        return False
+
+    inputs = _fingerprints(stage.inputs, previous.get("inputs", {}))
+    outputs = _fingerprints(stage.outputs, previous.get("outputs", {}))
+    return (
+        previous.get("params") == params_fingerprint(stage.params)
+        and _digests(inputs) == _digests(previous.get("inputs", {}))
+        and all(outputs.values())
+        and _digests(outputs) == _digests(previous.get("outputs", {}))
+    )
+
+
+def run_stage(stage: Stage, manifest: Manifest, force: bool = False) -> bool:
+    """
+    Exécute une étape si nécessaire et enregistre ses empreintes.
+
+    Returns:
+        True si l'étape a été exécutée, False si elle était à jour
+    """
+    if not force and is_up_to_date(stage, manifest):
+        print(f"[{stage.name}] à jour, étape sautée")
+        return False
+
+    missing = [str(p) for p in stage.inputs if not p.exists()]
+    if missing:
+        raise FileNotFoundError(f"[{stage.name}] entrées manquantes : {missing}")
+
+    previous = manifest.get(stage.name)
+    inputs = _fingerprints(stage.inputs, previous.get("inputs", {}))
+
+    print(f"[{stage.name}] exécution...")
+    start = perf_counter()
+    stage.run()
+    elapsed = perf_counter() - start
+
+    outputs = _fingerprints(stage.outputs, {})
+    manifest.record(stage.name, inputs, outputs, params_fingerprint(stage.params))
+    print(f"[{stage.name}] terminé en {elapsed:.1f} s")
+    return True
+
+
+def run(
+    only: Optional[list[str]] = None,
+    force: bool = False,
+    manifest_path: Path = MANIFEST_PATH,
+) -> list[str]:
+    """
+    Exécute le pipeline dans l'ordre des étapes.
+
+    Args:
+        only: Noms des étapes à considérer (toutes si None)
+        force: Réexécuter même les étapes à jour
+
+    Returns:
+        Noms des étapes effectivement exécutées
+    """
+    known = {stage.name for stage in STAGES}
+    unknown = set(only or []) - known
+    if unknown:
+        raise ValueError(f"Étapes inconnues : {sorted(unknown)}")
+
+    manifest = Manifest(manifest_path)
+    executed = []
+    for stage in STAGES:
+        if only and stage.name not in only:
+            continue
+        if run_stage(stage, manifest, force=force):
+            executed.append(stage.name)
+    return executed
+
+
+def status(manifest_path: Path = MANIFEST_PATH) -> None:
+    """Affiche l'état de chaque étape."""
+    manifest = Manifest(manifest_path)
+    for stage in STAGES:
+        previous = manifest.get(stage.name)
+        state = "à jour" if is_up_to_date(stage, manifest) else "à exécuter"
+        last_run = previous.get("execute_le", "jamais")
+        print(f"{stage.name:<16} {state:<12} dernière exécution : {last_run}")
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m pipeline", description="Pipeline HealthMap")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Exécuter les étapes périmées")
+    run_parser.add_argument("--force", action="store_true", help="Tout réexécuter")
+    run_parser.add_argument(
+        "--only",
+        nargs="+",
+        metavar="ETAPE",
+        choices=[stage.name for stage in STAGES],
+        help="Étapes à considérer",
+    )
+    run_parser.add_argument(
+        "--memory-limit", help="Mémoire maximale de DuckDB (ex : 2GB)"
+    )
+    run_parser.add_argument("--threads", type=int, help="Nombre de threads DuckDB")
+    commands.add_parser("status", help="État des étapes")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        if args.memory_limit:
+            DUCKDB_CONFIG["memory_limit"] = args.memory_limit
+        if args.threads:
+            DUCKDB_CONFIG["threads"] = args.threads
+        executed = run(only=args.only, force=args.force)
+        print(f"Étapes exécutées : {', '.join(executed) or 'aucune'}")
+    else:
+        status()
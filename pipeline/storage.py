@@ -0,0 +1,188 @@
+"""
+Stockage du pipeline : chemins des fichiers, écritures atomiques,
+empreintes de contenu et manifeste des étapes déjà exécutées.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+import duckdb
+
+from utils.data import (
+    ACCESS_PATH,
+    ACCESSIBILITY_PATH,
+    DATA_PATH,
+    DENSITY_PATH,
+    GEO_DIR,
+    GRID_DIR,
+    ROLLUP_PATH,
+)
+from utils.db import DB_PATH
+
+DATA_DIR = Path("data")
+
+# Sources brutes
+PROFESSIONALS_SOURCE = DATA_DIR / "professionnels_sante.parquet"
+COMMUNES_SOURCE = DATA_DIR / "communes-france-avec-polygon-2025.json"
+
+# Sorties des étapes
+COMMUNES_PATH = DATA_DIR / "communes.parquet"
+PROFESSIONALS_PATH = DATA_PATH
+ROLLUP_OUTPUT = ROLLUP_PATH
+ACCESS_OUTPUT = ACCESS_PATH
+ACCESSIBILITY_OUTPUT = ACCESSIBILITY_PATH
+DENSITY_OUTPUT = DENSITY_PATH
+GRID_OUTPUT = GRID_DIR
+GEOMETRY_DIR = GEO_DIR
+DATABASE_OUTPUT = DB_PATH
+
+MANIFEST_PATH = DATA_DIR / "pipeline_manifest.json"
+
+# Ressources allouées à DuckDB par les étapes du pipeline (None = valeur
+# par défaut de DuckDB) ; modifiables via `python -m pipeline run
+# --memory-limit 2GB --threads 4`. Au-delà de la limite mémoire, DuckDB
+# déborde sur disque dans temp_directory.
+DUCKDB_CONFIG = {
+    "memory_limit": None,
+    "threads": None,
+    "temp_directory": str(DATA_DIR / ".duckdb_tmp"),
+}
+
+_CHUNK_SIZE = 1 << 20
+
+
+@contextmanager
+def atomic_path(dest: Path) -> Iterator[Path]:
+    """
+    Fournit un chemin temporaire qui remplace `dest` en fin de bloc.
+
+    Une étape interrompue ne laisse donc jamais de fichier à moitié écrit.
+    Le chemin temporaire peut aussi recevoir un répertoire (jeu
+    partitionné), qui remplace alors `dest` en bloc.
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.tmp")
+    old = dest.with_name(f".{dest.name}.old")
+    try:
+        yield tmp
+        if tmp.is_dir() and dest.exists():
+            # Un répertoire non vide ne peut pas être remplacé directement
+            os.replace(dest, old)
+        os.replace(tmp, dest)
+    finally:
+        for path in (tmp, old):
+            _remove(path)
+
+
+def _remove(path: Path):
+    if path.is_dir():
+        shutil.rmtree(path)
+    elif path.exists():
+        path.unlink()
+
+
+def duckdb_connect(database: str = ":memory:") -> duckdb.DuckDBPyConnection:
+    """Connexion DuckDB (en mémoire par défaut) configurée selon DUCKDB_CONFIG."""
+    config = {k: str(v) for k, v in DUCKDB_CONFIG.items() if v is not None}
+    return duckdb.connect(database, config=config)
+
+
+def sql_path(path: Path) -> str:
+    """Chemin de fichier sous forme de littéral SQL."""
+    return "'" + Path(path).as_posix().replace("'", "''") + "'"
+
+
+def _file_record(path: Path, known: Optional[dict]) -> dict:
+    stat = path.stat()
+    if (
+        known
+        and known.get("mtime_ns") == stat.st_mtime_ns
+        and known.get("size") == stat.st_size
+    ):
+        # Fichier inchangé depuis la dernière empreinte : pas de relecture
+        return known
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            digest.update(chunk)
+    return {
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": digest.hexdigest(),
+    }
+
+
+def fingerprint(path: Path, known: Optional[dict] = None) -> Optional[dict]:
+    """
+    Empreinte SHA-256 d'un fichier ou d'un répertoire (None s'il n'existe pas).
+
+    Args:
+        path: Fichier ou répertoire
+        known: Empreinte précédente, réutilisée si mtime et taille n'ont
+            pas changé
+
+    Returns:
+        {"sha256", ...} ; pour un répertoire, l'empreinte combine celles
+        de tous ses fichiers
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    if path.is_file():
+        return _file_record(path, known)
+
+    known_files = (known or {}).get("files", {})
+    files = {
+        str(child.relative_to(path)): _file_record(
+            child, known_files.get(str(child.relative_to(path)))
+        )
+        for child in sorted(path.rglob("*"))
+        if child.is_file() and not child.name.startswith(".")
+    }
+    digest = hashlib.sha256()
+    for name, record in files.items():
+        digest.update(f"{name}:{record['sha256']}\n".encode())
+    return {"sha256": digest.hexdigest(), "files": files}
+
+
+def params_fingerprint(params: dict) -> str:
+    """Empreinte des paramètres d'une étape."""
+    payload = json.dumps(params, sort_keys=True, default=str).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+class Manifest:
+    """Journal des étapes exécutées : empreintes des entrées et sorties."""
+
+    def __init__(self, path: Path = MANIFEST_PATH):
+        self.path = Path(path)
+        self.stages: dict[str, dict] = {}
+        if self.path.exists():
+            self.stages = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def get(self, stage: str) -> dict:
+        return self.stages.get(stage, {})
+
+    def record(self, stage: str, inputs: dict, outputs: dict, params: str):
+        self.stages[stage] = {
+            "inputs": inputs,
+            "outputs": outputs,
+            "params": params,
+            "execute_le": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        self.save()
+
+    def save(self):
+        with atomic_path(self.path) as tmp:
+            tmp.write_text(
+                json.dumps(self.stages, indent=2, ensure_ascii=False),
+                encoding="utf-8",
+            )
@@ -0,0 +1,495 @@
+"""
+Étape transform : jointure professionnels × communes et agrégats.
+"""
+
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pipeline.storage import (
+    ACCESS_OUTPUT,
+    ACCESSIBILITY_OUTPUT,
+    COMMUNES_PATH,
+    DATABASE_OUTPUT,
+    DENSITY_OUTPUT,
+    GRID_OUTPUT,
+    PROFESSIONALS_PATH,
+    PROFESSIONALS_SOURCE,
+    ROLLUP_OUTPUT,
+    atomic_path,
+    duckdb_connect,
+    sql_path,
+)
+from utils.accessibility import DEFAULT_RADIUS_KM, accessibility_index
+from utils.data import (
+    GRID_RESOLUTIONS,
+    PARTITION_COLUMNS,
+    grid_path,
+    load_data,
+    parquet_source,
+)
+from utils.geo import (
+    DEPARTEMENT_TO_REGION,
+    DEPARTEMENTS,
+    INCONNU,
+    REGION_INCONNUE,
+    ProximityIndex,
+    departement_sql,
+    estimate_travel_time,
+    grid_cell_size,
+)
+from utils.metrics import build_density, build_rollup
+
+ACCESS_SCHEMA = pa.schema(
+    [
+        ("code_insee", pa.string()),
+        ("commune", pa.string()),
+        ("departement", pa.string()),
+        ("latitude", pa.float32()),
+        ("longitude", pa.float32()),
+        ("profession", pa.string()),
+        ("distance_km", pa.float32()),
+        ("temps_acces_min", pa.float32()),
+        ("distance_moyenne_km", pa.float32()),
+        ("temps_acces_moyen_min", pa.float32()),
+    ]
+)
+
+
+def merge_coordinates(
+    professionals: Path = PROFESSIONALS_SOURCE,
+    communes: Path = COMMUNES_PATH,
+    dest: Path = PROFESSIONALS_PATH,
+) -> Path:
+    """
+    Ajoute à chaque professionnel les coordonnées de sa commune.
+
+    Une seule requête DuckDB hors mémoire : lecture des parquets,
+    déduplication des communes, jointure et écriture du résultat, sans
+    passer par pandas. Les ressources utilisées suivent DUCKDB_CONFIG.
+
+    Le résultat est partitionné par département puis par profession
+    (departement=.../profession=...) ; dans chaque partition, les lignes
+    sont triées par code postal pour que les statistiques min/max des
+    groupes de lignes permettent d'en sauter.
+
+    Args:
+        professionals: Parquet des professionnels (annuaire Cnam)
+        communes: Parquet des communes (étape fetch)
+        dest: Répertoire de sortie
+
+    Returns:
+        Chemin du répertoire écrit
+    """
+    con = duckdb_connect()
+    try:
+        nb_codes = con.execute(
+            f"SELECT count(DISTINCT code_postal) FROM read_parquet({sql_path(communes)})"
+        ).fetchone()[0]
+        print(f"Nombre de codes postaux uniques après déduplication : {nb_codes}")
+
+        with atomic_path(dest) as tmp:
+            con.execute(
+                f"""
+                COPY (
+                    -- UNE SEULE coordonnée par code postal : la première
+                    -- commune rencontrée (souvent la principale)
+                    WITH communes AS (
+                        SELECT code_postal, latitude, longitude
+                        FROM read_parquet({sql_path(communes)}, file_row_number = true)
+                        QUALIFY row_number() OVER (
+                            PARTITION BY code_postal ORDER BY file_row_number
+                        ) = 1
+                    ),
+                    professionnels AS (
+                        -- Normaliser code_postal comme string 5 chiffres
+                        SELECT * REPLACE (
+                            lpad(CAST(code_postal AS VARCHAR), 5, '0') AS code_postal
+                        )
+                        FROM read_parquet({sql_path(professionals)}, file_row_number = true)
+                    )
+                    SELECT
+                        p.* EXCLUDE (file_row_number),
+                        c.latitude,
+                        c.longitude,
+                        {departement_sql("p.code_postal")} AS departement
+                    FROM professionnels p
+                    LEFT JOIN communes c USING (code_postal)
+                    ORDER BY departement, p.profession, p.code_postal, p.file_row_number
+                ) TO {sql_path(tmp)} (
+                    FORMAT parquet,
+                    COMPRESSION zstd,
+                    PARTITION_BY ({", ".join(PARTITION_COLUMNS)})
+                )
+                """
+            )
+
+        # Vérifier les manquants
+        source = parquet_source(dest)
+        nb_manquants = con.execute(
+            f"SELECT count(*) FROM {source} WHERE latitude IS NULL"
+        ).fetchone()[0]
+        if nb_manquants:
+            print(f"{nb_manquants} lignes sans coordonnées trouvées.")
+            print("Exemples de codes postaux/communes concernés :")
+            print(
+                con.execute(
+                    f"""
+                    SELECT DISTINCT code_postal, commune FROM {source}
+                    WHERE latitude IS NULL LIMIT 20
+                    """
+                ).df()
+            )
+        else:
+            print("Aucune coordonnée manquante !")
+    finally:
+        con.close()
+
+    nb_files = sum(1 for _ in Path(dest).rglob("*.parquet"))
+    print(f"Jeu partitionné sauvegardé : {dest} ({nb_files} fichiers)")
+    return dest
+
+
+def rollup_professionals(
+    professionals: Path = PROFESSIONALS_PATH, dest: Path = ROLLUP_OUTPUT
+) -> Path:
+    """
+    Cube de comptage (commune / département / région × profession),
+    calculé sur les données telles que l'application les charge.
+
+    Returns:
+        Chemin du fichier écrit
+    """
+    df_rollup = build_rollup(load_data(professionals, columns=["commune", "profession"]))
+
+    with atomic_path(dest) as tmp:
+        df_rollup.to_parquet(tmp, index=False)
+
+    print(f"Cube de comptage sauvegardé : {dest} ({len(df_rollup)} lignes)")
+    return dest
+
+
+def build_grid(
+    professionals: Path = PROFESSIONALS_PATH,
+    dest: Path = GRID_OUTPUT,
+    resolutions: dict[str, float] = GRID_RESOLUTIONS,
+) -> Path:
+    """
+    Grille de comptage multi-résolution : nombre de professionnels par
+    cellule carrée et par profession, un fichier par résolution.
+
+    Agrégation DuckDB directement sur le parquet des professionnels,
+    sans passer par pandas. Les cellules sont repérées par leurs indices
+    (ix, iy) et leur centre.
+
+    Args:
+        resolutions: Côté des cellules en km, par nom de résolution
+
+    Returns:
+        Répertoire des fichiers écrits
+    """
+    source = parquet_source(professionals)
+    con = duckdb_connect()
+    try:
+        for resolution, cell_km in resolutions.items():
+            # Littéraux typés DOUBLE (sinon DECIMAL, qui déborde)
+            dlat, dlon = (f"CAST({size!r} AS DOUBLE)" for size in grid_cell_size(cell_km))
+            path = Path(dest) / grid_path(resolution).name
+            with atomic_path(path) as tmp:
+                con.execute(
+                    f"""
+                    COPY (
+                        WITH cellules AS (
+                            SELECT
+                                CAST(floor(longitude / {dlon}) AS INTEGER) AS ix,
+                                CAST(floor(latitude / {dlat}) AS INTEGER) AS iy,
+                                profession
+                            FROM {source}
+                            WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+                        )
+                        SELECT
+                            ix,
+                            iy,
+                            CAST((iy + 0.5) * {dlat} AS FLOAT) AS latitude,
+                            CAST((ix + 0.5) * {dlon} AS FLOAT) AS longitude,
+                            profession,
+                            count(*) AS nb_professionnels
+                        FROM cellules
+                        GROUP BY ix, iy, profession
+                        ORDER BY iy, ix, profession
+                    ) TO {sql_path(tmp)} (FORMAT parquet, COMPRESSION zstd)
+                    """
+                )
+            nb_cells = con.execute(
+                f"SELECT count(DISTINCT (ix, iy)) FROM read_parquet({sql_path(path)})"
+            ).fetchone()[0]
+            print(f"Grille {resolution} : {nb_cells} cellules ({path})")
+    finally:
+        con.close()
+
+    return Path(dest)
+
+
+def compute_density(
+    rollup: Path = ROLLUP_OUTPUT,
+    communes: Path = COMMUNES_PATH,
+    dest: Path = DENSITY_OUTPUT,
+) -> Path:
+    """
+    Densité de professionnels pour 10 000 habitants (commune, département,
+    région, France × profession), à partir du cube de comptage et de la
+    population des communes.
+
+    Returns:
+        Chemin du fichier écrit
+    """
+    df_density = build_density(
+        pd.read_parquet(rollup),
+        pd.read_parquet(communes, columns=["code_postal", "departement", "population"]),
+    )
+
+    with atomic_path(dest) as tmp:
+        # L'index (niveau, zone, profession) est conservé dans le parquet
+        df_density.to_parquet(tmp)
+
+    print(f"Densités sauvegardées : {dest} ({len(df_density)} lignes)")
+    return dest
+
+
+def load_commune_centroids(
+    communes: Path = COMMUNES_PATH, extra_columns: tuple[str, ...] = ()
+) -> pd.DataFrame:
+    """
+    Centre de chaque commune (coordonnées de la mairie à défaut).
+
+    Args:
+        extra_columns: Colonnes supplémentaires à garder (ex : population)
+    """
+    df = pd.read_parquet(communes)
+    df["latitude"] = df["latitude_centre"].fillna(df["latitude"])
+    df["longitude"] = df["longitude_centre"].fillna(df["longitude"])
+    df = df.dropna(subset=["latitude", "longitude"])
+    return df.rename(columns={"nom_standard": "commune"})[
+        ["code_insee", "commune", "departement", "latitude", "longitude", *extra_columns]
+    ].reset_index(drop=True)
+
+
+def compute_access_times(
+    communes: Path = COMMUNES_PATH,
+    professionals: Path = PROFESSIONALS_PATH,
+    dest: Path = ACCESS_OUTPUT,
+    n_nearest: int = 3,
+    speed_kmh: float = 40,
+    chunk_size: int = 5_000,
+) -> Path:
+    """
+    Distance et temps d'accès de chaque commune aux professionnels les
+    plus proches, pour chaque profession.
+
+    Les communes sont traitées par lots ; chaque lot est une requête
+    groupée sur le k-d tree de la profession, répartie sur tous les cœurs,
+    et écrite aussitôt dans le parquet de sortie.
+
+    Args:
+        n_nearest: Nombre de professionnels les plus proches considérés
+        speed_kmh: Vitesse moyenne pour l'estimation du temps d'accès
+        chunk_size: Nombre de communes par lot
+
+    Returns:
+        Chemin du fichier écrit
+    """
+    df_communes = load_commune_centroids(communes)
+    index = ProximityIndex(load_data(professionals, columns=["profession"]))
+
+    rows = 0
+    with atomic_path(dest) as tmp, pq.ParquetWriter(tmp, ACCESS_SCHEMA) as writer:
+        for profession in index.professions:
+            for start in range(0, len(df_communes), chunk_size):
+                chunk = df_communes.iloc[start : start + chunk_size]
+                distances, _ = index.query(
+                    chunk["latitude"].to_numpy(),
+                    chunk["longitude"].to_numpy(),
+                    k=n_nearest,
+                    profession=profession,
+                )
+                nearest = distances[:, 0]
+                # Moyenne sur les voisins trouvés (moins de n possibles)
+                found = np.isfinite(distances)
+                mean = np.where(found, distances, 0).sum(axis=1) / found.sum(axis=1)
+
+                batch = chunk.assign(
+                    profession=profession,
+                    distance_km=nearest,
+                    temps_acces_min=estimate_travel_time(nearest, speed_kmh),
+                    distance_moyenne_km=mean,
+                    temps_acces_moyen_min=estimate_travel_time(mean, speed_kmh),
+                )
+                writer.write_table(
+                    pa.Table.from_pandas(batch, schema=ACCESS_SCHEMA, preserve_index=False)
+                )
+                rows += len(batch)
+
+    print(f"Temps d'accès sauvegardés : {dest} ({rows} lignes)")
+    return dest
+
+
+def compute_accessibility(
+    communes: Path = COMMUNES_PATH,
+    professionals: Path = PROFESSIONALS_PATH,
+    dest: Path = ACCESSIBILITY_OUTPUT,
+    radius_km: float = DEFAULT_RADIUS_KM,
+    decay: str = "gaussienne",
+) -> Path:
+    """
+    Indice d'accessibilité 2SFCA / E2SFCA de chaque commune, pour chaque
+    profession.
+
+    Args:
+        radius_km: Rayon des bassins
+        decay: Fonction de décroissance ('binaire', 'gaussienne', 'paliers')
+
+    Returns:
+        Chemin du fichier écrit
+    """
+    df_communes = load_commune_centroids(communes, extra_columns=("population",))
+    df_communes["region"] = (
+        df_communes["departement"].map(DEPARTEMENT_TO_REGION).fillna(REGION_INCONNUE)
+    )
+    df_index = accessibility_index(
+        df_communes,
+        load_data(professionals, columns=["profession"]),
+        radius_km=radius_km,
+        decay=decay,
+    )
+    df_index["indice_2sfca"] = df_index["indice_2sfca"].astype("float32")
+
+    with atomic_path(dest) as tmp:
+        df_index.to_parquet(tmp, index=False)
+
+    print(f"Indices d'accessibilité sauvegardés : {dest} ({len(df_index)} lignes)")
+    return dest
+
+
+# Vues des agrégats courants, recalculées à la lecture sur les tables
+DATABASE_VIEWS = {
+    "professionnels_par_departement": """
+        SELECT departement, nom_departement, region, profession,
+               count(*) AS nb_professionnels
+        FROM professionnels
+        GROUP BY ALL
+    """,
+    "professionnels_par_region": """
+        SELECT region, profession, count(*) AS nb_professionnels
+        FROM professionnels
+        GROUP BY ALL
+    """,
+    "professionnels_par_profession": """
+        SELECT profession, count(*) AS nb_professionnels
+        FROM professionnels
+        GROUP BY ALL
+    """,
+    "densite_departements": """
+        SELECT zone AS departement, profession, nb_professionnels, population,
+               densite_10k
+        FROM densite
+        WHERE niveau = 'departement'
+    """,
+    "acces_departements": """
+        SELECT departement, profession,
+               avg(temps_acces_min) AS temps_acces_moyen_min,
+               max(temps_acces_min) AS temps_acces_max_min
+        FROM acces
+        GROUP BY ALL
+    """,
+}
+
+# Index des recherches ponctuelles (zone, profession, commune)
+DATABASE_INDEXES = {
+    "professionnels_departement": "professionnels (departement, profession)",
+    "professionnels_code_postal": "professionnels (code_postal)",
+    "densite_zone": "densite (niveau, zone, profession)",
+    "acces_commune": "acces (code_insee, profession)",
+    "accessibilite_commune": "accessibilite (code_insee, profession)",
+}
+
+
+def build_database(
+    professionals: Path = PROFESSIONALS_PATH,
+    communes: Path = COMMUNES_PATH,
+    layers: Optional[dict[str, Path]] = None,
+    dest: Path = DATABASE_OUTPUT,
+) -> Path:
+    """
+    Base DuckDB persistante servie en lecture seule à l'application
+    (voir `utils.db`) : tables, vues des agrégats courants et index.
+
+    Args:
+        professionals: Jeu partitionné des professionnels
+        communes: Parquet des communes
+        layers: Couches parquet chargées en tables, par nom de table
+            (rollup, densite, acces, accessibilite par défaut)
+
+    Returns:
+        Chemin de la base écrite
+    """
+    if layers is None:
+        layers = {
+            "rollup": ROLLUP_OUTPUT,
+            "densite": DENSITY_OUTPUT,
+            "acces": ACCESS_OUTPUT,
+            "accessibilite": ACCESSIBILITY_OUTPUT,
+        }
+    departements = pd.DataFrame(
+        {
+            "departement": list(DEPARTEMENTS),
+            "nom_departement": list(DEPARTEMENTS.values()),
+            "region": [DEPARTEMENT_TO_REGION.get(d, REGION_INCONNUE) for d in DEPARTEMENTS],
+        }
+    )
+
+    with atomic_path(dest) as tmp:
+        con = duckdb_connect(str(tmp))
+        try:
+            con.register("departements_ref", departements)
+            con.execute("CREATE TABLE departements AS SELECT * FROM departements_ref")
+            con.execute(
+                f"""
+                CREATE TABLE professionnels AS
+                SELECT
+                    p.*,
+                    coalesce(d.nom_departement, '{INCONNU}') AS nom_departement,
+                    coalesce(d.region, '{REGION_INCONNUE}') AS region
+                FROM {parquet_source(professionals)} p
+                LEFT JOIN departements d USING (departement)
+                ORDER BY p.departement, p.profession, p.code_postal
+                """
+            )
+            con.execute(
+                f"CREATE TABLE communes AS SELECT * FROM read_parquet({sql_path(communes)})"
+            )
+            for table, path in layers.items():
+                con.execute(
+                    f"CREATE TABLE {table} AS SELECT * FROM read_parquet({sql_path(path)})"
+                )
+            for view, sql in DATABASE_VIEWS.items():
+                con.execute(f"CREATE VIEW {view} AS {sql}")
+            for index, target in DATABASE_INDEXES.items():
+                con.execute(f"CREATE INDEX {index} ON {target}")
+            con.execute("ANALYZE")
+            con.execute("CHECKPOINT")
+
+            counts = {
+                table: con.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+                for table in ["professionnels", "communes", *layers]
+            }
+        finally:
+            con.close()
+
+    print(f"Base sauvegardée : {dest}")
+    for table, count in counts.items():
+        print(f"  {table} : {count} lignes")
+    return dest
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from utils.accessibility import catchment_weights, two_step_fca
+from utils.geo import EARTH_RADIUS_KM
+
+# Longueur d'un dixième de degré sur l'équateur, en km
+DIXIEME_DE_DEGRE_KM = 2 * np.pi * EARTH_RADIUS_KM / 3600
+
+
+def test_two_step_fca_hand_computed():
+    # Commune A (1 000 hab.) atteint le lieu 1 ; commune B (3 000 hab.)
+    # atteint les lieux 1 et 2 ; le lieu 3 n'est atteint par personne
+    weights = sparse.csr_matrix([[1.0, 0.0, 0.0], [1.0, 1.0, 0.0]])
+    population = np.array([1000, 3000])
+    supply = np.array([2, 1, 5])
+
+    index = two_step_fca(weights, population, supply)
+
+    # R1 = 2 / (1 000 + 3 000), R2 = 1 / 3 000, R3 = 0 (aucune demande)
+    assert index.shape == (2, 1)
+    assert index[:, 0] == pytest.approx([2 / 4000, 2 / 4000 + 1 / 3000])
+
+
+def test_two_step_fca_one_column_per_supply_type():
+    weights = sparse.csr_matrix([[1.0, 0.5], [0.0, 1.0]])
+    population = np.array([100, 200])
+    supply = np.array([[10, 0], [0, 4]])
+
+    index = two_step_fca(weights, population, supply)
+
+    # Demande pondérée : lieu 1 = 100, lieu 2 = 0,5 × 100 + 200 = 250
+    expected = np.array([[10 / 100, 0.5 * 4 / 250], [0.0, 4 / 250]])
+    assert index == pytest.approx(expected)
+
+
+@pytest.mark.parametrize(
+    "decay, expected",
+    [
+        ("binaire", [1.0, 1.0]),
+        (
+            "gaussienne",
+            [
+                1.0,
+                (np.exp(-0.5 * (DIXIEME_DE_DEGRE_KM / 30) ** 2) - np.exp(-0.5))
+                / (1 - np.exp(-0.5)),
+            ],
+        ),
+        # 11 km : deuxième couronne (entre 10 et 20 km)
+        ("paliers", [1.0, 0.68]),
+    ],
+)
+def test_catchment_weights(decay, expected):
+    # Offre sur place, à 0,1° (~11 km) et à 0,5° (~56 km, hors bassin)
+    weights = catchment_weights(
+        [0.0], [0.0], [0.0, 0.0, 0.0], [0.0, 0.1, 0.5], radius_km=30, decay=decay
+    )
+
+    assert weights.shape == (1, 3)
+    # Le lieu confondu avec la commune est gardé malgré sa distance nulle
+    assert weights.toarray()[0] == pytest.approx([*expected, 0.0])
+    assert weights.nnz == 2
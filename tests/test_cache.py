@@ -0,0 +1,98 @@
+import sqlite3
+
+import pytest
+
+import utils.cache
+from utils.cache import ResponseCache
+
+
+class Clock:
+    """Horloge contrôlée par le test (remplace time.time dans utils.cache)."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(utils.cache.time, "time", clock.time)
+    return clock
+
+
+def test_normalized_message_hits(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.sqlite")
+    cache.put("J'ai MAL au dos !", "Kiné", ["dos"], "mistral", "ctx")
+
+    assert cache.get("j'ai mal au dos", ["dos"], "mistral", "ctx") == "Kiné"
+    # Autre modèle, autres symptômes ou autre contexte : autre clé
+    assert cache.get("j'ai mal au dos", ["dos"], "llama", "ctx") is None
+    assert cache.get("j'ai mal au dos", [], "mistral", "ctx") is None
+    assert cache.get("j'ai mal au dos", ["dos"], "mistral", "autre") is None
+    assert cache.stats()["succes"] == 1
+    assert cache.stats()["echecs"] == 3
+
+
+def test_ttl_expiry(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.sqlite", ttl_s=60)
+    cache.put("toux", "Généraliste", ["toux"])
+
+    clock.now += 59
+    assert cache.get("toux", ["toux"]) == "Généraliste"
+    clock.now += 2
+    assert cache.get("toux", ["toux"]) is None
+
+    # Les entrées expirées sont purgées à l'écriture suivante
+    cache.put("fièvre", "Généraliste", ["fièvre"])
+    assert len(cache) == 1
+
+
+def test_lru_eviction(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.sqlite", max_entries=2)
+    cache.put("toux", "A")
+    clock.now += 1
+    cache.put("fièvre", "B")
+    clock.now += 1
+    # Lire "toux" en fait l'entrée la plus récemment utilisée
+    assert cache.get("toux") == "A"
+    clock.now += 1
+    cache.put("rhume", "C")
+
+    assert len(cache) == 2
+    assert cache.get("fièvre") is None
+    assert cache.get("toux") == "A"
+    assert cache.get("rhume") == "C"
+
+
+def test_fuzzy_threshold(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.sqlite", fuzzy=True, fuzzy_threshold=0.85)
+    cache.put("j'ai mal au dos depuis hier", "Kiné", ["dos"], "mistral", "ctx")
+    proche = "j'ai mal au dos depuis hier soir"
+
+    # Message proche, mêmes symptômes et même contexte : succès approché
+    assert cache.get(proche, ["dos"], "mistral", "ctx") == "Kiné"
+    assert cache.fuzzy_hits == 1
+    # Trop différent, ou contexte différent : échec
+    assert cache.get("mal de dos", ["dos"], "mistral", "ctx") is None
+    assert cache.get(proche, ["dos"], "mistral", "autre") is None
+    # Sans symptôme détecté, pas de recherche approchée
+    cache.put("bonjour a tous", "Bonjour", [], "mistral", "ctx")
+    assert cache.get("bonjour a tous !!", [], "mistral", "ctx") == "Bonjour"
+    assert cache.get("bonjour à tous les amis", [], "mistral", "ctx") is None
+
+
+def test_old_schema_is_reset(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE reponses (cle TEXT PRIMARY KEY, reponse TEXT)")
+    db.execute("INSERT INTO reponses VALUES ('a', 'ancienne')")
+    db.commit()
+    db.close()
+
+    cache = ResponseCache(path)
+    assert len(cache) == 0
+    cache.put("toux", "Généraliste")
+    assert len(ResponseCache(path)) == 1
@@ -0,0 +1,95 @@
+import pandas as pd
+import pytest
+
+from utils.data import load_data
+
+PROFESSIONNELS = pd.DataFrame(
+    {
+        "nom": ["A", "B", "C", "D", "E"],
+        "profession": ["Médecin", "Dentiste", "Médecin", "Médecin", "Sage-femme"],
+        "commune": ["Paris", "Paris", "Bourg-en-Bresse", "Oyonnax", "Paris"],
+        # Codes postaux numériques : le zéro initial est perdu ('01000' -> 1000)
+        "code_postal": [75001, 75002, 1000, 1100, 75003],
+        "latitude": [48.86, 48.87, 46.20, 46.26, None],
+        "longitude": [2.34, 2.35, 5.22, 5.66, 2.36],
+    }
+)
+
+
+@pytest.fixture
+def partitioned(tmp_path):
+    """Jeu hive departement=XX/profession=YY/*.parquet, deux départements."""
+    root = tmp_path / "professionnels"
+    df = PROFESSIONNELS.assign(
+        code_postal=PROFESSIONNELS["code_postal"].astype(str).str.zfill(5)
+    )
+    df["departement"] = df["code_postal"].str[:2]
+    for (departement, profession), part in df.groupby(["departement", "profession"]):
+        directory = root / f"departement={departement}" / f"profession={profession}"
+        directory.mkdir(parents=True)
+        part.drop(columns=["departement", "profession"]).to_parquet(
+            directory / "part-0.parquet", index=False
+        )
+    return root
+
+
+@pytest.fixture
+def single_file(tmp_path):
+    path = tmp_path / "professionnels.parquet"
+    PROFESSIONNELS.to_parquet(path, index=False)
+    return path
+
+
+def test_filter_on_partition(partitioned):
+    df = load_data(partitioned, filters={"departement": "01"})
+
+    assert sorted(df["nom"]) == ["C", "D"]
+    assert set(df["departement"]) == {"01"}
+    assert sorted(df["code_postal"]) == ["01000", "01100"]
+    for name in ("code_postal", "commune", "profession", "departement", "region"):
+        assert isinstance(df[name].dtype, pd.CategoricalDtype), name
+    assert df["latitude"].dtype == "float32"
+
+
+def test_filters_combine_and_skip_missing_coordinates(partitioned):
+    df = load_data(
+        partitioned,
+        filters={"departement": ["75"], "profession": ["Médecin", "Sage-femme"]},
+    )
+
+    # E (sage-femme) n'a pas de latitude : écartée par DuckDB
+    assert df["nom"].tolist() == ["A"]
+
+
+def test_empty_filter_does_not_filter(partitioned):
+    df = load_data(partitioned, filters={"departement": [], "profession": None})
+
+    assert sorted(df["nom"]) == ["A", "B", "C", "D"]
+
+
+def test_columns_projection(partitioned):
+    df = load_data(partitioned, columns=["profession"])
+
+    assert "nom" not in df.columns
+    assert {"profession", "code_postal", "latitude", "longitude", "region"} <= set(df.columns)
+
+
+def test_single_file_derives_departement(single_file):
+    df = load_data(single_file, filters={"departement": "01"})
+
+    # Code postal complété à 5 chiffres avant de calculer le département
+    assert sorted(df["code_postal"]) == ["01000", "01100"]
+    assert sorted(df["nom"]) == ["C", "D"]
+    assert set(df["departement"]) == {"01"}
+
+
+def test_unknown_column(partitioned, single_file):
+    with pytest.raises(ValueError, match="absentes du dataset : specialite"):
+        load_data(partitioned, filters={"specialite": "Cardiologie"})
+    with pytest.raises(ValueError, match="absentes du dataset : telephone"):
+        load_data(single_file, columns=["nom", "telephone"])
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_data(tmp_path / "absent.parquet")
@@ -0,0 +1,70 @@
+import os
+import threading
+
+import duckdb
+import pytest
+
+from utils.db import cursor, get_database, query
+
+
+def build(path, version: int):
+    """(Re)construit la base comme le pipeline : fichier temporaire puis remplacement."""
+    tmp = path.with_suffix(".tmp")
+    con = duckdb.connect(str(tmp))
+    con.execute(f"CREATE TABLE t AS SELECT {version} AS v, range AS r FROM range(1000)")
+    con.close()
+    os.replace(tmp, path)
+    # mtime distinct à chaque reconstruction, même sur un système de
+    # fichiers à faible résolution
+    os.utime(path, ns=(version * 10**9, version * 10**9))
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "base.duckdb"
+    build(path, 1)
+    return path
+
+
+def test_query_and_tables(path):
+    assert query("SELECT max(v) AS v FROM t", path=path)["v"][0] == 1
+    assert get_database(path).tables() == ["t"]
+
+
+def test_rebuilt_file_is_reopened_after_readers_finish(path):
+    old = get_database(path)
+    with cursor(path) as cur:
+        build(path, 2)
+        # Les nouvelles requêtes lisent le fichier reconstruit...
+        assert query("SELECT max(v) FROM t", path=path).iloc[0, 0] == 2
+        new = get_database(path)
+        assert new is not old
+        # ... pendant que la requête en cours finit sur l'ancien
+        assert cur.execute("SELECT max(v) FROM t").fetchone() == (1,)
+        assert not old._closed
+    assert old._closed
+    assert not new._closed
+
+
+def test_concurrent_queries_during_rebuilds(path):
+    errors, seen = [], set()
+
+    def worker():
+        for _ in range(30):
+            try:
+                with cursor(path) as cur:
+                    seen.add(cur.execute("SELECT max(v) FROM t").fetchone()[0])
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for version in range(2, 6):
+        build(path, version)
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert seen <= {1, 2, 3, 4, 5}
+    assert query("SELECT max(v) FROM t", path=path).iloc[0, 0] == 5
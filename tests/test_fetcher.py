@@ -0,0 +1,106 @@
+import io
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import pipeline.fetcher
+from pipeline.fetcher import extract_communes, iter_json_records
+
+RECORDS = [
+    {"code_postal": "1000", "nom": "Bourg-en-Bresse", "population": 41000},
+    {
+        "code_postal": "75001",
+        "nom": 'Paris "1er" [centre], {rive droite}',
+        "geo": [[2.3, 48.8]],
+    },
+    {},
+    {"code_postal": "20000", "population": None, "geo": {"type": "Point"}},
+]
+# En-tête et queue à ignorer, espaces variés entre les objets
+DOCUMENT = (
+    '{"type": "communes", "meta": {"data": 1},\n  "data" :\t[\n'
+    + ",\n ".join(json.dumps(record, ensure_ascii=False) for record in RECORDS)
+    + '\n ], "fin": [1, 2]}'
+)
+
+
+@pytest.mark.parametrize("read_size", [1, 2, 3, 7, 64, 1 << 20])
+def test_iter_json_records_any_read_size(monkeypatch, read_size):
+    monkeypatch.setattr(pipeline.fetcher, "_READ_SIZE", read_size)
+
+    assert list(iter_json_records(io.StringIO(DOCUMENT))) == RECORDS
+
+
+def test_iter_json_records_empty_array():
+    assert list(iter_json_records(io.StringIO('{"data": [ ]}'))) == []
+
+
+@pytest.mark.parametrize(
+    "document, message",
+    [
+        ('{"autre": []}', "introuvable"),
+        ('{"data": [{"a": 1}, {"b": ', "tronqué"),
+    ],
+)
+def test_iter_json_records_errors(monkeypatch, document, message):
+    monkeypatch.setattr(pipeline.fetcher, "_READ_SIZE", 3)
+
+    with pytest.raises(ValueError, match=message):
+        list(iter_json_records(io.StringIO(document)))
+
+
+def test_extract_communes(monkeypatch, tmp_path):
+    monkeypatch.setattr(pipeline.fetcher, "_READ_SIZE", 5)
+    # Plusieurs lots écrits dans le parquet
+    monkeypatch.setattr(pipeline.fetcher, "_BATCH_SIZE", 2)
+    communes = [
+        {
+            "code_insee": "01053",
+            "code_postal": "1000",
+            "latitude_mairie": 46.2,
+            "longitude_mairie": 5.22,
+            "latitude_centre": 46.21,
+            "longitude_centre": 5.23,
+            "nom_standard": "Bourg-en-Bresse",
+            "dep_code": "01",
+            "population": "41000",
+            "polygon": {"type": "Polygon", "coordinates": [[[5.2, 46.2], [5.3, 46.3]]]},
+        },
+        {
+            "code_insee": "2A004",
+            "code_postal": 20000,
+            "latitude_mairie": 41.92,
+            "longitude_mairie": 8.74,
+            "nom_standard": "Ajaccio",
+            "dep_code": "2A",
+            "population": "",
+        },
+        {"code_insee": "97101", "code_postal": "97139", "dep_code": "971"},
+    ]
+    source = tmp_path / "communes.json"
+    source.write_text(json.dumps({"data": communes}), encoding="utf-8")
+    dest = tmp_path / "communes.parquet"
+
+    assert extract_communes(source, dest) == dest
+
+    table = pq.read_table(dest)
+    assert table.schema == pa.schema(
+        [
+            ("code_insee", pa.string()),
+            ("code_postal", pa.string()),
+            ("latitude", pa.float64()),
+            ("longitude", pa.float64()),
+            ("latitude_centre", pa.float64()),
+            ("longitude_centre", pa.float64()),
+            ("nom_standard", pa.string()),
+            ("departement", pa.string()),
+            ("population", pa.int64()),
+        ]
+    )
+    rows = table.to_pylist()
+    assert [row["code_postal"] for row in rows] == ["01000", "20000", "97139"]
+    assert [row["population"] for row in rows] == [41000, None, None]
+    assert rows[1]["latitude_centre"] is None
+    assert rows[2]["departement"] == "971"
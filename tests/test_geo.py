@@ -0,0 +1,85 @@
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.geo import (
+    EARTH_RADIUS_KM,
+    INCONNU,
+    ProximityIndex,
+    code_postal_to_departement,
+    departement_sql,
+)
+
+CODES_POSTAUX = [
+    ("75001", "75"),
+    ("01000", "01"),
+    ("20000", "2A"),
+    ("20190", "2A"),
+    ("20200", "2B"),
+    ("20600", "2B"),
+    ("97100", "971"),
+    ("97400", "974"),
+    ("98800", "988"),
+    ("7500", INCONNU),
+    ("75O01", INCONNU),
+    ("", INCONNU),
+]
+
+
+@pytest.mark.parametrize("code_postal, departement", CODES_POSTAUX)
+def test_code_postal_to_departement(code_postal, departement):
+    assert code_postal_to_departement(code_postal) == departement
+
+
+def test_code_postal_to_departement_not_a_string():
+    assert code_postal_to_departement(None) == INCONNU
+    assert code_postal_to_departement(75001) == INCONNU
+
+
+def test_departement_sql_matches_python():
+    codes = [code_postal for code_postal, _ in CODES_POSTAUX] + [None]
+    con = duckdb.connect()
+    rows = con.execute(
+        f"SELECT {departement_sql('cp')} FROM unnest(?) AS t(cp)", [codes]
+    ).fetchall()
+
+    assert [row[0] for row in rows] == [code_postal_to_departement(cp) for cp in codes]
+
+
+@pytest.fixture
+def index():
+    professionals = pd.DataFrame(
+        {
+            "nom": ["A", "B", "C"],
+            "profession": ["Médecin", "Médecin", "Dentiste"],
+            # Sur l'équateur, à 0, 0,1° et 1° de longitude
+            "latitude": [0.0, 0.0, 0.0],
+            "longitude": [0.0, 0.1, 1.0],
+        }
+    )
+    return ProximityIndex(professionals)
+
+
+def test_query_pads_when_k_exceeds_points(index):
+    distances, positions = index.query([0.0], [0.0], k=4, profession="Médecin")
+
+    assert positions.tolist() == [[0, 1, -1, -1]]
+    assert distances[0, :2] == pytest.approx([0.0, 2 * np.pi * EARTH_RADIUS_KM / 3600])
+    assert np.isinf(distances[0, 2:]).all()
+
+
+def test_nearest_keeps_found_rows_only(index):
+    nearest = index.nearest(0.0, 0.9, k=5)
+
+    assert nearest["nom"].tolist() == ["C", "B", "A"]
+    assert nearest["distance_km"].is_monotonic_increasing
+    assert nearest["temps_acces_min"].tolist() == pytest.approx(
+        (nearest["distance_km"] / 40 * 60).tolist()
+    )
+
+
+def test_unknown_profession(index):
+    assert index.professions == ["Dentiste", "Médecin"]
+    with pytest.raises(KeyError):
+        index.nearest(0.0, 0.0, profession="Sage-femme")
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from utils.metrics import build_rollup
+
+
+def test_build_rollup_counts_each_level():
+    df = pd.DataFrame(
+        {
+            "code_postal": ["75001", "75001", "69001", "20000"],
+            "commune": ["Paris", "Paris", "Lyon", "Ajaccio"],
+            "latitude": [48.86, 48.86, 45.77, 41.93],
+            "longitude": [2.34, 2.34, 4.83, 8.74],
+            "departement": ["75", "75", "69", "2A"],
+            "nom_departement": ["Paris", "Paris", "Rhône", "Corse-du-Sud"],
+            "region": [
+                "Île-de-France",
+                "Île-de-France",
+                "Auvergne-Rhône-Alpes",
+                "Corse",
+            ],
+            "profession": ["Médecin", "Infirmier", "Médecin", "Médecin"],
+        }
+    )
+
+    cube = build_rollup(df)
+
+    counts = cube.groupby(["niveau", "profession"])["nb_professionnels"].sum()
+    for niveau in ("commune", "departement", "region"):
+        assert counts[(niveau, "Médecin")] == 3
+        assert counts[(niveau, "Infirmier")] == 1
+
+    paris = cube[(cube["niveau"] == "departement") & (cube["departement"] == "75")]
+    assert paris.set_index("profession")["nb_professionnels"].to_dict() == {
+        "Médecin": 1,
+        "Infirmier": 1,
+    }
+    # Ordre de première apparition de chaque profession dans les données
+    assert np.array_equal(paris["ordre"], [0, 1])
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from utils.ollama import AsyncOllamaClient, OllamaClient, OllamaError
+
+
+class FakeOllama(BaseHTTPRequestHandler):
+    """Serveur Ollama minimal : renvoie en NDJSON les fragments de `chunks`."""
+
+    protocol_version = "HTTP/1.1"
+    chunks: list[dict] = []
+
+    def do_POST(self):
+        self.server.requests.append(
+            json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        )
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in self.server.chunks:
+            line = (json.dumps(chunk) + "\n").encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ollama():
+    """Démarre un faux serveur ; le test renseigne `server.chunks`."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllama)
+    server.chunks = []
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    with OllamaClient(f"http://127.0.0.1:{server.server_port}", "mistral") as client:
+        yield server, client
+    server.shutdown()
+    server.server_close()
+
+
+def test_stream_yields_fragments_until_done(ollama):
+    server, client = ollama
+    server.chunks = [
+        {"response": "Consultez ", "done": False},
+        {"response": "", "done": False},
+        {"response": "un généraliste.", "done": False},
+        {"response": "", "done": True},
+        {"response": "ignoré", "done": False},
+    ]
+
+    assert list(client.stream("J'ai de la fièvre")) == ["Consultez ", "un généraliste."]
+    assert server.requests == [
+        {"model": "mistral", "prompt": "J'ai de la fièvre", "stream": True}
+    ]
+
+
+def test_stream_raises_on_error_chunk(ollama):
+    server, client = ollama
+    server.chunks = [
+        {"response": "Début", "done": False},
+        {"error": "model 'mistral' not found"},
+    ]
+
+    fragments = client.stream("question")
+    assert next(fragments) == "Début"
+    with pytest.raises(OllamaError, match="not found"):
+        next(fragments)
+
+
+def test_async_generate(ollama):
+    server, client = ollama
+    server.chunks = [{"response": " Consultez un généraliste. ", "done": True}]
+
+    async def main():
+        async with AsyncOllamaClient(client.base_url, "mistral") as async_client:
+            return await async_client.generate("question")
+
+    assert asyncio.run(main()) == "Consultez un généraliste."
+    assert server.requests[0]["stream"] is False
+
+
+def test_async_stream(ollama):
+    server, client = ollama
+    server.chunks = [
+        {"response": "Consultez ", "done": False},
+        {"response": "un généraliste.", "done": False},
+        {"response": "", "done": True},
+        {"response": "ignoré", "done": False},
+    ]
+
+    async def main():
+        async with AsyncOllamaClient(client.base_url, "mistral") as async_client:
+            # Plusieurs conversations servies en même temps sur la même boucle
+            return await asyncio.gather(
+                *(collect(async_client.stream("question")) for _ in range(3))
+            )
+
+    assert asyncio.run(main()) == [["Consultez ", "un généraliste."]] * 3
+
+
+def test_async_stream_raises_on_error_chunk(ollama):
+    server, client = ollama
+    server.chunks = [{"error": "model 'mistral' not found"}]
+
+    async def main():
+        async with AsyncOllamaClient(client.base_url, "mistral") as async_client:
+            return await collect(async_client.stream("question"))
+
+    with pytest.raises(OllamaError, match="not found"):
+        asyncio.run(main())
+
+
+async def collect(fragments) -> list[str]:
+    return [fragment async for fragment in fragments]
+
+
+def test_stream_connection_error():
+    # Port libéré juste après l'avoir réservé : personne n'y écoute
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    with OllamaClient(f"http://127.0.0.1:{port}") as client:
+        with pytest.raises(httpx.ConnectError):
+            list(client.stream("question"))
@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+from pipeline.main import Stage, is_up_to_date, run_stage
+from pipeline.storage import Manifest
+
+
+@pytest.fixture
+def stage(tmp_path):
+    """Étape factice : recopie son entrée en majuscules, compte ses exécutions."""
+    source, dest = tmp_path / "entree.txt", tmp_path / "sortie.txt"
+    source.write_text("communes", encoding="utf-8")
+    runs = []
+
+    def run():
+        runs.append(1)
+        dest.write_text(source.read_text(encoding="utf-8").upper(), encoding="utf-8")
+
+    stage = Stage("factice", run, inputs=[source], outputs=[dest], params={"n": 1})
+    stage.runs = runs
+    return stage
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    return Manifest(tmp_path / "manifest.json")
+
+
+def test_runs_once_then_skips(stage, manifest, tmp_path):
+    assert run_stage(stage, manifest)
+    assert stage.outputs[0].read_text(encoding="utf-8") == "COMMUNES"
+    assert is_up_to_date(stage, manifest)
+    assert not run_stage(stage, manifest)
+    # Manifeste relu depuis le disque (nouveau processus)
+    assert not run_stage(stage, Manifest(tmp_path / "manifest.json"))
+    assert len(stage.runs) == 1
+
+
+def test_touch_without_content_change_is_skipped(stage, manifest):
+    run_stage(stage, manifest)
+    source = stage.inputs[0]
+    source.write_text("communes", encoding="utf-8")
+    os.utime(source, ns=(1, 1))
+
+    assert not run_stage(stage, manifest)
+    assert len(stage.runs) == 1
+
+
+def test_reruns_when_input_content_changes(stage, manifest):
+    run_stage(stage, manifest)
+    stage.inputs[0].write_text("professionnels", encoding="utf-8")
+
+    assert run_stage(stage, manifest)
+    assert stage.outputs[0].read_text(encoding="utf-8") == "PROFESSIONNELS"
+    assert not run_stage(stage, manifest)
+    assert len(stage.runs) == 2
+
+
+def test_reruns_when_params_change(stage, manifest):
+    run_stage(stage, manifest)
+    stage.params = {"n": 2}
+
+    assert run_stage(stage, manifest)
+    assert len(stage.runs) == 2
+
+
+@pytest.mark.parametrize("damage", ["delete", "edit"])
+def test_reruns_when_output_is_missing_or_modified(stage, manifest, damage):
+    run_stage(stage, manifest)
+    if damage == "delete":
+        stage.outputs[0].unlink()
+    else:
+        stage.outputs[0].write_text("modifié à la main", encoding="utf-8")
+
+    assert run_stage(stage, manifest)
+    assert stage.outputs[0].read_text(encoding="utf-8") == "COMMUNES"
+
+
+def test_force_and_missing_inputs(stage, manifest):
+    run_stage(stage, manifest)
+    assert run_stage(stage, manifest, force=True)
+
+    stage.inputs[0].unlink()
+    with pytest.raises(FileNotFoundError, match="entrées manquantes"):
+        run_stage(stage, manifest)
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from utils.symptoms import SymptomMatcher, build_lexicon, singular
+
+SPECIALITES = {
+    "dos": ["kinésithérapeute"],
+    "mal de dos": ["rhumatologue"],
+    "mal de tête": ["généraliste", "neurologue"],
+    "fièvre": ["généraliste"],
+    "jambes": ["angiologue"],
+    "tensio": ["cardiologue"],
+}
+SYNONYMES = {
+    "mal de tête": ["maux de tête"],
+    "tensio": ["tensio*"],
+}
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return SymptomMatcher(build_lexicon(SPECIALITES, SYNONYMES, path=None))
+
+
+@pytest.mark.parametrize(
+    "message, symptomes",
+    [
+        # Mots entiers uniquement
+        ("j'ai perdu mon dossier", []),
+        ("mal au dos", ["dos"]),
+        # Accents et casse ignorés
+        ("FIEVRE depuis hier", ["fièvre"]),
+        ("j'ai de la fievre", ["fièvre"]),
+        # Pluriel régulier
+        ("j'ai mal aux jambe", ["jambes"]),
+        ("mes jambes sont lourdes", ["jambes"]),
+        ("des maux de têtes", ["mal de tête"]),
+        # Le terme le plus long l'emporte
+        ("j'ai mal de dos", ["mal de dos"]),
+        # Termes en '*' : tout mot qui commence par le préfixe
+        ("ma tension est haute", ["tensio"]),
+        ("mon tensiomètre indique 15", ["tensio"]),
+        ("la tensio", ["tensio"]),
+        ("une extension", []),
+        # Ordre d'apparition, sans doublon
+        ("fièvre, mal de tête et encore de la fièvre", ["fièvre", "mal de tête"]),
+    ],
+)
+def test_find(matcher, message, symptomes):
+    assert matcher.find(message) == symptomes
+
+
+def test_specialties(matcher):
+    specialites = matcher.specialties(["mal de tête", "fièvre"])
+    assert specialites == ["généraliste", "neurologue"]
+
+
+def test_singular():
+    assert singular("jambes") == "jambe"
+    assert singular("stress") == "stress"
+    assert singular("dos") == "dos"
+
+
+def test_external_lexicon_is_merged(tmp_path):
+    path = tmp_path / "lexique.json"
+    path.write_text(
+        json.dumps(
+            {
+                "fièvre": {
+                    "specialites": ["pédiatre", "généraliste"],
+                    "synonymes": ["fébrile"],
+                },
+                "insomnie": {
+                    "specialites": ["psychiatre"],
+                    "synonymes": ["dors mal"],
+                },
+            }
+        ),
+        encoding="utf-8",
+    )
+
+    lexicon = build_lexicon(SPECIALITES, SYNONYMES, path)
+    matcher = SymptomMatcher(lexicon)
+
+    # Symptôme intégré complété, sans doublon ; nouveau symptôme ajouté
+    assert lexicon["fièvre"] == {
+        "specialites": ["généraliste", "pédiatre"],
+        "synonymes": ["fébrile"],
+    }
+    assert matcher.find("je suis fébrile et je dors mal") == ["fièvre", "insomnie"]
+    assert matcher.version != SymptomMatcher(
+        build_lexicon(SPECIALITES, SYNONYMES, path=None)
+    ).version
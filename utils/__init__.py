@@ -3,7 +3,16 @@ Package utils pour l'application HealthMap.
 
 Contient :
 - data.py      : chargement et préparation des données
+- aggregates.py : agrégats des onglets mémoïsés par filtre (LRU)
+- db.py        : base DuckDB du pipeline (lecture seule, pool de curseurs)
+- geo.py       : référentiel géographique, distances et index spatial
 - metrics.py   : indicateurs analytiques (densité médicale)
-- charts.py    : visualisations Plotly
+- accessibility.py : indice d'accessibilité 2SFCA / E2SFCA
+- charts.py    : visualisations Plotly et pydeck
+- viewport.py  : points de la carte par vue (zoom, zone visible)
 - chatbot.py   : assistant IA (désactivé pour l’instant)
+- ollama.py    : client HTTP Ollama (connexions partagées, réponses en flux)
+- cache.py     : cache persistant des réponses du modèle
+- text.py      : normalisation des messages
+- symptoms.py  : détection des symptômes (lexique compilé)
 """
\ No newline at end of file
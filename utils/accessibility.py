@@ -0,0 +1,173 @@
+"""
+Indice d'accessibilité aux professionnels par la méthode 2SFCA
+(two-step floating catchment area) et sa variante E2SFCA.
+
+1. Pour chaque lieu d'exercice j, ratio offre / demande :
+   R_j = S_j / Σ_i W(d_ij) P_i (population des communes i de son bassin)
+2. Pour chaque commune i, somme des ratios des lieux de son bassin :
+   A_i = Σ_j W(d_ij) R_j
+
+W est une fonction de décroissance de la distance, nulle au-delà du
+rayon du bassin. Les couples (commune, lieu) à portée sont calculés une
+fois, sous forme de matrice creuse, pour toutes les professions.
+"""
+
+from typing import Callable, Union
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+from utils.geo import _chord_to_km, _km_to_chord, _to_cartesian
+from utils.metrics import DENSITY_SCALE
+
+DEFAULT_RADIUS_KM = 30
+
+
+def _binary(d: np.ndarray, radius: float) -> np.ndarray:
+    return np.ones_like(d)
+
+
+def _gaussian(d: np.ndarray, radius: float) -> np.ndarray:
+    # Gaussienne ramenée à 1 au centre et à 0 au bord du bassin
+    edge = np.exp(-0.5)
+    return (np.exp(-0.5 * (d / radius) ** 2) - edge) / (1 - edge)
+
+
+def _steps(d: np.ndarray, radius: float) -> np.ndarray:
+    # E2SFCA : trois couronnes de poids 1 / 0,68 / 0,22
+    return np.select([d <= radius / 3, d <= 2 * radius / 3], [1.0, 0.68], 0.22)
+
+
+# Fonctions de décroissance W(distance_km, rayon_km)
+DECAY_FUNCTIONS = {"binaire": _binary, "gaussienne": _gaussian, "paliers": _steps}
+
+Decay = Union[str, Callable[[np.ndarray, float], np.ndarray]]
+
+
+def catchment_weights(
+    demand_lat,
+    demand_lon,
+    supply_lat,
+    supply_lon,
+    radius_km: float = DEFAULT_RADIUS_KM,
+    decay: Decay = "gaussienne",
+) -> sparse.csr_matrix:
+    """
+    Poids W(d_ij) de chaque couple (point de demande i, point d'offre j)
+    à moins de `radius_km`, en matrice creuse demande × offre.
+    """
+    decay_fn = DECAY_FUNCTIONS[decay] if isinstance(decay, str) else decay
+
+    demand = cKDTree(_to_cartesian(demand_lat, demand_lon))
+    supply = cKDTree(_to_cartesian(supply_lat, supply_lon))
+    # Sortie en tableau (i, j, v) : les distances nulles (commune et lieu
+    # confondus) y sont gardées, contrairement aux formats creux
+    pairs = demand.sparse_distance_matrix(
+        supply, _km_to_chord(radius_km), output_type="ndarray"
+    )
+    weights = decay_fn(_chord_to_km(pairs["v"]), radius_km)
+    return sparse.csr_matrix(
+        (weights, (pairs["i"], pairs["j"])), shape=(demand.n, supply.n)
+    )
+
+
+def two_step_fca(
+    weights: sparse.csr_matrix, population: np.ndarray, supply: np.ndarray
+) -> np.ndarray:
+    """
+    Indice 2SFCA de chaque point de demande.
+
+    Args:
+        weights: Poids demande × offre (`catchment_weights`)
+        population: Population de chaque point de demande
+        supply: Offre de chaque point d'offre, une colonne par type d'offre
+
+    Returns:
+        Offre accessible par habitant, demande × types d'offre
+    """
+    supply = np.asarray(supply, dtype=np.float64)
+    if supply.ndim == 1:
+        supply = supply[:, None]
+    demand = weights.T @ np.asarray(population, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(demand[:, None] > 0, supply / demand[:, None], 0.0)
+    return weights @ ratio
+
+
+def accessibility_index(
+    communes: pd.DataFrame,
+    professionals: pd.DataFrame,
+    radius_km: float = DEFAULT_RADIUS_KM,
+    decay: Decay = "gaussienne",
+) -> pd.DataFrame:
+    """
+    Indice d'accessibilité de chaque commune à chaque profession.
+
+    Args:
+        communes: Communes avec 'latitude', 'longitude' et 'population'
+        professionals: Professionnels avec 'profession', 'latitude' et
+            'longitude'
+        radius_km: Rayon des bassins
+        decay: Nom d'une fonction de DECAY_FUNCTIONS ou fonction
+            W(distance_km, rayon_km)
+
+    Returns:
+        Colonnes des communes, 'profession' et 'indice_2sfca'
+        (professionnels accessibles pour 10 000 habitants)
+    """
+    communes = communes.dropna(subset=["latitude", "longitude", "population"])
+    communes = communes.reset_index(drop=True)
+
+    # Offre : nombre de professionnels par lieu d'exercice et profession
+    supply = (
+        professionals.dropna(subset=["profession", "latitude", "longitude"])
+        .groupby(["latitude", "longitude", "profession"], observed=True)
+        .size()
+        .unstack("profession", fill_value=0)
+    )
+    locations = supply.index.to_frame(index=False)
+
+    weights = catchment_weights(
+        communes["latitude"],
+        communes["longitude"],
+        locations["latitude"],
+        locations["longitude"],
+        radius_km,
+        decay,
+    )
+    index = two_step_fca(weights, communes["population"].to_numpy(), supply.to_numpy())
+
+    result = pd.DataFrame(index * DENSITY_SCALE, columns=supply.columns.astype(str))
+    result = pd.concat([communes, result], axis=1)
+    return result.melt(
+        id_vars=list(communes.columns),
+        var_name="profession",
+        value_name="indice_2sfca",
+    )
+
+
+def accessibility_by(
+    df: pd.DataFrame, key: str, professions=None
+) -> pd.DataFrame:
+    """
+    Indice moyen par zone (moyenne pondérée par la population des
+    communes), pour une sélection de professions (toutes si None ou vide).
+
+    Les indices de plusieurs professions s'additionnent : l'offre de
+    chaque lieu est la somme des offres et la demande ne dépend pas de la
+    profession.
+
+    Returns:
+        DataFrame avec `key` et 'indice_2sfca'
+    """
+    if professions:
+        df = df[df["profession"].isin(list(professions))]
+    per_commune = df.groupby(
+        ["code_insee", key], observed=True, sort=False
+    ).agg(indice=("indice_2sfca", "sum"), population=("population", "first"))
+    per_commune["pondere"] = per_commune["indice"] * per_commune["population"]
+    agg = per_commune.groupby(level=key, observed=True)[["pondere", "population"]].sum()
+    agg["indice_2sfca"] = agg["pondere"] / agg["population"]
+    return agg[["indice_2sfca"]].reset_index()
@@ -0,0 +1,332 @@
+"""
+Agrégats prêts à afficher des onglets Carte et Régions & Départements,
+mémoïsés par filtre.
+
+Chaque résultat est indexé par (version des données, professions
+sélectionnées, niveau d'agrégation) : une relance Streamlit sans
+changement de filtre, un changement d'onglet ou un autre utilisateur
+ayant choisi le même filtre le retrouvent sans recalcul. Le cache est un
+LRU borné en nombre d'entrées et en mémoire.
+
+Les frames renvoyés sont partagés : avec Copy-on-Write (activé par
+app_streamlit.py), un appelant qui les modifie travaille sur sa propre
+copie.
+"""
+
+import sys
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Hashable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.accessibility import accessibility_by
+from utils.data import (
+    ACCESSIBILITY_PATH,
+    DENSITY_PATH,
+    ROLLUP_PATH,
+    file_fingerprint,
+    get_accessibility_layer,
+    get_dataset,
+    get_density,
+    get_grid,
+    get_rollup,
+    grid_path,
+)
+from utils.geo import DEPARTEMENTS
+from utils.metrics import density_for, first_distinct, rollup_counts
+from utils.viewport import BBox, MapPoints, fit_view, grid_points, map_points
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 256 * 1024**2
+
+LOCATION_KEYS = ["code_postal", "commune", "latitude", "longitude"]
+
+
+def _size(value) -> int:
+    """Empreinte mémoire approchée d'un résultat, en octets."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            _size(k) + _size(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_size(v) for v in value)
+    if hasattr(value, "__dict__"):
+        return _size(vars(value))
+    return sys.getsizeof(value)
+
+
+class FrameCache:
+    """
+    Cache LRU partageable entre threads, borné en entrées et en octets.
+
+    Args:
+        max_entries: Nombre maximal de résultats gardés
+        max_bytes: Mémoire maximale ; les résultats les moins récemment
+            lus sont évincés au-delà, un résultat plus gros n'est pas gardé
+    """
+
+    def __init__(
+        self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[object, int]] = OrderedDict()
+        self._lock = Lock()
+
+    def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], object],
+        sizeof: Callable[[object], int] = _size,
+    ):
+        """
+        Résultat en cache pour `key`, calculé par `compute` en cas d'absence.
+
+        `sizeof` estime la mémoire occupée par un résultat.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Calcul hors verrou : deux sessions peuvent calculer le même
+        # résultat en même temps, la seconde écriture est sans effet
+        value = compute()
+        size = sizeof(value)
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = (value, size)
+                self.nbytes += size
+                while (
+                    len(self._entries) > self.max_entries or self.nbytes > self.max_bytes
+                ):
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.nbytes -= evicted
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Compteurs du cache depuis le démarrage du processus."""
+        lookups = self.hits + self.misses
+        return {
+            "entrees": len(self._entries),
+            "memoire_mo": round(self.nbytes / 1024**2, 1),
+            "succes": self.hits,
+            "echecs": self.misses,
+            "taux_succes": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+_cache = FrameCache()
+
+
+def get_frame_cache() -> FrameCache:
+    """Cache des agrégats partagé par le processus."""
+    return _cache
+
+
+def data_version() -> tuple:
+    """
+    Version des couches lues par les agrégats (empreintes des fichiers,
+    None pour une couche absente).
+    """
+    rollup = (
+        file_fingerprint(ROLLUP_PATH) if ROLLUP_PATH.exists() else get_dataset().version
+    )
+    return (
+        rollup,
+        *(
+            file_fingerprint(path) if path.exists() else None
+            for path in (DENSITY_PATH, ACCESSIBILITY_PATH)
+        ),
+    )
+
+
+def memo_key(
+    niveau: Hashable,
+    professions: Optional[Iterable[str]] = None,
+    version: Optional[tuple] = None,
+) -> tuple:
+    """
+    Clé d'un résultat : (version des données, professions sélectionnées,
+    niveau). Sert aussi aux caches en aval (figures) pour désigner les
+    agrégats qu'ils affichent sans relire leur contenu.
+
+    Args:
+        niveau: Niveau d'agrégation (ou toute clé décrivant le résultat)
+        professions: Professions sélectionnées (l'ordre est indifférent)
+        version: Version des données (data_version() par défaut)
+    """
+    return (
+        data_version() if version is None else version,
+        frozenset(professions or ()),
+        niveau,
+    )
+
+
+def memoized(
+    niveau: Hashable,
+    professions: Optional[Iterable[str]],
+    compute: Callable[[], object],
+    version: Optional[tuple] = None,
+):
+    """
+    Résultat de `compute` pour un filtre de professions et un niveau,
+    calculé une seule fois par version des données (voir memo_key).
+    """
+    return _cache.get_or_compute(memo_key(niveau, professions, version), compute)
+
+
+def commune_rows(professions: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Lignes communes du cube pour les professions choisies."""
+
+    def compute():
+        rollup = get_rollup()
+        df = rollup[rollup["niveau"] == "commune"]
+        if professions:
+            df = df[df["profession"].isin(list(professions))]
+        return df
+
+    return memoized("commune", professions, compute)
+
+
+def commune_locations(professions: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Effectifs par localisation (code postal + coordonnées) avec les trois
+    premières professions distinctes, sans les lignes sans coordonnées.
+    """
+
+    def compute():
+        df = commune_rows(professions)
+        df_map = df.groupby(LOCATION_KEYS, observed=True, sort=False).agg(
+            nombre_pros=("nb_professionnels", "sum")
+        )
+        df_map["professions_exemples"] = first_distinct(df, LOCATION_KEYS)
+        return df_map.reset_index().dropna(subset=["latitude", "longitude"])
+
+    return memoized("localisation", professions, compute)
+
+
+def zone_views(
+    professions: Optional[Iterable[str]] = None,
+) -> dict[str, tuple[float, float, float]]:
+    """
+    Zones sélectionnables sur la carte (France, régions, départements)
+    et la vue (latitude, longitude, zoom) qui montre chacune.
+    """
+
+    def compute():
+        df = commune_rows(professions)
+        zones = {"France entière": df}
+        zones.update(
+            {region: df[df["region"] == region] for region in sorted(df["region"].unique())}
+        )
+        zones.update(
+            {
+                f"{code} - {DEPARTEMENTS.get(code, code)}": part
+                for code, part in df.groupby("departement", observed=True)
+            }
+        )
+        return {
+            zone: fit_view(part["latitude"], part["longitude"])
+            for zone, part in zones.items()
+            if part["latitude"].notna().any()
+        }
+
+    return memoized("zones", professions, compute)
+
+
+def viewport_points(
+    zone: str,
+    zoom: float,
+    bbox: BBox,
+    professions: Optional[Iterable[str]] = None,
+) -> MapPoints:
+    """Points de la carte pour une vue (`map_points`)."""
+    return memoized(
+        ("points", zone, zoom),
+        professions,
+        lambda: map_points(get_rollup(), zoom, bbox=bbox, professions=professions),
+    )
+
+
+def grid_view(
+    resolution: str,
+    zone: str,
+    zoom: float,
+    bbox: BBox,
+    professions: Optional[Iterable[str]] = None,
+) -> MapPoints:
+    """Cellules de grille à afficher pour une vue (`grid_points`)."""
+    return memoized(
+        ("grille", resolution, zone, zoom),
+        professions,
+        lambda: grid_points(get_grid(resolution), bbox, professions),
+        version=(data_version(), file_fingerprint(grid_path(resolution))),
+    )
+
+
+def zone_indicators(
+    niveau: str, professions: Optional[Iterable[str]] = None
+) -> pd.DataFrame:
+    """
+    Indicateurs par région ou département, prêts pour les cartes et
+    tableaux : 'nom' (et 'code' pour les départements), 'nombre_pros',
+    puis 'densite_10k' et 'indice_2sfca' si le pipeline a produit les
+    couches correspondantes.
+    """
+    if niveau not in ("region", "departement"):
+        raise ValueError(f"Niveau inconnu : {niveau}")
+
+    def compute():
+        df = rollup_counts(get_rollup(), niveau, professions)
+        if DENSITY_PATH.exists():
+            df = df.merge(
+                density_for(get_density(), niveau, professions)[["zone", "densite_10k"]],
+                left_on=niveau,
+                right_on="zone",
+                how="left",
+            ).drop(columns="zone")
+        if ACCESSIBILITY_PATH.exists():
+            df = df.merge(
+                accessibility_by(get_accessibility_layer(), niveau, professions),
+                on=niveau,
+                how="left",
+            )
+        indicators = [
+            column for column in ("densite_10k", "indice_2sfca") if column in df
+        ]
+        if niveau == "region":
+            df = df.rename(columns={"region": "nom", "nb_professionnels": "nombre_pros"})
+            return df[["nom", "nombre_pros", *indicators]]
+        df = df.rename(
+            columns={
+                "departement": "code",
+                "nom_departement": "nom",
+                "nb_professionnels": "nombre_pros",
+            }
+        )
+        return df[["code", "nom", "nombre_pros", *indicators]]
+
+    return memoized(niveau, professions, compute)
@@ -0,0 +1,245 @@
+"""
+Cache persistant des réponses du modèle (SQLite).
+
+Les réponses sont indexées par la forme normalisée du message, le
+modèle utilisé et le contexte du prompt (symptômes et spécialités
+retenus, versions du lexique et du gabarit de prompt) ; elles expirent
+après un délai (TTL) et les moins récemment lues sont évincées au-delà
+d'un nombre maximal d'entrées (LRU).
+"""
+
+import hashlib
+import sqlite3
+import time
+from difflib import SequenceMatcher
+from pathlib import Path
+from threading import Lock
+from typing import Iterable, Optional
+
+from utils.text import normalize_text
+
+CACHE_PATH = Path("data/cache_reponses.sqlite")
+DEFAULT_TTL_S = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10_000
+# Similarité minimale (0 à 1) d'un message pour un succès approché
+DEFAULT_FUZZY_THRESHOLD = 0.85
+# Nombre maximal de candidats comparés lors d'une recherche approchée
+_FUZZY_CANDIDATES = 200
+
+# Version du schéma (PRAGMA user_version) : un fichier plus ancien est
+# vidé, ses clés ne couvrant pas tout le prompt
+_SCHEMA_VERSION = 2
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reponses (
+    cle TEXT PRIMARY KEY,
+    message TEXT NOT NULL,
+    symptomes TEXT NOT NULL,
+    modele TEXT NOT NULL,
+    contexte TEXT NOT NULL,
+    reponse TEXT NOT NULL,
+    cree_le REAL NOT NULL,
+    lu_le REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reponses_lu_le ON reponses (lu_le);
+CREATE INDEX IF NOT EXISTS reponses_symptomes ON reponses (modele, contexte, symptomes);
+"""
+
+
+def _symptoms_key(symptoms: Iterable[str]) -> str:
+    return "|".join(sorted(set(symptoms)))
+
+
+class ResponseCache:
+    """
+    Cache des réponses du modèle, partageable entre threads.
+
+    Args:
+        path: Fichier SQLite (créé au besoin)
+        ttl_s: Durée de validité d'une réponse, en secondes
+        max_entries: Nombre maximal de réponses gardées
+        fuzzy: Accepter une réponse à un message proche ayant les mêmes
+            symptômes détectés et le même contexte
+        fuzzy_threshold: Similarité minimale des messages en mode approché
+    """
+
+    def __init__(
+        self,
+        path: Path = CACHE_PATH,
+        ttl_s: float = DEFAULT_TTL_S,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        fuzzy: bool = False,
+        fuzzy_threshold: float = DEFAULT_FUZZY_THRESHOLD,
+    ):
+        self.path = Path(path)
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.fuzzy = fuzzy
+        self.fuzzy_threshold = fuzzy_threshold
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            if self._db.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+                self._db.execute("DROP TABLE IF EXISTS reponses")
+                self._db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            self._db.executescript(_SCHEMA)
+
+    @staticmethod
+    def key(
+        message: str, model: str, symptoms: Iterable[str] = (), context: str = ""
+    ) -> str:
+        """
+        Clé d'un message : empreinte de sa forme normalisée, du modèle, des
+        symptômes détectés et du contexte du prompt.
+        """
+        return hashlib.sha256(
+            "\n".join(
+                (model, context, _symptoms_key(symptoms), normalize_text(message))
+            ).encode()
+        ).hexdigest()
+
+    def get(
+        self,
+        message: str,
+        symptoms: Iterable[str] = (),
+        model: str = "",
+        context: str = "",
+    ) -> Optional[str]:
+        """
+        Réponse en cache pour un message (None si absente ou expirée).
+
+        Args:
+            message: Message de l'utilisateur
+            symptoms: Symptômes détectés
+            model: Modèle ayant produit la réponse
+            context: Autres entrées du prompt (voir
+                HealthMapChatbot.prompt_context)
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT cle, reponse FROM reponses WHERE cle = ? AND cree_le > ?",
+                (self.key(message, model, symptoms, context), now - self.ttl_s),
+            ).fetchone()
+            if row is None and self.fuzzy:
+                row = self._closest(
+                    message, _symptoms_key(symptoms), model, context, now
+                )
+                if row is not None:
+                    self.fuzzy_hits += 1
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            with self._db:
+                self._db.execute(
+                    "UPDATE reponses SET lu_le = ? WHERE cle = ?", (now, row[0])
+                )
+            return row[1]
+
+    def _closest(
+        self, message: str, symptoms: str, model: str, context: str, now: float
+    ) -> Optional[tuple[str, str]]:
+        # Sans symptôme détecté, deux messages proches n'appellent pas
+        # forcément la même réponse
+        if not symptoms:
+            return None
+
+        candidates = self._db.execute(
+            """
+            SELECT cle, reponse, message FROM reponses
+            WHERE modele = ? AND contexte = ? AND symptomes = ? AND cree_le > ?
+            ORDER BY lu_le DESC LIMIT ?
+            """,
+            (model, context, symptoms, now - self.ttl_s, _FUZZY_CANDIDATES),
+        ).fetchall()
+
+        normalized = normalize_text(message)
+        best, best_ratio = None, self.fuzzy_threshold
+        for cle, reponse, other in candidates:
+            ratio = SequenceMatcher(None, normalized, other).ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = (cle, reponse), ratio
+        return best
+
+    def put(
+        self,
+        message: str,
+        response: str,
+        symptoms: Iterable[str] = (),
+        model: str = "",
+        context: str = "",
+    ):
+        """Enregistre la réponse à un message, puis applique TTL et LRU."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO reponses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.key(message, model, symptoms, context),
+                    normalize_text(message),
+                    _symptoms_key(symptoms),
+                    model,
+                    context,
+                    response,
+                    now,
+                    now,
+                ),
+            )
+            self._db.execute(
+                "DELETE FROM reponses WHERE cree_le <= ?", (now - self.ttl_s,)
+            )
+            self._db.execute(
+                """
+                DELETE FROM reponses WHERE cle IN (
+                    SELECT cle FROM reponses ORDER BY lu_le DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM reponses")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM reponses").fetchone()[0]
+
+    @property
+    def hit_rate(self) -> float:
+        """Part des lectures servies par le cache depuis le démarrage."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        """Compteurs du cache depuis le démarrage du processus."""
+        return {
+            "entrees": len(self),
+            "succes": self.hits,
+            "succes_approches": self.fuzzy_hits,
+            "echecs": self.misses,
+            "taux_succes": round(self.hit_rate, 3),
+        }
+
+
+_caches: dict[Path, ResponseCache] = {}
+_caches_lock = Lock()
+
+
+def get_response_cache(path: Path = CACHE_PATH, **options) -> ResponseCache:
+    """Cache des réponses partagé par le processus (un par fichier)."""
+    path = Path(path)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = ResponseCache(path, **options)
+            _caches[path] = cache
+        return cache
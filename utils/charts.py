@@ -1,22 +1,17 @@
+from time import perf_counter
+from typing import Callable, Hashable
+
+import numpy as np
 import plotly.express as px
 import pandas as pd
 import plotly.graph_objects as go
+import pydeck as pdk
 
+from utils.aggregates import FrameCache
 
-def bar_professionals_by_departement(df_dept: pd.DataFrame):
-    """
-    Bar chart : nombre de professionnels par département.
-    """
-    return px.bar(
-        df_dept,
-        x="departement",
-        y="nb_professionnels",
-        title="Répartition des professionnels de santé par département",
-        labels={
-            "departement": "Département",
-            "nb_professionnels": "Nombre de professionnels",
-        },
-    )
+# Figures Plotly gardées en mémoire (les contours n'y sont plus embarqués :
+# voir utils.data.geojson_url)
+_figures = FrameCache(max_entries=64, max_bytes=128 * 1024**2)
 
 
 def create_map_chart(
@@ -68,3 +63,124 @@ def create_map_chart(
     fig.update_coloraxes(colorbar_title="Température (°C)")
 
     return fig
+
+
+def viewport_deck(
+    points: pd.DataFrame,
+    latitude: float,
+    longitude: float,
+    zoom: float,
+    height: int = 700,
+) -> pdk.Deck:
+    """
+    Carte WebGL (pydeck) des points d'une vue (`utils.viewport.map_points`).
+
+    Args:
+        points: DataFrame avec 'nom', 'zone', 'latitude', 'longitude' et
+            'nombre_pros'
+        latitude, longitude, zoom: Vue initiale
+
+    Returns:
+        Deck pydeck
+    """
+    points = points.copy()
+    # Rayon proportionnel à la racine de l'effectif : l'aire du disque
+    # suit le nombre de professionnels
+    scale = np.sqrt(points["nombre_pros"] / max(points["nombre_pros"].max(), 1))
+    points["rayon_px"] = 3 + 37 * scale
+    # Couleur Plasma approchée : violet (peu) → jaune (beaucoup)
+    points["couleur"] = [
+        [int(13 + 227 * s), int(8 + 241 * s**2), int(135 - 102 * s), 180]
+        for s in scale
+    ]
+
+    layer = pdk.Layer(
+        "ScatterplotLayer",
+        data=points,
+        get_position=["longitude", "latitude"],
+        get_radius="rayon_px",
+        radius_units="pixels",
+        get_fill_color="couleur",
+        pickable=True,
+        stroked=False,
+    )
+    return pdk.Deck(
+        layers=[layer],
+        initial_view_state=pdk.ViewState(
+            latitude=latitude, longitude=longitude, zoom=zoom
+        ),
+        map_provider="carto",
+        map_style="light",
+        tooltip={"text": "{nom} ({zone})\n{nombre_pros} professionnels"},
+        height=height,
+    )
+
+
+def grid_deck(
+    points: pd.DataFrame,
+    latitude: float,
+    longitude: float,
+    zoom: float,
+    height: int = 700,
+) -> pdk.Deck:
+    """
+    Carte de chaleur WebGL (pydeck) des cellules d'une grille de comptage
+    (`utils.viewport.grid_points`).
+    """
+    layer = pdk.Layer(
+        "HeatmapLayer",
+        data=points[["latitude", "longitude", "nombre_pros"]],
+        get_position=["longitude", "latitude"],
+        get_weight="nombre_pros",
+        radius_pixels=30,
+        aggregation="SUM",
+    )
+    return pdk.Deck(
+        layers=[layer],
+        initial_view_state=pdk.ViewState(
+            latitude=latitude, longitude=longitude, zoom=zoom
+        ),
+        map_provider="carto",
+        map_style="light",
+        height=height,
+    )
+
+
+def cached_figure(key: Hashable, build: Callable[[], go.Figure]) -> dict:
+    """
+    Figure Plotly construite et sérialisée en JSON une seule fois par clé,
+    partagée par toutes les sessions.
+
+    La clé décrit les entrées de la figure sans relire ses données : clé
+    de mémoïsation des agrégats tracés (voir utils.aggregates.memo_key),
+    empreinte de la couche, paramètres d'affichage.
+
+    Args:
+        key: Clé de la figure
+        build: Construit la figure
+
+    Returns:
+        {"spec" (JSON de la figure), "octets", "depuis_cache", "temps_s"} ; temps_s est le temps passé dans cet appel (lecture du
+        cache, ou construction et sérialisation)
+    """
+    start = perf_counter()
+    built = False
+
+    def compute() -> dict:
+        nonlocal built
+        built = True
+        figure = build()
+        spec = figure.to_json()
+        return {"spec": spec, "octets": len(spec)}
+
+    entry = _figures.get_or_compute(key, compute, sizeof=lambda entry: entry["octets"])
+    return {
+        **entry,
+        "depuis_cache": not built,
+        "temps_s": round(perf_counter() - start, 3),
+    }
+
+
+def get_figure_cache() -> FrameCache:
+    """Cache des figures partagé par le processus."""
+    return _figures
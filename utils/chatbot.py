@@ -3,11 +3,21 @@ HealthMap Chatbot - Assistant intelligent d'orientation médicale
 Utilise Ollama Mistral pour analyser les symptômes et recommander des professionnels
 """
 
-import requests
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import perf_counter
+from typing import Iterator, Optional, Sequence
+import httpx
 import pandas as pd
-from utils.data import load_data
-from utils.metrics import professionals_by_departement
+from utils.cache import ResponseCache, get_response_cache
+from utils.data import get_density, get_departement_summary
+from utils.metrics import NATIONAL_ZONE, density_of
+from utils.ollama import DEFAULT_MODEL, DEFAULT_URL, get_client
+from utils.symptoms import get_symptom_matcher
+
+# Version du gabarit de `_build_prompt` : à incrémenter à chaque
+# modification, les réponses en cache pour l'ancien gabarit sont ignorées
+PROMPT_VERSION = "1"
 
 
 class HealthMapChatbot:
@@ -41,52 +51,134 @@ class HealthMapChatbot:
         "gynéco": ["gynécologue"],
     }
 
-    def __init__(self, ollama_url: str = "http://localhost:11434"):
+    # Autres formulations reconnues pour chaque symptôme ('*' : préfixe).
+    # Le pluriel régulier et les accents sont gérés par le matcher ; un
+    # lexique plus large peut être fourni dans data/lexique_symptomes.json.
+    SYMPTOM_SYNONYMS = {
+        "mal de tête": ["mal à la tête", "maux de tête", "céphalée"],
+        "mal de dents": ["mal aux dents", "maux de dents", "rage de dents"],
+        "mal au ventre": ["mal de ventre", "maux de ventre", "douleur abdominale"],
+        "toux": ["tousse", "tousser"],
+        "fièvre": ["fiévreux", "fébrile"],
+        "cœur": ["cardiaque", "palpitation"],
+        "tensio": ["tensio*", "hypertension", "hypotension"],
+        "diabète": ["diabétique"],
+        "yeux": ["œil", "vue"],
+        "oreilles": ["otite"],
+        "articulation": ["articulaire"],
+        "dos": ["mal de dos", "lombalgie"],
+        "stress": ["stressé"],
+        "dépression": ["déprimé"],
+        "anxiété": ["anxieux", "angoisse"],
+        "allergie": ["allergique"],
+        "grossesse": ["enceinte"],
+        "gynéco": ["gynéco*"],
+    }
+
+    def __init__(
+        self, ollama_url: str = DEFAULT_URL, cache: Optional[ResponseCache] = None
+    ):
         """
         Initialise le chatbot
 
         Args:
             ollama_url: URL du serveur Ollama
+            cache: Cache des réponses du modèle (cache partagé du
+                processus si None)
         """
         self.ollama_url = ollama_url
-        self.model = "mistral"
-        self.df_professionals = None
-        self.df_by_dept = None
-        self._load_data()
-
-    def _load_data(self):
-        """Charge les données des professionnels de santé"""
+        self.model = DEFAULT_MODEL
+        # Client HTTP partagé : connexions réutilisées entre requêtes
+        self.client = get_client(ollama_url, self.model)
+        self.cache = cache if cache is not None else get_response_cache()
+
+    # Les données ne sont chargées qu'à leur première utilisation, puis
+    # servies par les caches partagés du processus (rechargés si les
+    # fichiers changent) : construire le chatbot ne coûte rien.
+
+    @property
+    def matcher(self):
+        """Matcher de symptômes compilé (partagé par le processus)"""
+        return get_symptom_matcher(self.SYMPTOMS_TO_SPECIALTIES, self.SYMPTOM_SYNONYMS)
+
+    @property
+    def summary(self) -> Optional[dict]:
+        """
+        Résumé par département (partagé par le processus) : le chatbot ne
+        garde pas l'annuaire des professionnels en mémoire.
+        """
         try:
-            self.df_professionals = load_data()
-            self.df_by_dept = professionals_by_departement(self.df_professionals)
+            return get_departement_summary()
         except Exception as e:
             print(f"Erreur chargement données: {e}")
+            return None
 
-    def _query_ollama(self, prompt: str) -> str:
+    @property
+    def df_density(self) -> Optional[pd.DataFrame]:
+        """Densités par zone, None si elles n'ont pas été calculées"""
+        try:
+            return get_density()
+        except FileNotFoundError:
+            # Densités non calculées (python -m pipeline run) : la
+            # couverture est jugée sur les effectifs bruts
+            return None
+
+    def _query_ollama(
+        self, prompt: str, on_success=None, timeout: Optional[float] = None
+    ) -> str:
         """
         Envoie une requête au serveur Ollama
 
         Args:
             prompt: Le texte à traiter
+            on_success: Appelé avec la réponse si le modèle a répondu
+            timeout: Délai maximal de la requête, en secondes (délais du
+                client si None)
 
         Returns:
             Réponse du modèle
         """
         try:
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json={"model": self.model, "prompt": prompt, "stream": False},
-                timeout=30,
-            )
-            response.raise_for_status()
-            return response.json()["response"].strip()
-        except requests.ConnectionError:
+            text = self.client.generate(prompt, timeout=timeout)
+        except Exception as e:
+            return self._ollama_error(e)
+        if on_success:
+            on_success(text)
+        return text
+
+    def _stream_ollama(self, prompt: str, on_success=None) -> Iterator[str]:
+        """
+        Envoie une requête au serveur Ollama et rend la réponse en flux
+
+        Args:
+            prompt: Le texte à traiter
+            on_success: Appelé avec la réponse complète une fois le flux
+                terminé sans erreur
+
+        Yields:
+            Fragments de la réponse, dès leur génération
+        """
+        fragments = []
+        try:
+            for fragment in self.client.stream(prompt):
+                fragments.append(fragment)
+                yield fragment
+        except Exception as e:
+            yield self._ollama_error(e)
+            return
+        if on_success:
+            on_success("".join(fragments).strip())
+
+    def _ollama_error(self, error: Exception) -> str:
+        """Message d'erreur affiché à la place de la réponse du modèle"""
+        if isinstance(error, httpx.ConnectError):
             return (
                 "❌ Erreur: Serveur Ollama non accessible. "
                 f"Vérifiez que Ollama est lancé sur {self.ollama_url}"
             )
-        except Exception as e:
-            return f"❌ Erreur Ollama: {str(e)}"
+        if isinstance(error, httpx.TimeoutException):
+            return "❌ Erreur Ollama: délai de réponse dépassé"
+        return f"❌ Erreur Ollama: {str(error)}"
 
     def extract_symptoms(self, user_input: str) -> list[str]:
         """
@@ -98,14 +190,7 @@ class HealthMapChatbot:
         Returns:
             Liste des symptômes détectés
         """
-        detected = []
-        user_lower = user_input.lower()
-
-        for symptom in self.SYMPTOMS_TO_SPECIALTIES.keys():
-            if symptom in user_lower:
-                detected.append(symptom)
-
-        return detected
+        return self.matcher.find(user_input)
 
     def get_recommended_specialties(self, symptoms: list[str]) -> list[str]:
         """
@@ -117,13 +202,7 @@ class HealthMapChatbot:
         Returns:
             Liste des spécialités recommandées
         """
-        specialties_set = set()
-
-        for symptom in symptoms:
-            if symptom in self.SYMPTOMS_TO_SPECIALTIES:
-                specialties_set.update(self.SYMPTOMS_TO_SPECIALTIES[symptom])
-
-        return sorted(list(specialties_set))
+        return self.matcher.specialties(symptoms)
 
     def analyze_region_coverage(self, departement: str) -> dict:
         """
@@ -135,37 +214,89 @@ class HealthMapChatbot:
         Returns:
             Analyse de la couverture
         """
-        if self.df_professionals is None:
+        summary = self.summary
+        if summary is None:
             return {"erreur": "Données indisponibles"}
 
-        dept_data = self.df_professionals[
-            self.df_professionals["departement"] == departement
-        ]
-
-        if dept_data.empty:
+        dept_data = summary["departements"].get(departement)
+        if dept_data is None:
             return {"erreur": f"Aucune donnée pour {departement}"}
 
-        total_professionals = len(dept_data)
-        avg_professionals = self.df_by_dept["nb_professionnels"].mean()
-
-        coverage_level = "✅ Bien couvert"
-        if total_professionals < avg_professionals * 0.7:
-            coverage_level = "⚠️ Sous-doté"
-        elif total_professionals < avg_professionals * 0.9:
-            coverage_level = "⚠️ Partiellement couvert"
+        national = summary["national"]
+        total_professionals = dept_data["nb_professionnels"]
+        avg_professionals = national["moyenne"]
+        ratio = total_professionals / avg_professionals
 
-        return {
+        analysis = {
             "departement": departement,
+            "nom": dept_data["nom"],
             "nb_professionnels": total_professionals,
             "moyenne_nationale": round(avg_professionals, 1),
-            "statut": coverage_level,
-            "pourcentage_moyenne": round(
-                (total_professionals / avg_professionals) * 100, 1
-            ),
+            "mediane_nationale": round(national["p50"], 1),
+            "rang_percentile": dept_data["rang_percentile"],
+            "professions": dept_data["professions"],
         }
 
+        # Avec la population, la couverture compare la densité du
+        # département à la densité nationale
+        df_density = self.df_density
+        if df_density is not None:
+            local = density_of(df_density, "departement", departement)
+            reference = density_of(df_density, "national", NATIONAL_ZONE)
+            if local and reference and pd.notna(local["densite_10k"]):
+                ratio = local["densite_10k"] / reference["densite_10k"]
+                analysis["densite_10k"] = round(local["densite_10k"], 1)
+                analysis["densite_nationale_10k"] = round(reference["densite_10k"], 1)
+
+        coverage_level = "✅ Bien couvert"
+        if ratio < 0.7:
+            coverage_level = "⚠️ Sous-doté"
+        elif ratio < 0.9:
+            coverage_level = "⚠️ Partiellement couvert"
+
+        analysis["statut"] = coverage_level
+        analysis["pourcentage_moyenne"] = round(ratio * 100, 1)
+        return analysis
+
+    def prompt_context(self, symptoms: list[str], specialties: list[str]) -> str:
+        """
+        Entrées du prompt autres que le message et le modèle, pour la clé
+        du cache des réponses : version du gabarit et du lexique,
+        symptômes et spécialités retenus. Le prompt ne contient pas de
+        données du pipeline : les reconstruire ne vide pas le cache.
+        """
+        return "\n".join(
+            (
+                f"prompt={PROMPT_VERSION}",
+                f"lexique={self.matcher.version}",
+                f"symptomes={'|'.join(sorted(symptoms))}",
+                f"specialites={'|'.join(specialties)}",
+            )
+        )
+
+    def _build_prompt(
+        self, user_message: str, symptoms: list[str], specialties: list[str]
+    ) -> str:
+        """Prompt d'orientation envoyé au modèle"""
+        return f"""Tu es un assistant santé expert en orientation médicale en France.
+L'utilisateur dit: "{user_message}"
+
+Symptômes détectés: {', '.join(symptoms) if symptoms else 'aucun symptôme spécifique'}
+Spécialités recommandées: {', '.join(specialties) if specialties else 'généraliste'}
+
+Fournis:
+1. Un diagnostic préliminaire (rappelle que ce n'est pas un avis médical)
+2. Les raisons des spécialités recommandées
+3. Des conseils immédiats simples
+4. L'urgence (normal/modéré/urgent -> appeler le 15)
+
+Sois concis, empathique et clair."""
+
     def generate_response(
-        self, user_message: str, departement: Optional[str] = None
+        self,
+        user_message: str,
+        departement: Optional[str] = None,
+        stream: bool = False,
     ) -> dict:
         """
         Génère une réponse personnalisée du chatbot
@@ -173,6 +304,8 @@ class HealthMapChatbot:
         Args:
             user_message: Message de l'utilisateur
             departement: Département de l'utilisateur (optionnel)
+            stream: Rendre l'analyse IA en flux (itérateur de fragments
+                de texte) plutôt qu'en texte complet
 
         Returns:
             Réponse structurée avec recommandations
@@ -181,21 +314,23 @@ class HealthMapChatbot:
         specialties = self.get_recommended_specialties(symptoms)
 
         # Analyse IA via Ollama
-        aia_prompt = f"""Tu es un assistant santé expert en orientation médicale en France.
-L'utilisateur dit: "{user_message}"
+        aia_prompt = self._build_prompt(user_message, symptoms, specialties)
 
-Symptômes détectés: {', '.join(symptoms) if symptoms else 'aucun symptôme spécifique'}
-Spécialités recommandées: {', '.join(specialties) if specialties else 'généraliste'}
+        # Une réponse déjà produite pour le même message normalisé et le
+        # même contexte de prompt est resservie sans appel au modèle
+        context = self.prompt_context(symptoms, specialties)
+        cached = self.cache.get(user_message, symptoms, self.model, context)
+        if cached is not None:
+            ia_analysis = iter([cached]) if stream else cached
+        else:
 
-Fournis:
-1. Un diagnostic préliminaire (rappelle que ce n'est pas un avis médical)
-2. Les raisons des spécialités recommandées
-3. Des conseils immédiats simples
-4. L'urgence (normal/modéré/urgent -> appeler le 15)
+            def remember(text: str):
+                self.cache.put(user_message, text, symptoms, self.model, context)
 
-Sois concis, empathique et clair."""
-
-        ia_analysis = self._query_ollama(aia_prompt)
+            if stream:
+                ia_analysis = self._stream_ollama(aia_prompt, on_success=remember)
+            else:
+                ia_analysis = self._query_ollama(aia_prompt, on_success=remember)
 
         # Analyse de couverture locale
         coverage_info = None
@@ -206,9 +341,113 @@ Sois concis, empathique et clair."""
             "symptoms_detected": symptoms,
             "recommended_specialties": specialties,
             "ia_analysis": ia_analysis,
+            "from_cache": cached is not None,
             "coverage_analysis": coverage_info,
         }
 
+    def generate_responses(
+        self,
+        messages: Sequence[str],
+        departements: Optional[Sequence[Optional[str]]] = None,
+        max_workers: int = 8,
+        timeout: float = 60.0,
+    ) -> dict:
+        """
+        Génère les réponses d'un lot de messages (rejeu de journaux,
+        jeux d'évaluation, API)
+
+        Symptômes et couverture sont calculés pour tout le lot (une seule
+        analyse par département distinct). Les appels au modèle passent
+        par un pool de `max_workers` threads ; un message répété dans le
+        lot, ou déjà en cache, n'est envoyé qu'une fois.
+
+        Args:
+            messages: Messages des utilisateurs
+            departements: Département de chaque message (optionnel)
+            max_workers: Nombre maximal d'appels simultanés au modèle
+            timeout: Délai maximal de chaque appel au modèle, en secondes
+
+        Returns:
+            {"responses": réponses dans l'ordre des messages (même forme
+            que `generate_response`), "nb_appels_modele": int,
+            "latence_s": durée de chaque étape}
+        """
+        if departements is None:
+            departements = [None] * len(messages)
+        if len(departements) != len(messages):
+            raise ValueError("Un département (ou None) est attendu par message")
+
+        latency = {}
+        start = step = perf_counter()
+
+        symptoms = [self.extract_symptoms(message) for message in messages]
+        specialties = [self.get_recommended_specialties(s) for s in symptoms]
+        latency["symptomes"] = perf_counter() - step
+        step = perf_counter()
+
+        coverage = {
+            departement: self.analyze_region_coverage(departement)
+            for departement in set(departements)
+            if departement
+        }
+        latency["couverture"] = perf_counter() - step
+        step = perf_counter()
+
+        contexts = [
+            self.prompt_context(s, sp) for s, sp in zip(symptoms, specialties)
+        ]
+        answers = [
+            self.cache.get(message, s, self.model, context)
+            for message, s, context in zip(messages, symptoms, contexts)
+        ]
+        from_cache = [answer is not None for answer in answers]
+        # Messages à envoyer au modèle, regroupés par clé de cache
+        pending: dict[str, list[int]] = {}
+        for i, answer in enumerate(answers):
+            if answer is None:
+                key = self.cache.key(messages[i], self.model, symptoms[i], contexts[i])
+                pending.setdefault(key, []).append(i)
+        latency["cache"] = perf_counter() - step
+        step = perf_counter()
+
+        def complete(i: int) -> str:
+            def remember(text: str):
+                self.cache.put(
+                    messages[i], text, symptoms[i], self.model, contexts[i]
+                )
+
+            prompt = self._build_prompt(messages[i], symptoms[i], specialties[i])
+            return self._query_ollama(prompt, on_success=remember, timeout=timeout)
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = {
+                    pool.submit(complete, indices[0]): indices
+                    for indices in pending.values()
+                }
+                for future, indices in futures.items():
+                    text = future.result()
+                    for i in indices:
+                        answers[i] = text
+        latency["modele"] = perf_counter() - step
+        latency["total"] = perf_counter() - start
+
+        responses = [
+            {
+                "symptoms_detected": symptoms[i],
+                "recommended_specialties": specialties[i],
+                "ia_analysis": answers[i],
+                "from_cache": from_cache[i],
+                "coverage_analysis": coverage.get(departements[i]),
+            }
+            for i in range(len(messages))
+        ]
+        return {
+            "responses": responses,
+            "nb_appels_modele": len(pending),
+            "latence_s": {name: round(value, 4) for name, value in latency.items()},
+        }
+
     def get_emergency_help(self) -> dict:
         """Retourne les informations d'urgence"""
         return {
@@ -219,7 +458,21 @@ Sois concis, empathique et clair."""
         }
 
 
-def create_chatbot_interface():
-    """Factory pour créer et configurer le chatbot dans Streamlit"""
-    return HealthMapChatbot()
+_chatbots: dict[str, HealthMapChatbot] = {}
+_chatbots_lock = Lock()
+
+
+def create_chatbot_interface(ollama_url: str = DEFAULT_URL) -> HealthMapChatbot:
+    """
+    Factory pour créer et configurer le chatbot dans Streamlit
+
+    Le chatbot est sans état : une seule instance est partagée par toutes
+    les sessions du processus (l'historique reste propre à chaque session).
+    """
+    with _chatbots_lock:
+        chatbot = _chatbots.get(ollama_url)
+        if chatbot is None:
+            chatbot = HealthMapChatbot(ollama_url)
+            _chatbots[ollama_url] = chatbot
+        return chatbot
 
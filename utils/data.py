@@ -1,43 +1,539 @@
+import json
+from contextlib import contextmanager
 from pathlib import Path
+from threading import Lock
+from time import perf_counter
+from typing import Iterable, Iterator, Optional
 import pandas as pd
 import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+import requests
 
-DATA_PATH = Path("data/fichier_professionnels_avec_coords.parquet")
+from utils.db import DB_PATH, cursor
+from utils.geo import ProximityIndex, attach_geography, departement_sql
+from utils.metrics import build_rollup, summarize_departements
 
+# Jeu de données partitionné (hive) : un répertoire par département puis
+# par profession (departement=75/profession=.../*.parquet), lignes triées
+# par code postal. Un fichier parquet unique reste accepté par load_data.
+DATA_PATH = Path("data/fichier_professionnels_avec_coords")
+PARTITION_COLUMNS = ("departement", "profession")
+ROLLUP_PATH = Path("data/rollup_professions.parquet")
+ACCESS_PATH = Path("data/acces_communes.parquet")
+DENSITY_PATH = Path("data/densite_professions.parquet")
+ACCESSIBILITY_PATH = Path("data/accessibilite_communes.parquet")
 
-def load_data() -> pd.DataFrame:
+# Grille de comptage multi-résolution (côté des cellules en km), produite
+# par le pipeline : un fichier par résolution
+GRID_DIR = Path("data/grille")
+GRID_RESOLUTIONS = {"50km": 50, "10km": 10, "2km": 2}
+
+# Contours des régions et départements (france-geojson), simplifiés par le
+# pipeline (python -m pipeline run) à plusieurs résolutions. Ils sont
+# rangés dans le dossier statique de Streamlit (server.enableStaticServing)
+# pour que les cartes les référencent par URL au lieu de les embarquer.
+STATIC_DIR = Path("static")
+STATIC_URL = "app/static"
+GEO_DIR = STATIC_DIR / "geo"
+GEOJSON_URLS = {
+    "regions": "https://raw.githubusercontent.com/gregoiredavid/france-geojson/master/regions.geojson",
+    "departements": "https://raw.githubusercontent.com/gregoiredavid/france-geojson/master/departements.geojson",
+}
+# Tolérance de simplification (en degrés) de chaque résolution
+GEO_RESOLUTIONS = {"fine": 0.001, "moyenne": 0.005, "grossiere": 0.02}
+
+
+# Colonnes de chaînes répétées, stockées sous forme dictionnairisée
+# (pandas.Categorical) : les filtres et groupby travaillent sur des codes.
+CATEGORICAL_COLUMNS = ("code_postal", "commune", "profession")
+
+
+# Colonnes toujours chargées : nettoyage des lignes et géographie
+REQUIRED_COLUMNS = ("code_postal", "latitude", "longitude")
+
+
+def _sql_literal(text: str) -> str:
+    return "'" + text.replace("'", "''") + "'"
+
+
+def parquet_source(path: Path) -> str:
     """
-    Charge les données et enrichit avec la colonne 'departement'
-    dérivée du code postal.
+    Expression DuckDB lisant un fichier parquet ou un jeu partitionné.
+
+    Pour un répertoire, les colonnes de partition sont lues en texte
+    ('01' reste '01') et les filtres portant sur elles ne lisent que les
+    fichiers des partitions concernées.
     """
-    if not DATA_PATH.exists():
-        raise FileNotFoundError("Fichier parquet introuvable")
+    path = Path(path)
+    if not path.is_dir():
+        return f"read_parquet({_sql_literal(path.as_posix())})"
+    hive_types = ", ".join(f"'{name}': VARCHAR" for name in PARTITION_COLUMNS)
+    return (
+        f"read_parquet({_sql_literal((path / '**' / '*.parquet').as_posix())}, "
+        f"hive_partitioning = true, hive_types = {{{hive_types}}})"
+    )
+
+
+@contextmanager
+def _connection(path: Path) -> Iterator[duckdb.DuckDBPyConnection]:
+    """
+    Curseur de la base partagée pour un fichier .duckdb, connexion en
+    mémoire éphémère pour des fichiers parquet.
+    """
+    if path.suffix == ".duckdb":
+        with cursor(path) as cur:
+            yield cur
+    else:
+        con = duckdb.connect()
+        try:
+            yield con
+        finally:
+            con.close()
+
 
-    con = duckdb.connect()
-    df = con.execute(f"SELECT * FROM read_parquet('{DATA_PATH.as_posix()}')").df()
-    con.close()
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
 
-    # Nettoyage du code postal
-    if "code_postal" not in df.columns:
+
+def _select_query(
+    source: str,
+    available: list[str],
+    columns: Optional[Iterable[str]],
+    filters: Optional[dict[str, object]],
+) -> tuple[str, list]:
+    """Requête (et paramètres) de chargement des professionnels."""
+    if "code_postal" not in available:
         raise ValueError("La colonne 'code_postal' est absente du dataset")
 
-    df["code_postal"] = df["code_postal"].astype(str).str.zfill(5)
+    code_postal = "lpad(CAST(code_postal AS VARCHAR), 5, '0')"
+    if "departement" not in available:
+        # Fichier non partitionné : département calculé pour pouvoir filtrer
+        source = f"(SELECT *, {departement_sql(code_postal)} AS departement FROM {source})"
+        available = [*available, "departement"]
+
+    wanted = set(available if columns is None else columns) | set(REQUIRED_COLUMNS)
+    # Nom du département et région sont recalculés après chargement
+    wanted -= {"nom_departement", "region"}
+    unknown = [name for name in [*wanted, *(filters or {})] if name not in available]
+    if unknown:
+        raise ValueError(f"Colonnes absentes du dataset : {', '.join(sorted(unknown))}")
+
+    # Nettoyage du code postal et typage des coordonnées, dans l'ordre des
+    # colonnes du dataset
+    expressions = {
+        "code_postal": f"{code_postal} AS code_postal",
+        "latitude": "CAST(latitude AS FLOAT) AS latitude",
+        "longitude": "CAST(longitude AS FLOAT) AS longitude",
+    }
+    selected = [expressions.get(name, _quote(name)) for name in available if name in wanted]
+
+    conditions = ["latitude IS NOT NULL", "longitude IS NOT NULL"]
+    params = []
+    for name, values in (filters or {}).items():
+        if values is None:
+            continue
+        if isinstance(values, str) or not isinstance(values, Iterable):
+            values = [values]
+        values = list(values)
+        if not values:
+            continue
+        placeholders = ", ".join("?" for _ in values)
+        conditions.append(f"{_quote(name)} IN ({placeholders})")
+        params.extend(values)
+
+    # Projection, filtres et suppression des lignes sans coordonnées GPS
+    # sont faits par DuckDB, avant pandas.
+    sql = f"""
+        SELECT {", ".join(selected)}
+        FROM {source}
+        WHERE {" AND ".join(conditions)}
+    """
+    return sql, params
+
+
+def load_data(
+    path: Path = DATA_PATH,
+    arrow_strings: bool = False,
+    columns: Optional[Iterable[str]] = None,
+    filters: Optional[dict[str, object]] = None,
+) -> pd.DataFrame:
+    """
+    Charge les données et enrichit avec les colonnes 'departement',
+    'nom_departement' et 'region' dérivées du code postal.
+
+    Les colonnes répétitives sont catégorielles et les coordonnées en
+    float32. Avec `arrow_strings`, les autres colonnes texte (nom,
+    prénom...) sont stockées en chaînes Arrow plutôt qu'en objets Python.
+
+    Projection et filtres sont exécutés par DuckDB : sur le jeu
+    partitionné, un filtre sur 'departement' ou 'profession' ne lit que
+    les fichiers des partitions retenues, et seules les colonnes demandées
+    sont décodées.
+
+    Args:
+        path: Répertoire partitionné, fichier parquet ou base .duckdb du
+            pipeline (table 'professionnels')
+        columns: Colonnes à charger (toutes si None) ; code postal,
+            coordonnées et colonnes géographiques sont toujours présents
+        filters: {colonne: valeur ou liste de valeurs} ; une valeur None
+            ou une liste vide ne filtre pas
+
+    Example:
+        load_data(filters={"departement": "75", "profession": ["Sage-femme"]})
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError("Fichier parquet introuvable")
+
+    # Base du pipeline : table déjà typée, statistiques et index partagés
+    source = "professionnels" if path.suffix == ".duckdb" else parquet_source(path)
+    with _connection(path) as con:
+        available = [
+            row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()
+        ]
+        sql, params = _select_query(source, available, columns, filters)
+        table = con.execute(sql, params).fetch_arrow_table()
 
-    df["departement"] = df["code_postal"].apply(code_postal_to_departement)
+    for name in CATEGORICAL_COLUMNS:
+        if name in table.column_names:
+            index = table.column_names.index(name)
+            table = table.set_column(
+                index, name, pc.dictionary_encode(table.column(name))
+            )
 
-    df = df.dropna(subset=["latitude", "longitude"])
+    types_mapper = _arrow_string_dtype if arrow_strings else None
+    df = table.to_pandas(types_mapper=types_mapper)
+
+    df = attach_geography(df)
 
     return df
 
 
-def code_postal_to_departement(cp: str) -> str:
+def _arrow_string_dtype(arrow_type: pa.DataType):
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype("pyarrow")
+    return None
+
+
+def file_fingerprint(path: Path) -> tuple[int, int]:
+    """
+    Empreinte bon marché d'un fichier : (mtime en ns, taille en octets).
+
+    Pour un répertoire partitionné : mtime le plus récent et taille
+    totale de ses fichiers parquet.
+    """
+    if path.is_dir():
+        stats = [child.stat() for child in path.rglob("*.parquet")]
+        return (
+            max((stat.st_mtime_ns for stat in stats), default=0),
+            sum(stat.st_size for stat in stats),
+        )
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ProfessionalsDataset:
+    """
+    Jeu de données des professionnels, chargé une seule fois par processus.
+
+    Les onglets et le chatbot n'accèdent au DataFrame qu'au travers de
+    projections (`view`), sans copier l'ensemble du frame.
+    """
+
+    def __init__(self, path: Path = DATA_PATH, arrow_strings: bool = False):
+        self.path = Path(path)
+        self.version = file_fingerprint(self.path)
+
+        start = perf_counter()
+        self._frame = load_data(self.path, arrow_strings=arrow_strings)
+        self.load_seconds = perf_counter() - start
+        self.memory_bytes = int(self._frame.memory_usage(deep=True).sum())
+
+    def __len__(self) -> int:
+        return len(self._frame)
+
+    def is_stale(self) -> bool:
+        """Indique si le fichier source a changé depuis le chargement."""
+        return not self.path.exists() or file_fingerprint(self.path) != self.version
+
+    def view(
+        self,
+        columns: Optional[Iterable[str]] = None,
+        professions: Optional[Iterable[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Retourne une projection en lecture seule du jeu de données.
+
+        Args:
+            columns: Colonnes à conserver (toutes si None)
+            professions: Professions à conserver (toutes si None ou vide)
+
+        Returns:
+            DataFrame partageant ses buffers avec le jeu de données
+        """
+        # Copie superficielle : l'appelant peut ajouter des colonnes sans
+        # toucher au frame partagé ; les valeurs sont protégées par
+        # Copy-on-Write, activé par l'application (app_streamlit.py).
+        df = self._frame.copy(deep=False)
+        if professions:
+            df = df[df["profession"].isin(list(professions))]
+        if columns is not None:
+            df = df[list(columns)]
+        return df
+
+    def professions(self) -> list[str]:
+        """Liste triée des professions présentes."""
+        return sorted(self._frame["profession"].dropna().unique())
+
+    @property
+    def bytes_per_row(self) -> float:
+        """Empreinte mémoire moyenne d'une ligne, en octets."""
+        return self.memory_bytes / len(self._frame) if len(self._frame) else 0.0
+
+    def stats(self) -> dict:
+        """Temps de chargement et empreinte mémoire du jeu de données."""
+        return {
+            "lignes": len(self._frame),
+            "temps_chargement_s": round(self.load_seconds, 3),
+            "memoire_mo": round(self.memory_bytes / 1024**2, 1),
+            "octets_par_ligne": round(self.bytes_per_row, 1),
+        }
+
+
+_datasets: dict[Path, ProfessionalsDataset] = {}
+_datasets_lock = Lock()
+
+
+def default_data_path() -> Path:
+    """Base DuckDB du pipeline si elle existe, jeu partitionné sinon."""
+    return DB_PATH if DB_PATH.exists() else DATA_PATH
+
+
+def get_dataset(path: Optional[Path] = None) -> ProfessionalsDataset:
+    """
+    Retourne le jeu de données partagé par le processus.
+
+    Il est rechargé uniquement si le fichier source a été modifié.
+    """
+    path = Path(path) if path is not None else default_data_path()
+    with _datasets_lock:
+        dataset = _datasets.get(path)
+        if dataset is None or dataset.is_stale():
+            dataset = ProfessionalsDataset(path)
+            _datasets[path] = dataset
+        return dataset
+
+
+def loaded_dataset(path: Optional[Path] = None) -> Optional[ProfessionalsDataset]:
+    """Jeu de données déjà chargé par le processus, sans le charger (ou None)."""
+    path = Path(path) if path is not None else default_data_path()
+    with _datasets_lock:
+        return _datasets.get(path)
+
+
+_proximity: dict[str, tuple[tuple[int, int], ProximityIndex]] = {}
+_proximity_lock = Lock()
+
+
+def get_proximity_index() -> ProximityIndex:
+    """
+    Index spatial des professionnels, partagé par le processus et
+    reconstruit uniquement quand le jeu de données change.
+    """
+    dataset = get_dataset()
+    with _proximity_lock:
+        cached = _proximity.get("professionnels")
+        if cached is None or cached[0] != dataset.version:
+            cached = (dataset.version, ProximityIndex(dataset.view()))
+            _proximity["professionnels"] = cached
+        return cached[1]
+
+
+_layers: dict[Path, tuple[tuple[int, int], pd.DataFrame]] = {}
+_layers_lock = Lock()
+
+
+def read_layer(path: Path) -> pd.DataFrame:
+    """
+    Lit une couche parquet produite par le pipeline.
+
+    La couche est gardée en mémoire tant que le fichier ne change pas.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Fichier parquet introuvable : {path}")
+
+    version = file_fingerprint(path)
+    with _layers_lock:
+        cached = _layers.get(path)
+        if cached is None or cached[0] != version:
+            cached = (version, pd.read_parquet(path))
+            _layers[path] = cached
+        return cached[1]
+
+
+def get_access_layer(path: Path = ACCESS_PATH) -> pd.DataFrame:
+    """
+    Temps d'accès de chaque commune aux professionnels les plus proches,
+    par profession (couche produite par le pipeline).
+    """
+    return read_layer(path)
+
+
+def get_density(path: Path = DENSITY_PATH) -> pd.DataFrame:
+    """
+    Densité de professionnels pour 10 000 habitants par niveau, zone et
+    profession (couche produite par le pipeline, voir `build_density`).
+
+    Indexée par (niveau, zone, profession) : une zone se lit en temps
+    constant avec `density_of`.
+    """
+    return read_layer(path)
+
+
+def get_accessibility_layer(path: Path = ACCESSIBILITY_PATH) -> pd.DataFrame:
     """
-    Convertit un code postal français en département.
+    Indice d'accessibilité 2SFCA de chaque commune, par profession
+    (couche produite par le pipeline, voir `utils.accessibility`).
     """
-    if cp.startswith("20"):
-        # Corse
-        return "2A/2B"
-    if cp.startswith(("97", "98")):
-        # DOM-TOM
-        return cp[:3]
-    return cp[:2]
+    return read_layer(path)
+
+
+def grid_resolution_for_zoom(zoom: float) -> str:
+    """Résolution de grille adaptée à un niveau de zoom de carte."""
+    if zoom >= 9:
+        return "2km"
+    if zoom >= 6:
+        return "10km"
+    return "50km"
+
+
+def grid_path(resolution: str) -> Path:
+    return GRID_DIR / f"grille_{resolution}.parquet"
+
+
+def get_grid(resolution: str) -> pd.DataFrame:
+    """
+    Nombre de professionnels par cellule de grille et par profession,
+    pour une résolution (seul ce fichier est lu).
+    """
+    if resolution not in GRID_RESOLUTIONS:
+        raise ValueError(f"Résolution inconnue : {resolution}")
+    return read_layer(grid_path(resolution))
+
+
+def get_rollup(path: Path = ROLLUP_PATH) -> pd.DataFrame:
+    """
+    Cube de comptage niveau géographique × profession.
+
+    Lu depuis le fichier produit par le pipeline ; à défaut, calculé une
+    fois à partir du jeu de données complet.
+    """
+    if Path(path).exists():
+        return read_layer(path)
+
+    dataset = get_dataset()
+    with _layers_lock:
+        cached = _layers.get(Path(path))
+        if cached is None or cached[0] != dataset.version:
+            cached = (dataset.version, build_rollup(dataset.view()))
+            _layers[Path(path)] = cached
+        return cached[1]
+
+
+_summary: dict[str, tuple[pd.DataFrame, dict]] = {}
+_summary_lock = Lock()
+
+
+def get_departement_summary() -> dict:
+    """
+    Résumé par département (`summarize_departements`), partagé par le
+    processus et recalculé uniquement quand le cube de comptage change.
+    """
+    rollup = get_rollup()
+    with _summary_lock:
+        cached = _summary.get("departement")
+        # get_rollup renvoie le même objet tant que ses données sont inchangées
+        if cached is None or cached[0] is not rollup:
+            cached = (rollup, summarize_departements(rollup))
+            _summary["departement"] = cached
+        return cached[1]
+
+
+def resolution_for_zoom(zoom: float) -> str:
+    """Résolution de contours adaptée à un niveau de zoom de carte."""
+    if zoom >= 8:
+        return "fine"
+    if zoom >= 6:
+        return "moyenne"
+    return "grossiere"
+
+
+def geojson_path(niveau: str, resolution: str) -> Path:
+    return GEO_DIR / f"{niveau}_{resolution}.geojson"
+
+
+def geojson_url(niveau: str, resolution: str) -> Optional[str]:
+    """
+    URL relative des contours servis par Streamlit (None si le pipeline
+    ne les a pas produits).
+    """
+    path = geojson_path(niveau, resolution)
+    if not path.exists():
+        return None
+    return f"{STATIC_URL}/{path.relative_to(STATIC_DIR).as_posix()}"
+
+
+_geojson: dict[tuple[str, str], dict] = {}
+_geojson_lock = Lock()
+
+
+def load_geojson(niveau: str, resolution: str = "grossiere") -> dict:
+    """
+    Contours GeoJSON d'un niveau ('regions' ou 'departements').
+
+    Lus depuis le magasin local produit par le pipeline et gardés en
+    mémoire ; à défaut, téléchargés une seule fois par processus en
+    pleine résolution.
+
+    Returns:
+        Dictionnaire {"geojson", "resolution", "octets",
+        "temps_chargement_s", "depuis_cache"} ; temps_chargement_s est le
+        temps de cet appel
+    """
+    if niveau not in GEOJSON_URLS:
+        raise ValueError(f"Niveau inconnu : {niveau}")
+    if resolution not in GEO_RESOLUTIONS:
+        raise ValueError(f"Résolution inconnue : {resolution}")
+
+    start = perf_counter()
+    path = geojson_path(niveau, resolution)
+    key = (niveau, resolution if path.exists() else "source")
+    version = file_fingerprint(path) if path.exists() else None
+    with _geojson_lock:
+        entry = _geojson.get(key)
+    cached = entry is not None and entry["version"] == version
+    if not cached:
+        # Lecture (ou téléchargement) hors verrou : les autres sessions
+        # continuent d'être servies pendant ce temps ; deux chargements
+        # simultanés du même fichier publient le même contenu
+        if path.exists():
+            payload = path.read_bytes()
+        else:
+            response = requests.get(GEOJSON_URLS[niveau], timeout=30)
+            response.raise_for_status()
+            payload = response.content
+        entry = {
+            "version": version,
+            "geojson": json.loads(payload),
+            "resolution": key[1],
+            "octets": len(payload),
+        }
+        with _geojson_lock:
+            _geojson[key] = entry
+    return {
+        **{k: v for k, v in entry.items() if k != "version"},
+        "temps_chargement_s": round(perf_counter() - start, 3),
+        "depuis_cache": cached,
+    }
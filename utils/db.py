@@ -0,0 +1,207 @@
+"""
+Base DuckDB persistante produite par le pipeline (data/healthmap.duckdb).
+
+Elle regroupe les tables (professionnels, communes, couches agrégées),
+des vues pour les agrégats courants et des index. L'application l'ouvre
+une seule fois par processus, en lecture seule : catalogue, statistiques
+et métadonnées sont partagés par toutes les requêtes, qui passent par un
+pool de curseurs utilisable depuis plusieurs threads.
+
+Consultation ad hoc, pendant que l'application tourne :
+    duckdb -readonly data/healthmap.duckdb
+    >>> from utils.db import query
+    >>> query("SELECT * FROM professionnels_par_region")
+"""
+
+import queue
+from contextlib import contextmanager
+from pathlib import Path
+from threading import BoundedSemaphore, Lock
+from typing import Iterator, Optional
+
+import duckdb
+import pandas as pd
+
+DB_PATH = Path("data/healthmap.duckdb")
+# Nombre maximal de requêtes exécutées en même temps
+DEFAULT_MAX_CURSORS = 8
+
+
+def _version(path: Path) -> tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+# Nom sous lequel le fichier est attaché
+_CATALOG = "base"
+
+
+class Database:
+    """
+    Connexion en lecture seule à la base et pool de curseurs.
+
+    Chaque curseur est une connexion DuckDB sur la même instance : il
+    n'est utilisé que par un thread à la fois et rendu au pool après la
+    requête.
+
+    Le fichier est attaché à une instance en mémoire propre à l'objet
+    plutôt qu'ouvert directement : DuckDB partage une instance par fichier
+    ouvert dans le processus, ce qui empêcherait de lire un fichier
+    reconstruit tant que l'ancienne instance sert encore des requêtes.
+
+    Args:
+        path: Fichier .duckdb
+        max_cursors: Nombre maximal de curseurs utilisés simultanément ;
+            au-delà, `cursor()` attend qu'un curseur se libère
+    """
+
+    def __init__(self, path: Path = DB_PATH, max_cursors: int = DEFAULT_MAX_CURSORS):
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"Base DuckDB introuvable : {self.path}")
+        self.version = _version(self.path)
+        self._con = duckdb.connect(":memory:")
+        quoted = str(self.path).replace("'", "''")
+        self._con.execute(f"ATTACH '{quoted}' AS {_CATALOG} (READ_ONLY)")
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = BoundedSemaphore(max_cursors)
+        # Curseurs empruntés ; une base retirée est fermée quand le
+        # dernier est rendu
+        self._active = 0
+        self._retired = False
+        self._closed = False
+        self._state_lock = Lock()
+
+    def is_stale(self) -> bool:
+        """Indique si le fichier a été reconstruit depuis l'ouverture."""
+        return not self.path.exists() or _version(self.path) != self.version
+
+    def reserve(self):
+        """
+        Réserve un curseur : la base reste ouverte, même retirée, jusqu'à
+        l'appel de `release()`.
+        """
+        with self._state_lock:
+            if self._closed:
+                raise RuntimeError(f"Base fermée : {self.path}")
+            self._active += 1
+
+    def release(self):
+        with self._state_lock:
+            self._active -= 1
+            if self._retired and self._active == 0:
+                self._close()
+
+    @contextmanager
+    def cursor(self, reserved: bool = False) -> Iterator[duckdb.DuckDBPyConnection]:
+        """
+        Curseur emprunté au pool pour la durée du bloc.
+
+        Args:
+            reserved: La réservation a déjà été faite par l'appelant
+                (voir le `cursor()` du module)
+        """
+        if not reserved:
+            self.reserve()
+        try:
+            with self._slots:
+                try:
+                    cur = self._idle.get_nowait()
+                except queue.Empty:
+                    cur = self._con.cursor()
+                    cur.execute(f"USE {_CATALOG}")
+                try:
+                    yield cur
+                finally:
+                    self._idle.put(cur)
+        finally:
+            self.release()
+
+    def query(self, sql: str, params: Optional[list] = None) -> pd.DataFrame:
+        """Résultat d'une requête sous forme de DataFrame."""
+        with self.cursor() as cur:
+            return cur.execute(sql, params).df()
+
+    def tables(self) -> list[str]:
+        """Tables et vues de la base."""
+        with self.cursor() as cur:
+            rows = cur.execute(
+                "SELECT table_name FROM information_schema.tables"
+                " WHERE table_catalog = ? ORDER BY table_name",
+                [_CATALOG],
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def retire(self):
+        """
+        Retire la base du service : elle est fermée dès que les curseurs
+        en cours d'utilisation sont rendus (immédiatement s'il n'y en a pas).
+        """
+        with self._state_lock:
+            self._retired = True
+            if self._active == 0:
+                self._close()
+
+    def close(self):
+        with self._state_lock:
+            self._close()
+
+    def _close(self):
+        # Appelé sous _state_lock
+        if self._closed:
+            return
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self._con.close()
+
+
+_databases: dict[Path, Database] = {}
+_databases_lock = Lock()
+
+
+def _current(path: Path) -> Database:
+    # Appelé sous _databases_lock
+    database = _databases.get(path)
+    if database is None or database.is_stale():
+        if database is not None:
+            database.retire()
+        database = Database(path)
+        _databases[path] = database
+    return database
+
+
+def get_database(path: Path = DB_PATH) -> Database:
+    """
+    Base partagée par le processus.
+
+    Rouverte uniquement quand le pipeline a reconstruit le fichier ;
+    l'ancienne base est alors retirée : les requêtes qui ont déjà réservé
+    un curseur se terminent sur l'ancien fichier, qui est fermé quand
+    elles l'ont toutes rendu. Pour exécuter une requête, préférer
+    `cursor()`, qui réserve le curseur avant qu'un autre thread puisse
+    retirer la base.
+    """
+    path = Path(path)
+    with _databases_lock:
+        return _current(path)
+
+
+@contextmanager
+def cursor(path: Path = DB_PATH) -> Iterator[duckdb.DuckDBPyConnection]:
+    """Curseur de la base partagée, réservé sous le verrou des bases."""
+    path = Path(path)
+    with _databases_lock:
+        database = _current(path)
+        database.reserve()
+    with database.cursor(reserved=True) as cur:
+        yield cur
+
+
+def query(sql: str, params: Optional[list] = None, path: Path = DB_PATH) -> pd.DataFrame:
+    """Exécute une requête sur la base partagée."""
+    with cursor(path) as cur:
+        return cur.execute(sql, params).df()
@@ -1,35 +1,356 @@
+from typing import Optional
 import numpy as np
 import pandas as pd
+from scipy.spatial import cKDTree
 
+EARTH_RADIUS_KM = 6371
 
-"""
-def haversine_distance(lat1, lon1, lat2, lon2) -> float:
-    Distance en km entre deux points GPS.
-    R = 6371  # rayon Terre
-    phi1, phi2 = np.radians(lat1), np.radians(lat2)
-    dphi = np.radians(lat2 - lat1)
-    dlambda = np.radians(lon2 - lon1)
 
-    a = (
-            np.sin(dphi / 2) ** 2
-            + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+def estimate_travel_time(distance_km: float, speed_kmh: float = 40) -> float:
+    """Temps d'accès estimé en minutes (accepte aussi des tableaux)."""
+    return (distance_km / speed_kmh) * 60
+
+
+# Latitude de référence des cellules de grille : à cette latitude (centre
+# de la métropole), les cellules sont carrées
+GRID_REFERENCE_LAT = 46.5
+_KM_PER_DEGREE = 2 * np.pi * EARTH_RADIUS_KM / 360
+
+
+def grid_cell_size(cell_km: float) -> tuple[float, float]:
+    """
+    Taille en degrés (latitude, longitude) d'une cellule de grille de
+    `cell_km` de côté.
+    """
+    dlat = cell_km / _KM_PER_DEGREE
+    dlon = dlat / np.cos(np.radians(GRID_REFERENCE_LAT))
+    return float(dlat), float(dlon)
+
+
+def _to_cartesian(lat, lon) -> np.ndarray:
+    """Points GPS → coordonnées 3D (km) sur la sphère terrestre."""
+    phi = np.radians(np.asarray(lat, dtype=np.float64))
+    lam = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_phi = np.cos(phi)
+    return EARTH_RADIUS_KM * np.column_stack(
+        [cos_phi * np.cos(lam), cos_phi * np.sin(lam), np.sin(phi)]
     )
-    return 2 * R * np.arcsin(np.sqrt(a))
 
 
-def nearest_professional(
-        df: pd.DataFrame, lat: float, lon: float
-) -> pd.Series:
-    Retourne le professionnel le plus proche.
-    distances = haversine_distance(
-        lat, lon, df["latitude"], df["longitude"]
+def _chord_to_km(chord: np.ndarray) -> np.ndarray:
+    ratio = np.minimum(chord / (2 * EARTH_RADIUS_KM), 1.0)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(ratio)
+
+
+def _km_to_chord(distance_km: float) -> float:
+    return 2 * EARTH_RADIUS_KM * np.sin(distance_km / (2 * EARTH_RADIUS_KM))
+
+
+class ProximityIndex:
+    """
+    Index spatial des professionnels : un k-d tree par profession.
+
+    Les points sont placés en 3D sur la sphère terrestre ; la distance
+    euclidienne (corde) y croît avec la distance orthodromique, ce qui
+    rend les recherches exactes, y compris pour l'outre-mer.
+    """
+
+    def __init__(self, df: pd.DataFrame, by: str = "profession"):
+        """
+        Args:
+            df: Professionnels avec colonnes 'latitude' et 'longitude'
+            by: Colonne selon laquelle construire un index par valeur
+        """
+        self._frame = df
+        points = _to_cartesian(df["latitude"].to_numpy(), df["longitude"].to_numpy())
+
+        self._trees: dict[Optional[str], tuple[cKDTree, np.ndarray]] = {
+            None: (cKDTree(points), np.arange(len(df)))
+        }
+        for value, rows in df.groupby(by, observed=True).indices.items():
+            self._trees[value] = (cKDTree(points[rows]), rows)
+
+    @property
+    def professions(self) -> list[str]:
+        return sorted(k for k in self._trees if k is not None)
+
+    def _tree(self, profession: Optional[str]) -> tuple[cKDTree, np.ndarray]:
+        if profession not in self._trees:
+            raise KeyError(f"Profession inconnue : {profession}")
+        return self._trees[profession]
+
+    def query(
+        self,
+        lat,
+        lon,
+        k: int = 1,
+        profession: Optional[str] = None,
+        workers: int = -1,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        k plus proches professionnels de chaque point (requête groupée).
+
+        Args:
+            lat, lon: Coordonnées des points de requête (scalaires ou tableaux)
+            k: Nombre de voisins
+            profession: Restreindre à une profession (toutes si None)
+            workers: Nombre de cœurs utilisés (-1 : tous)
+
+        Returns:
+            (distances en km, positions des lignes dans le DataFrame),
+            tableaux de forme (nb points, k) ; position -1 et distance
+            infinie quand il y a moins de k professionnels
+        """
+        tree, rows = self._tree(profession)
+        points = _to_cartesian(np.atleast_1d(lat), np.atleast_1d(lon))
+
+        distances = np.full((len(points), k), np.inf)
+        positions = np.full((len(points), k), -1, dtype=np.int64)
+        k_found = min(k, tree.n)
+        if k_found:
+            chord, idx = tree.query(points, k=k_found, workers=workers)
+            chord = chord.reshape(len(points), k_found)
+            idx = idx.reshape(len(points), k_found)
+            distances[:, :k_found] = _chord_to_km(chord)
+            positions[:, :k_found] = rows[idx]
+        return distances, positions
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        profession: Optional[str] = None,
+        k: int = 1,
+        speed_kmh: float = 40,
+    ) -> pd.DataFrame:
+        """
+        k professionnels les plus proches d'un point, avec distance et
+        temps d'accès estimé.
+        """
+        distances, positions = self.query(lat, lon, k=k, profession=profession)
+        found = positions[0] >= 0
+        distances = distances[0][found]
+        return self._frame.iloc[positions[0][found]].assign(
+            distance_km=distances,
+            temps_acces_min=estimate_travel_time(distances, speed_kmh),
+        )
+
+
+# ============= RÉFÉRENTIEL GÉOGRAPHIQUE =============
+
+INCONNU = "Inconnu"
+REGION_INCONNUE = "Inconnue"
+
+DEPARTEMENTS = {
+    "01": "Ain",
+    "02": "Aisne",
+    "03": "Allier",
+    "04": "Alpes-de-Haute-Provence",
+    "05": "Hautes-Alpes",
+    "06": "Alpes-Maritimes",
+    "07": "Ardèche",
+    "08": "Ardennes",
+    "09": "Ariège",
+    "10": "Aube",
+    "11": "Aude",
+    "12": "Aveyron",
+    "13": "Bouches-du-Rhône",
+    "14": "Calvados",
+    "15": "Cantal",
+    "16": "Charente",
+    "17": "Charente-Maritime",
+    "18": "Cher",
+    "19": "Corrèze",
+    "2A": "Corse-du-Sud",
+    "2B": "Haute-Corse",
+    "21": "Côte-d'Or",
+    "22": "Côtes-d'Armor",
+    "23": "Creuse",
+    "24": "Dordogne",
+    "25": "Doubs",
+    "26": "Drôme",
+    "27": "Eure",
+    "28": "Eure-et-Loir",
+    "29": "Finistère",
+    "30": "Gard",
+    "31": "Haute-Garonne",
+    "32": "Gers",
+    "33": "Gironde",
+    "34": "Hérault",
+    "35": "Ille-et-Vilaine",
+    "36": "Indre",
+    "37": "Indre-et-Loire",
+    "38": "Isère",
+    "39": "Jura",
+    "40": "Landes",
+    "41": "Loir-et-Cher",
+    "42": "Loire",
+    "43": "Haute-Loire",
+    "44": "Loire-Atlantique",
+    "45": "Loiret",
+    "46": "Lot",
+    "47": "Lot-et-Garonne",
+    "48": "Lozère",
+    "49": "Maine-et-Loire",
+    "50": "Manche",
+    "51": "Marne",
+    "52": "Haute-Marne",
+    "53": "Mayenne",
+    "54": "Meurthe-et-Moselle",
+    "55": "Meuse",
+    "56": "Morbihan",
+    "57": "Moselle",
+    "58": "Nièvre",
+    "59": "Nord",
+    "60": "Oise",
+    "61": "Orne",
+    "62": "Pas-de-Calais",
+    "63": "Puy-de-Dôme",
+    "64": "Pyrénées-Atlantiques",
+    "65": "Hautes-Pyrénées",
+    "66": "Pyrénées-Orientales",
+    "67": "Bas-Rhin",
+    "68": "Haut-Rhin",
+    "69": "Rhône",
+    "70": "Haute-Saône",
+    "71": "Saône-et-Loire",
+    "72": "Sarthe",
+    "73": "Savoie",
+    "74": "Haute-Savoie",
+    "75": "Paris",
+    "76": "Seine-Maritime",
+    "77": "Seine-et-Marne",
+    "78": "Yvelines",
+    "79": "Deux-Sèvres",
+    "80": "Somme",
+    "81": "Tarn",
+    "82": "Tarn-et-Garonne",
+    "83": "Var",
+    "84": "Vaucluse",
+    "85": "Vendée",
+    "86": "Vienne",
+    "87": "Haute-Vienne",
+    "88": "Vosges",
+    "89": "Yonne",
+    "90": "Territoire de Belfort",
+    "91": "Essonne",
+    "92": "Hauts-de-Seine",
+    "93": "Seine-Saint-Denis",
+    "94": "Val-de-Marne",
+    "95": "Val-d'Oise",
+    "971": "Guadeloupe",
+    "972": "Martinique",
+    "973": "Guyane",
+    "974": "La Réunion",
+    "976": "Mayotte",
+}
+
+REGIONS = {
+    "Auvergne-Rhône-Alpes": [
+        "01", "03", "07", "15", "26", "38", "42", "43", "63", "69", "73", "74"
+    ],
+    "Bourgogne-Franche-Comté": ["21", "25", "39", "58", "70", "71", "89", "90"],
+    "Bretagne": ["22", "29", "35", "56"],
+    "Centre-Val de Loire": ["18", "28", "36", "37", "41", "45"],
+    "Corse": ["2A", "2B"],
+    "Grand Est": ["08", "10", "51", "52", "54", "55", "57", "67", "68", "88"],
+    "Hauts-de-France": ["02", "59", "60", "62", "80"],
+    "Île-de-France": ["75", "77", "78", "91", "92", "93", "94", "95"],
+    "Normandie": ["14", "27", "50", "61", "76"],
+    "Nouvelle-Aquitaine": [
+        "16", "17", "19", "23", "24", "33", "40", "47", "64", "79", "86", "87"
+    ],
+    "Occitanie": [
+        "09", "11", "12", "30", "31", "32", "34", "46", "48", "65", "66", "81", "82"
+    ],
+    "Pays de la Loire": ["44", "49", "53", "72", "85"],
+    "Provence-Alpes-Côte d'Azur": ["04", "05", "06", "13", "83", "84"],
+    "Guadeloupe": ["971"],
+    "Martinique": ["972"],
+    "Guyane": ["973"],
+    "La Réunion": ["974"],
+    "Mayotte": ["976"],
+}
+
+DEPARTEMENT_TO_REGION = {
+    dept: region for region, depts in REGIONS.items() for dept in depts
+}
+
+
+def code_postal_to_departement(cp: str) -> str:
+    """
+    Convertit un code postal français en code département.
+
+    La Corse est découpée en 2A (20000-20199) et 2B (20200-20699),
+    l'outre-mer utilise les trois premiers chiffres (971, 972...).
+    """
+    if not isinstance(cp, str) or len(cp) != 5 or not cp.isdigit():
+        return INCONNU
+    if cp.startswith("20"):
+        return "2A" if cp[2] in "01" else "2B"
+    if cp.startswith(("97", "98")):
+        return cp[:3]
+    return cp[:2]
+
+
+def departement_sql(cp: str = "code_postal") -> str:
+    """
+    Équivalent SQL (DuckDB) de `code_postal_to_departement`, appliqué à
+    l'expression `cp` (code postal en texte).
+    """
+    return f"""
+        CASE
+            WHEN {cp} IS NULL OR NOT regexp_full_match({cp}, '[0-9]{{5}}') THEN '{INCONNU}'
+            WHEN {cp} LIKE '20%' THEN
+                CASE WHEN substr({cp}, 3, 1) IN ('0', '1') THEN '2A' ELSE '2B' END
+            WHEN {cp} LIKE '97%' OR {cp} LIKE '98%' THEN substr({cp}, 1, 3)
+            ELSE substr({cp}, 1, 2)
+        END
+    """
+
+
+def geography_table(codes_postaux) -> pd.DataFrame:
+    """
+    Table de correspondance code postal → département, nom, région.
+
+    Construite une seule fois pour les codes postaux distincts : elle est
+    ensuite appliquée à toutes les lignes par jointure vectorisée.
+    """
+    codes = pd.Index(codes_postaux, dtype=object).unique()
+    departements = [code_postal_to_departement(cp) for cp in codes]
+    return pd.DataFrame(
+        {
+            "departement": departements,
+            "nom_departement": [DEPARTEMENTS.get(d, INCONNU) for d in departements],
+            "region": [
+                DEPARTEMENT_TO_REGION.get(d, REGION_INCONNUE) for d in departements
+            ],
+        },
+        index=codes,
     )
-    idx = distances.idxmin()
-    result = df.loc[idx].copy()
-    result["distance_km"] = distances.loc[idx]
-    return result
 
-"""
-def estimate_travel_time(distance_km: float, speed_kmh: float = 40) -> float:
-    """Temps d'accès estimé en minutes."""
-    return (distance_km / speed_kmh) * 60
+
+def attach_geography(df: pd.DataFrame, column: str = "code_postal") -> pd.DataFrame:
+    """
+    Ajoute les colonnes 'departement', 'nom_departement' et 'region'
+    dérivées du code postal.
+
+    Les codes postaux sont dictionnairisés (catégories) : la table de
+    correspondance n'est calculée que sur les valeurs distinctes puis
+    propagée aux lignes via les codes entiers.
+    """
+    cp = df[column].astype("category")
+    table = geography_table(cp.cat.categories)
+    codes = cp.cat.codes.to_numpy()
+
+    for name, default in (
+        ("departement", INCONNU),
+        ("nom_departement", INCONNU),
+        ("region", REGION_INCONNUE),
+    ):
+        # Le code -1 (code postal manquant) pointe sur la valeur par défaut
+        lookup = np.append(table[name].to_numpy(dtype=object), default)
+        categories, inverse = np.unique(lookup, return_inverse=True)
+        df[name] = pd.Categorical.from_codes(inverse[codes], categories)
+
+    return df
@@ -1,18 +1,326 @@
+from typing import Iterable, Optional
+import numpy as np
 import pandas as pd
 
+from utils.geo import DEPARTEMENT_TO_REGION
 
-def professionals_by_departement(df: pd.DataFrame) -> pd.DataFrame:
+# Clés de regroupement de chaque niveau du cube de comptage
+ROLLUP_LEVELS = {
+    "commune": [
+        "code_postal",
+        "commune",
+        "latitude",
+        "longitude",
+        "departement",
+        "region",
+    ],
+    "departement": ["departement", "nom_departement", "region"],
+    "region": ["region"],
+}
+
+# Densités exprimées en professionnels pour 10 000 habitants
+DENSITY_SCALE = 10_000
+# Clé de zone de chaque niveau de densité (None : France entière)
+DENSITY_KEYS = {
+    "commune": "code_postal",
+    "departement": "departement",
+    "region": "region",
+    "national": None,
+}
+NATIONAL_ZONE = "France"
+# Profession fictive portant le total toutes professions confondues
+ALL_PROFESSIONS = "Toutes professions"
+
+# Percentiles nationaux des effectifs départementaux
+SUMMARY_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def summarize_departements(cube: pd.DataFrame) -> dict:
     """
-    Nombre de professionnels de santé par département.
+    Résumé par département, indexé par code, calculé une fois à partir du
+    cube de comptage.
+
+    Returns:
+        {"departements": {code: {"nom", "region", "nb_professionnels",
+        "rang_percentile", "professions": {profession: nb}}},
+        "national": {"moyenne", "p10", ..., "p90"}}
     """
-    if "departement" not in df.columns:
-        raise ValueError("Colonne 'departement' absente")
+    part = cube[cube["niveau"] == "departement"]
+    keys = ROLLUP_LEVELS["departement"]
 
-    agg = (
-        df.groupby("departement")
-        .size()
-        .reset_index(name="nb_professionnels")
-        .sort_values("nb_professionnels", ascending=False)
+    totals = (
+        part.groupby(keys, observed=True, sort=False)["nb_professionnels"]
+        .sum()
+        .reset_index()
     )
+    # Part des départements ayant au plus autant de professionnels
+    totals["rang_percentile"] = totals["nb_professionnels"].rank(pct=True) * 100
+
+    breakdown = (
+        part.dropna(subset=["profession"])
+        .groupby(["departement", "profession"], observed=True)["nb_professionnels"]
+        .sum()
+        .sort_values(ascending=False)
+    )
+    by_departement = {code: {} for code in totals["departement"]}
+    for (code, profession), nb in breakdown.items():
+        by_departement[code][profession] = int(nb)
+
+    departements = {
+        row.departement: {
+            "nom": row.nom_departement,
+            "region": row.region,
+            "nb_professionnels": int(row.nb_professionnels),
+            "rang_percentile": round(float(row.rang_percentile), 1),
+            "professions": by_departement[row.departement],
+        }
+        for row in totals.itertuples(index=False)
+    }
+
+    counts = totals["nb_professionnels"].to_numpy()
+    national = {"moyenne": float(counts.mean()) if len(counts) else 0.0}
+    for q in SUMMARY_PERCENTILES:
+        national[f"p{q}"] = float(np.percentile(counts, q)) if len(counts) else 0.0
+
+    return {"departements": departements, "national": national}
+
+
+def build_rollup(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cube de comptage : nombre de professionnels par niveau géographique
+    (commune, département, région) et par profession.
+
+    La colonne 'ordre' conserve le rang de première apparition de la
+    profession dans chaque groupe, pour reproduire l'ordre des données
+    brutes (exemples de professions sur la carte).
+    """
+    df = df.assign(ordre=np.arange(len(df)))
+
+    parts = []
+    for niveau, keys in ROLLUP_LEVELS.items():
+        part = (
+            df.groupby(keys + ["profession"], observed=True, dropna=False, sort=False)
+            .agg(nb_professionnels=("ordre", "size"), ordre=("ordre", "min"))
+            .reset_index()
+            .dropna(subset=keys)
+        )
+        part.insert(0, "niveau", niveau)
+        parts.append(part)
+
+    cube = pd.concat(parts, ignore_index=True)
+    return cube.sort_values(["niveau", "ordre"], ignore_index=True)
+
+
+def rollup_counts(
+    cube: pd.DataFrame, niveau: str, professions: Optional[Iterable[str]] = None
+) -> pd.DataFrame:
+    """
+    Nombre de professionnels par zone d'un niveau du cube, pour une
+    sélection de professions (toutes si None ou vide).
+    """
+    if niveau not in ROLLUP_LEVELS:
+        raise ValueError(f"Niveau inconnu : {niveau}")
+
+    part = cube[cube["niveau"] == niveau]
+    if professions:
+        part = part[part["profession"].isin(list(professions))]
+
+    keys = ROLLUP_LEVELS[niveau]
+    return (
+        part.groupby(keys, observed=True, sort=False)
+        .agg(nb_professionnels=("nb_professionnels", "sum"))
+        .reset_index()
+        .sort_values("nb_professionnels", ascending=False, ignore_index=True)
+    )
+
+
+def first_distinct(
+    df: pd.DataFrame,
+    keys: list[str],
+    column: str = "profession",
+    n: int = 3,
+    sep: str = ", ",
+    empty: str = "Aucune profession",
+) -> pd.Series:
+    """
+    Concatène les `n` premières valeurs distinctes de `column` par groupe.
+
+    Équivalent vectorisé de
+    `groupby(keys)[column].agg(lambda x: sep.join(x.unique()[:n] sans NaN))` :
+    les valeurs manquantes comptent parmi les `n` premières mais ne sont
+    pas affichées, et un groupe sans valeur renvoie `empty`.
+
+    Returns:
+        Série indexée par les clés de groupe, dans l'ordre d'apparition
+    """
+    df = df[keys + [column]].dropna(subset=keys)
+    group_ids = df.groupby(keys, observed=True, sort=False).ngroup().to_numpy()
+    n_groups = int(group_ids.max()) + 1 if len(group_ids) else 0
+
+    # Ligne de première apparition de chaque groupe → index du résultat
+    _, first_rows = np.unique(group_ids, return_index=True)
+    index = df.iloc[first_rows].set_index(keys).index
+
+    # Première occurrence de chaque (groupe, valeur), sur des codes entiers
+    codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+    pair = group_ids.astype(np.int64) * (len(uniques) + 1) + codes
+    first = ~pd.Series(pair).duplicated().to_numpy()
+    group_ids, codes = group_ids[first], codes[first]
+    rank = pd.Series(group_ids).groupby(group_ids).cumcount().to_numpy()
+
+    labels = np.array(
+        [str(u) if pd.notna(u) else None for u in uniques], dtype=object
+    )
+    keep = (rank < n) & pd.notna(labels[codes])
+    group_ids, values = group_ids[keep], labels[codes[keep]]
+
+    result = np.full(n_groups, "", dtype=object)
+    rank = pd.Series(group_ids).groupby(group_ids).cumcount().to_numpy()
+    for i in range(n):
+        at = rank == i
+        prefix = result[group_ids[at]] + sep if i else ""
+        result[group_ids[at]] = prefix + values[at]
 
-    return agg
+    result[result == ""] = empty
+    return pd.Series(result, index=index, name=column)
+
+
+def population_by_zone(communes: pd.DataFrame) -> dict[str, pd.Series]:
+    """
+    Population de chaque zone des niveaux de densité.
+
+    Args:
+        communes: Communes avec 'code_postal', 'departement' et 'population'
+
+    Returns:
+        Séries de population indexées par code de zone, par niveau
+    """
+    communes = communes.dropna(subset=["population"])
+    communes = communes.assign(
+        region=communes["departement"].map(DEPARTEMENT_TO_REGION)
+    )
+
+    populations = {}
+    for niveau, key in DENSITY_KEYS.items():
+        if key is None:
+            populations[niveau] = pd.Series(
+                {NATIONAL_ZONE: communes["population"].sum()}
+            )
+        else:
+            populations[niveau] = communes.groupby(key)["population"].sum()
+    return populations
+
+
+def build_density(cube: pd.DataFrame, communes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Densité de professionnels pour 10 000 habitants, par niveau
+    géographique, zone et profession.
+
+    Chaque zone peuplée a une ligne par profession, même sans aucun
+    professionnel (densité nulle), et une ligne ALL_PROFESSIONS pour le
+    total. Les zones sans population connue ont une densité manquante.
+
+    Args:
+        cube: Cube de comptage (`build_rollup`)
+        communes: Communes avec 'code_postal', 'departement' et 'population'
+
+    Returns:
+        DataFrame indexé par (niveau, zone, profession), colonnes
+        'nb_professionnels', 'population' et 'densite_10k'
+    """
+    populations = population_by_zone(communes)
+    professions = sorted(cube["profession"].dropna().unique()) + [ALL_PROFESSIONS]
+
+    parts = {}
+    for niveau, key in DENSITY_KEYS.items():
+        # Le niveau national somme les lignes régionales du cube
+        part = cube[cube["niveau"] == ("region" if key is None else niveau)]
+        if key is None:
+            zones = pd.Series(NATIONAL_ZONE, index=part.index, name="zone")
+        else:
+            zones = part[key].astype(str).rename("zone")
+        counts = part["nb_professionnels"]
+
+        by_profession = counts.groupby(
+            [zones, part["profession"].astype(object)]
+        ).sum()
+        totals = counts.groupby(zones).sum()
+        totals.index = pd.MultiIndex.from_arrays(
+            [totals.index, [ALL_PROFESSIONS] * len(totals)]
+        )
+
+        population = populations[niveau]
+        grid = pd.MultiIndex.from_product(
+            [population.index.union(totals.index.get_level_values(0)), professions],
+            names=["zone", "profession"],
+        )
+        nb = pd.concat([by_profession, totals]).reindex(grid, fill_value=0)
+        pop = population.reindex(grid.get_level_values("zone")).to_numpy()
+
+        parts[niveau] = pd.DataFrame(
+            {
+                "nb_professionnels": nb.to_numpy(dtype=np.int64),
+                "population": pop,
+                "densite_10k": np.where(
+                    pop > 0, nb.to_numpy() / pop * DENSITY_SCALE, np.nan
+                ),
+            },
+            index=grid,
+        )
+
+    density = pd.concat(parts, names=["niveau"])
+    return density.sort_index()
+
+
+def density_of(
+    density: pd.DataFrame,
+    niveau: str,
+    zone: str,
+    profession: str = ALL_PROFESSIONS,
+) -> Optional[dict]:
+    """
+    Densité d'une zone pour une profession (recherche par index).
+
+    Returns:
+        {"nb_professionnels", "population", "densite_10k"} ou None si la
+        zone est inconnue
+    """
+    try:
+        row = density.loc[(niveau, zone, profession)]
+    except KeyError:
+        return None
+    return {
+        "nb_professionnels": int(row["nb_professionnels"]),
+        "population": row["population"],
+        "densite_10k": row["densite_10k"],
+    }
+
+
+def density_for(
+    density: pd.DataFrame, niveau: str, professions: Optional[Iterable[str]] = None
+) -> pd.DataFrame:
+    """
+    Densité de chaque zone d'un niveau pour une sélection de professions
+    (toutes si None ou vide).
+
+    Returns:
+        DataFrame avec 'zone', 'nb_professionnels', 'population' et
+        'densite_10k'
+    """
+    if niveau not in DENSITY_KEYS:
+        raise ValueError(f"Niveau inconnu : {niveau}")
+
+    part = density.xs(niveau, level="niveau")
+    selected = list(professions) if professions else [ALL_PROFESSIONS]
+    part = part[part.index.get_level_values("profession").isin(selected)]
+
+    agg = part.groupby(level="zone").agg(
+        nb_professionnels=("nb_professionnels", "sum"),
+        population=("population", "first"),
+    )
+    agg["densite_10k"] = np.where(
+        agg["population"] > 0,
+        agg["nb_professionnels"] / agg["population"] * DENSITY_SCALE,
+        np.nan,
+    )
+    return agg.reset_index()
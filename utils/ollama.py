@@ -0,0 +1,206 @@
+"""
+Client HTTP du serveur Ollama.
+
+Les connexions sont gardées ouvertes et réutilisées d'une requête à
+l'autre, et les réponses peuvent être lues en flux : chaque fragment de
+texte est rendu dès que le modèle le produit, au lieu d'attendre la
+complétion entière.
+"""
+
+import json
+from threading import Lock
+from typing import AsyncIterator, Iterator, Optional
+
+import httpx
+
+DEFAULT_URL = "http://localhost:11434"
+DEFAULT_MODEL = "mistral"
+
+# Connexion courte ; en lecture, délai maximal entre deux fragments (et
+# non plus pour la complétion entière)
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+DEFAULT_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+
+
+class OllamaError(Exception):
+    """Erreur renvoyée par le serveur Ollama."""
+
+
+def _payload(model: str, prompt: str, stream: bool, options: Optional[dict]) -> dict:
+    payload = {"model": model, "prompt": prompt, "stream": stream}
+    if options:
+        payload["options"] = options
+    return payload
+
+
+def _timeout(timeout: Optional[float]):
+    return httpx.USE_CLIENT_DEFAULT if timeout is None else timeout
+
+
+def _parse_chunk(line: str) -> Optional[dict]:
+    """Décode une ligne NDJSON du flux (None pour une ligne vide)."""
+    if not line.strip():
+        return None
+    chunk = json.loads(line)
+    if "error" in chunk:
+        raise OllamaError(chunk["error"])
+    return chunk
+
+
+class OllamaClient:
+    """
+    Client synchrone, partageable entre threads (pool de connexions
+    httpx).
+
+    Args:
+        base_url: URL du serveur Ollama
+        model: Modèle utilisé par défaut
+        timeout: Délais de connexion et de lecture
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_URL,
+        model: str = DEFAULT_MODEL,
+        timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+    ):
+        self.base_url = base_url
+        self.model = model
+        self._http = httpx.Client(
+            base_url=base_url, timeout=timeout, limits=DEFAULT_LIMITS
+        )
+
+    def generate(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        options: Optional[dict] = None,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """
+        Complétion entière du prompt.
+
+        `timeout` (en secondes) remplace les délais du client pour cette
+        requête.
+        """
+        response = self._http.post(
+            "/api/generate",
+            json=_payload(model or self.model, prompt, False, options),
+            timeout=_timeout(timeout),
+        )
+        response.raise_for_status()
+        chunk = _parse_chunk(response.text)
+        return chunk["response"].strip() if chunk else ""
+
+    def stream(
+        self, prompt: str, model: Optional[str] = None, options: Optional[dict] = None
+    ) -> Iterator[str]:
+        """Fragments de la complétion, au fil de leur génération."""
+        with self._http.stream(
+            "POST",
+            "/api/generate",
+            json=_payload(model or self.model, prompt, True, options),
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                chunk = _parse_chunk(line)
+                if chunk is None:
+                    continue
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    return
+
+    def close(self):
+        self._http.close()
+
+    def __enter__(self) -> "OllamaClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncOllamaClient:
+    """
+    Client asynchrone, pour servir de nombreuses conversations depuis une
+    même boucle d'événements.
+
+    Un client est lié à la boucle qui l'utilise : en créer un par boucle.
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_URL,
+        model: str = DEFAULT_MODEL,
+        timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+    ):
+        self.base_url = base_url
+        self.model = model
+        self._http = httpx.AsyncClient(
+            base_url=base_url, timeout=timeout, limits=DEFAULT_LIMITS
+        )
+
+    async def generate(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        options: Optional[dict] = None,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """
+        Complétion entière du prompt.
+
+        `timeout` (en secondes) remplace les délais du client pour cette
+        requête.
+        """
+        response = await self._http.post(
+            "/api/generate",
+            json=_payload(model or self.model, prompt, False, options),
+            timeout=_timeout(timeout),
+        )
+        response.raise_for_status()
+        chunk = _parse_chunk(response.text)
+        return chunk["response"].strip() if chunk else ""
+
+    async def stream(
+        self, prompt: str, model: Optional[str] = None, options: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        """Fragments de la complétion, au fil de leur génération."""
+        async with self._http.stream(
+            "POST",
+            "/api/generate",
+            json=_payload(model or self.model, prompt, True, options),
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                chunk = _parse_chunk(line)
+                if chunk is None:
+                    continue
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    return
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def __aenter__(self) -> "AsyncOllamaClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+_clients: dict[tuple[str, str], OllamaClient] = {}
+_clients_lock = Lock()
+
+
+def get_client(base_url: str = DEFAULT_URL, model: str = DEFAULT_MODEL) -> OllamaClient:
+    """Client synchrone partagé par le processus, par serveur et modèle."""
+    with _clients_lock:
+        client = _clients.get((base_url, model))
+        if client is None:
+            client = OllamaClient(base_url, model)
+            _clients[(base_url, model)] = client
+        return client
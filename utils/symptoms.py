@@ -0,0 +1,180 @@
+"""
+Détection des symptômes dans un message libre.
+
+Le lexique (symptôme → spécialités et synonymes) est compilé en un arbre
+de préfixes sur les mots normalisés (minuscules, sans accents, au
+singulier) : le message est parcouru une seule fois, quel que soit le
+nombre de termes, et seuls des mots entiers sont reconnus ('dos' ne
+correspond pas à 'dossier').
+
+Un terme terminé par '*' reconnaît tout mot qui commence par lui
+('tensio*' → 'tension', 'tensiomètre').
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from threading import Lock
+from typing import Iterable, Optional
+
+from utils.text import normalize_text
+
+# Lexique externe optionnel :
+# {"symptome": {"specialites": [...], "synonymes": [...]}, ...}
+LEXICON_PATH = Path("data/lexique_symptomes.json")
+
+
+def singular(word: str) -> str:
+    """Singulier approché d'un mot normalisé ('jambes' → 'jambe')."""
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+class _Node:
+    __slots__ = ("words", "prefixes", "prefix_lengths", "symptom")
+
+    def __init__(self):
+        self.words: dict[str, _Node] = {}
+        # Termes en '*' indexés par préfixe, et longueurs de préfixe
+        # présentes : un mot est testé par une recherche par longueur, et
+        # non contre chaque préfixe
+        self.prefixes: dict[str, _Node] = {}
+        self.prefix_lengths: set[int] = set()
+        self.symptom: Optional[str] = None
+
+
+class SymptomMatcher:
+    """
+    Reconnaît les symptômes d'un lexique dans un message.
+
+    Args:
+        lexicon: {symptôme: {"specialites": [...], "synonymes": [...]}} ;
+            le nom du symptôme est lui-même un terme reconnu
+    """
+
+    def __init__(self, lexicon: dict[str, dict]):
+        self.lexicon = lexicon
+        # Empreinte du contenu du lexique (clé des réponses en cache)
+        self.version = hashlib.sha256(
+            json.dumps(lexicon, sort_keys=True, ensure_ascii=False).encode()
+        ).hexdigest()[:16]
+        self._root = _Node()
+        self.n_terms = 0
+        for symptom, entry in lexicon.items():
+            for term in [symptom, *entry.get("synonymes", [])]:
+                self._add(term, symptom)
+
+    def _add(self, term: str, symptom: str):
+        words = normalize_text(term.rstrip("*")).split()
+        if not words:
+            return
+        node = self._root
+        for i, word in enumerate(words):
+            if i == len(words) - 1 and term.endswith("*"):
+                node.prefix_lengths.add(len(word))
+                node = node.prefixes.setdefault(word, _Node())
+            else:
+                node = node.words.setdefault(singular(word), _Node())
+        # Le premier symptôme déclaré pour un terme l'emporte
+        if node.symptom is None:
+            node.symptom = symptom
+            self.n_terms += 1
+
+    def _longest_match(self, words: list[str], start: int) -> tuple[int, Optional[str]]:
+        """Fin et symptôme du plus long terme commençant à `start`."""
+        best = (start, None)
+        stack = [(self._root, start)]
+        while stack:
+            node, i = stack.pop()
+            if node.symptom is not None and i > best[0]:
+                best = (i, node.symptom)
+            if i == len(words):
+                continue
+            child = node.words.get(singular(words[i]))
+            if child is not None:
+                stack.append((child, i + 1))
+            for length in node.prefix_lengths:
+                child = node.prefixes.get(words[i][:length])
+                if child is not None:
+                    stack.append((child, i + 1))
+        return best
+
+    def find(self, text: str) -> list[str]:
+        """
+        Symptômes reconnus dans un message, dans leur ordre d'apparition.
+
+        À chaque position, le terme le plus long l'emporte ('mal de dos'
+        plutôt que 'dos' s'ils sont tous deux dans le lexique).
+        """
+        words = normalize_text(text).split()
+        found: dict[str, None] = {}
+        i = 0
+        while i < len(words):
+            end, symptom = self._longest_match(words, i)
+            if symptom is None:
+                i += 1
+            else:
+                found.setdefault(symptom)
+                i = end
+        return list(found)
+
+    def specialties(self, symptoms: Iterable[str]) -> list[str]:
+        """Spécialités recommandées pour des symptômes, triées."""
+        result = set()
+        for symptom in symptoms:
+            result.update(self.lexicon.get(symptom, {}).get("specialites", []))
+        return sorted(result)
+
+
+def build_lexicon(
+    specialties: dict[str, list[str]],
+    synonyms: Optional[dict[str, list[str]]] = None,
+    path: Optional[Path] = LEXICON_PATH,
+) -> dict[str, dict]:
+    """
+    Assemble le lexique intégré et le lexique externe (s'il existe).
+
+    Les entrées externes complètent les spécialités et synonymes des
+    symptômes intégrés et ajoutent de nouveaux symptômes.
+    """
+    lexicon = {
+        symptom: {
+            "specialites": list(values),
+            "synonymes": list((synonyms or {}).get(symptom, [])),
+        }
+        for symptom, values in specialties.items()
+    }
+    if path is not None and Path(path).exists():
+        external = json.loads(Path(path).read_text(encoding="utf-8"))
+        for symptom, entry in external.items():
+            target = lexicon.setdefault(symptom, {"specialites": [], "synonymes": []})
+            for key in ("specialites", "synonymes"):
+                target[key] += [v for v in entry.get(key, []) if v not in target[key]]
+    return lexicon
+
+
+_matchers: dict[str, tuple[object, SymptomMatcher]] = {}
+_matchers_lock = Lock()
+
+
+def get_symptom_matcher(
+    specialties: dict[str, list[str]],
+    synonyms: Optional[dict[str, list[str]]] = None,
+    path: Path = LEXICON_PATH,
+) -> SymptomMatcher:
+    """
+    Matcher partagé par le processus, recompilé uniquement quand le
+    lexique externe change.
+    """
+    path = Path(path)
+    stat = path.stat() if path.exists() else None
+    version = (stat.st_mtime_ns, stat.st_size) if stat else None
+    key = str(path)
+    with _matchers_lock:
+        cached = _matchers.get(key)
+        if cached is None or cached[0] != version:
+            matcher = SymptomMatcher(build_lexicon(specialties, synonyms, path))
+            cached = (version, matcher)
+            _matchers[key] = cached
+        return cached[1]
@@ -0,0 +1,25 @@
+"""
+Normalisation de texte libre (messages utilisateur).
+"""
+
+import re
+import unicodedata
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def fold_accents(text: str) -> str:
+    """Supprime les accents et ligatures : 'cœur fébrile' → 'coeur febrile'."""
+    text = text.replace("œ", "oe").replace("Œ", "OE").replace("æ", "ae").replace("Æ", "AE")
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def normalize_text(text: str) -> str:
+    """
+    Forme canonique d'un message : minuscules, sans accents ni
+    ponctuation, espaces simples.
+
+    'J'ai  mal à la TÊTE !' → 'j ai mal a la tete'
+    """
+    return _NON_ALNUM.sub(" ", fold_accents(text).lower()).strip()
@@ -0,0 +1,233 @@
+"""
+Données de la carte pour une vue (centre + zoom).
+
+Le niveau d'agrégation dépend du zoom (régions → départements →
+communes), seuls les points de la zone visible sont renvoyés et leur
+nombre reste sous un budget fixe : le navigateur ne reçoit jamais tout
+le pays au niveau des communes.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.geo import DEPARTEMENTS
+
+# Zoom minimal de chaque niveau d'agrégation (du plus grossier au plus fin).
+# Les coordonnées des professionnels sont celles de leur code postal : le
+# niveau commune est le plus fin disponible.
+ZOOM_LEVELS = {"region": 0.0, "departement": 5.5, "commune": 7.5}
+# Nombre maximal de points envoyés au navigateur
+DEFAULT_BUDGET = 5_000
+
+# Taille de référence de la carte affichée, en pixels
+VIEWPORT_WIDTH = 1200
+VIEWPORT_HEIGHT = 700
+_TILE_SIZE = 256
+
+
+@dataclass(frozen=True)
+class BBox:
+    """Zone rectangulaire en degrés (ouest, sud, est, nord)."""
+
+    west: float
+    south: float
+    east: float
+    north: float
+
+    @classmethod
+    def around(
+        cls,
+        lat: float,
+        lon: float,
+        zoom: float,
+        width: int = VIEWPORT_WIDTH,
+        height: int = VIEWPORT_HEIGHT,
+    ) -> "BBox":
+        """Zone visible d'une carte web mercator centrée sur (lat, lon)."""
+        degrees_per_px = 360 / (_TILE_SIZE * 2**zoom)
+        half_lon = width / 2 * degrees_per_px
+        half_lat = height / 2 * degrees_per_px * math.cos(math.radians(lat))
+        return cls(lon - half_lon, lat - half_lat, lon + half_lon, lat + half_lat)
+
+    def contains(self, lat, lon) -> np.ndarray:
+        lat, lon = np.asarray(lat), np.asarray(lon)
+        return (
+            (lat >= self.south)
+            & (lat <= self.north)
+            & (lon >= self.west)
+            & (lon <= self.east)
+        )
+
+
+def fit_view(
+    lat, lon, width: int = VIEWPORT_WIDTH, height: int = VIEWPORT_HEIGHT
+) -> tuple[float, float, float]:
+    """
+    Centre et zoom montrant tous les points donnés.
+
+    Returns:
+        (latitude, longitude, zoom)
+    """
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    center_lat = (np.nanmin(lat) + np.nanmax(lat)) / 2
+    center_lon = (np.nanmin(lon) + np.nanmax(lon)) / 2
+    span_lon = max(np.nanmax(lon) - np.nanmin(lon), 0.01)
+    span_lat = max(np.nanmax(lat) - np.nanmin(lat), 0.01) / math.cos(
+        math.radians(center_lat)
+    )
+    # Marge de 10 % autour des points, zoom arrondi par défaut
+    zoom = min(
+        math.log2(360 * width / (_TILE_SIZE * span_lon * 1.1)),
+        math.log2(360 * height / (_TILE_SIZE * span_lat * 1.1)),
+    )
+    zoom = math.floor(min(max(zoom, 2.0), 12.0) * 2) / 2
+    return float(center_lat), float(center_lon), zoom
+
+
+def level_for_zoom(zoom: float) -> str:
+    """Niveau d'agrégation adapté à un zoom."""
+    level = "region"
+    for niveau, min_zoom in ZOOM_LEVELS.items():
+        if zoom >= min_zoom:
+            level = niveau
+    return level
+
+
+@dataclass
+class MapPoints:
+    """Points d'une vue et la façon dont ils ont été obtenus."""
+
+    points: pd.DataFrame
+    niveau: str
+    nb_zones: int
+    tronque: bool
+
+
+def aggregate_points(communes: pd.DataFrame, niveau: str) -> pd.DataFrame:
+    """
+    Points d'un niveau : une ligne par zone, placée au barycentre des
+    communes pondéré par le nombre de professionnels.
+
+    Args:
+        communes: Lignes communes du cube (une par commune × profession)
+        niveau: 'commune', 'departement' ou 'region'
+
+    Returns:
+        DataFrame avec 'zone', 'nom', 'latitude', 'longitude' et
+        'nombre_pros'
+    """
+    keys = ["code_postal", "commune"] if niveau == "commune" else [niveau]
+
+    df = communes.dropna(subset=["latitude", "longitude"])
+    weights = df["nb_professionnels"]
+    grouped = (
+        df.assign(
+            lat_w=df["latitude"].astype(float) * weights,
+            lon_w=df["longitude"].astype(float) * weights,
+        )
+        .groupby(keys, observed=True, sort=False)
+        .agg(
+            nombre_pros=("nb_professionnels", "sum"),
+            lat_w=("lat_w", "sum"),
+            lon_w=("lon_w", "sum"),
+        )
+        .reset_index()
+    )
+    grouped = grouped[grouped["nombre_pros"] > 0]
+    zone = grouped[keys[0]].astype(str)
+    if niveau == "departement":
+        nom = zone.map(lambda code: DEPARTEMENTS.get(code, code))
+    else:
+        nom = grouped[keys[-1]].astype(str)
+    return pd.DataFrame(
+        {
+            "zone": zone,
+            "nom": nom,
+            "latitude": grouped["lat_w"] / grouped["nombre_pros"],
+            "longitude": grouped["lon_w"] / grouped["nombre_pros"],
+            "nombre_pros": grouped["nombre_pros"].astype(int),
+        }
+    )
+
+
+def map_points(
+    cube: pd.DataFrame,
+    zoom: float,
+    bbox: Optional[BBox] = None,
+    professions: Optional[Iterable[str]] = None,
+    budget: int = DEFAULT_BUDGET,
+) -> MapPoints:
+    """
+    Points à afficher pour une vue de la carte.
+
+    Le niveau est choisi selon le zoom ; si la zone visible en contient
+    plus que `budget`, le niveau plus grossier suivant est utilisé, et au
+    niveau le plus grossier seules les `budget` zones les plus dotées
+    sont gardées.
+
+    Args:
+        cube: Cube de comptage (`build_rollup`)
+        zoom: Zoom de la carte
+        bbox: Zone visible (tout le pays si None)
+        professions: Professions à compter (toutes si None ou vide)
+        budget: Nombre maximal de points renvoyés
+    """
+    communes = cube[cube["niveau"] == "commune"]
+    if professions:
+        communes = communes[communes["profession"].isin(list(professions))]
+    if bbox is not None:
+        communes = communes[bbox.contains(communes["latitude"], communes["longitude"])]
+
+    levels = list(ZOOM_LEVELS)
+    index = levels.index(level_for_zoom(zoom))
+    while True:
+        niveau = levels[index]
+        points = aggregate_points(communes, niveau)
+        if len(points) <= budget or index == 0:
+            break
+        index -= 1
+
+    nb_zones = len(points)
+    tronque = nb_zones > budget
+    if tronque:
+        points = points.nlargest(budget, "nombre_pros")
+    return MapPoints(points.reset_index(drop=True), niveau, nb_zones, tronque)
+
+
+def grid_points(
+    grid: pd.DataFrame,
+    bbox: Optional[BBox] = None,
+    professions: Optional[Iterable[str]] = None,
+    budget: int = DEFAULT_BUDGET,
+) -> MapPoints:
+    """
+    Cellules de grille à afficher pour une vue : effectifs des professions
+    choisies sommés par cellule, limités à la zone visible et au budget
+    (cellules les plus dotées).
+
+    Args:
+        grid: Grille d'une résolution (`utils.data.get_grid`)
+    """
+    if professions:
+        grid = grid[grid["profession"].isin(list(professions))]
+    if bbox is not None:
+        grid = grid[bbox.contains(grid["latitude"], grid["longitude"])]
+
+    points = (
+        grid.groupby(["ix", "iy"], sort=False)
+        .agg(
+            latitude=("latitude", "first"),
+            longitude=("longitude", "first"),
+            nombre_pros=("nb_professionnels", "sum"),
+        )
+        .reset_index()
+    )
+    nb_zones = len(points)
+    tronque = nb_zones > budget
+    if tronque:
+        points = points.nlargest(budget, "nombre_pros")
+    return MapPoints(points.reset_index(drop=True), "grille", nb_zones, tronque)